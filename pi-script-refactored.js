@@ -13,6 +13,125 @@ let historyMarkersLayer = null;
 let trajectoryLayer = null;
 let trajectoryData = [];
 
+// 🗺️ 地圖圖磚來源：由樹莓派本機資源伺服器提供頁面時，改用其圖磚快取（離線也能顯示已快取的地圖）
+const PI_TILE_URL = location.hostname === 'localhost' && location.pathname.startsWith('/v/')
+    ? '/tiles/{z}/{x}/{y}.png'
+    : 'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png';
+
+// 🔔 頁面就緒訊號：樹莓派以 execute_async_script 等待，資料一出現就繼續，不再固定 sleep
+//   ready: Firebase 登入完成、startTheDay 可呼叫
+//   city:  本次甦醒的城市資料已顯示（window.currentCityData 與 #cityName）
+//   error: 甦醒流程失敗（值為錯誤訊息）
+window.piSignals = window.piSignals || (function () {
+    const values = {};
+    const waiters = [];
+
+    function set(name, value = true) {
+        values[name] = value;
+        window.piBus && window.piBus.send({ type: 'signal', name });
+        for (let i = waiters.length - 1; i >= 0; i--) {
+            if (waiters[i].names.includes(name)) {
+                const waiter = waiters.splice(i, 1)[0];
+                clearTimeout(waiter.timer);
+                waiter.resolve({ name, value });
+            }
+        }
+    }
+
+    function clear(name) {
+        delete values[name];
+    }
+
+    // 等待任一訊號；已設定時立即返回，逾時返回 null
+    function wait(names, timeoutMs) {
+        names = Array.isArray(names) ? names : [names];
+        const ready = names.find(name => name in values);
+        if (ready) {
+            return Promise.resolve({ name: ready, value: values[ready] });
+        }
+        return new Promise(resolve => {
+            const waiter = { names, resolve };
+            waiter.timer = setTimeout(() => {
+                waiters.splice(waiters.indexOf(waiter), 1);
+                resolve(null);
+            }, timeoutMs);
+            waiters.push(waiter);
+        });
+    }
+
+    return { set, clear, wait };
+})();
+
+// 🔌 事件匯流排：與樹莓派本機 WebSocket 的雙向通道（由樹莓派以 piBus.connect(url) 建立）
+//   送出：日誌、狀態轉換、頁面訊號，以微任務合併成批次依序送出
+//   接收：樹莓派送來的事件批次，依序設定全域變數並分派 CustomEvent
+window.piBus = window.piBus || (function () {
+    const MAX_OUTBOX = 500;
+    let socket = null;
+    let url = null;
+    let seq = 0;
+    let outbox = [];
+    let flushScheduled = false;
+    let reconnectTimer = null;
+
+    function isConnected() {
+        return !!socket && socket.readyState === WebSocket.OPEN;
+    }
+
+    function connect(busUrl) {
+        url = busUrl || url;
+        if (!url || (socket && socket.readyState <= WebSocket.OPEN && socket.url.startsWith(url))) {
+            return;
+        }
+        clearTimeout(reconnectTimer);
+        socket = new WebSocket(url);
+        socket.onopen = () => flush();
+        socket.onmessage = (event) => {
+            let batch;
+            try {
+                batch = JSON.parse(event.data);
+            } catch (error) {
+                console.error('❌ [事件匯流排] 無法解析訊息:', error);
+                return;
+            }
+            (batch.messages || []).forEach(msg => {
+                if (msg.assign) {
+                    window[msg.assign] = msg.detail;
+                }
+                window.dispatchEvent(new CustomEvent(msg.name, { detail: msg.detail }));
+            });
+        };
+        socket.onclose = () => {
+            socket = null;
+            reconnectTimer = setTimeout(() => connect(), 1000);
+        };
+    }
+
+    function flush() {
+        flushScheduled = false;
+        if (!isConnected() || outbox.length === 0) {
+            return;
+        }
+        seq += 1;
+        socket.send(JSON.stringify({ seq, messages: outbox }));
+        outbox = [];
+    }
+
+    // 未連線時先保留（上限 MAX_OUTBOX），連上後一起送出
+    function send(message) {
+        outbox.push(Object.assign({ ts: Date.now() }, message));
+        if (outbox.length > MAX_OUTBOX) {
+            outbox.splice(0, outbox.length - MAX_OUTBOX);
+        }
+        if (!flushScheduled) {
+            flushScheduled = true;
+            queueMicrotask(flush);
+        }
+    }
+
+    return { connect, send, isConnected };
+})();
+
 // =====================================================
 // 🎛️ 1. 統一配置管理器
 // =====================================================
@@ -110,7 +229,7 @@ class MapManager {
             });
 
             // 添加瓦片層
-            L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            L.tileLayer(PI_TILE_URL, {
                 attribution: '© OpenStreetMap contributors'
             }).addTo(map);
 
@@ -396,6 +515,7 @@ class StoryManager {
 class StateManager {
     static setState(newState, message = '') {
         console.log(`🔄 狀態切換: ${currentState} -> ${newState}`);
+        window.piBus.send({ type: 'state', state: newState, message });
         
         try {
             currentState = newState;
@@ -454,8 +574,10 @@ class StateManager {
 // 🚀 6. 統一業務邏輯管理器 (合併核心函數)
 // =====================================================
 class WakeUpManager {
-    static async startTheDay() {
+    static async startTheDay(presetCity = null) {
         console.log('🌅 統一甦醒流程開始 - 實現6個功能需求');
+        window.piSignals.clear('city');
+        window.piSignals.clear('error');
         
         try {
             // 重置語音故事標記
@@ -473,7 +595,9 @@ class WakeUpManager {
             const targetData = this._calculateTargetLocation();
             
             // 呼叫 API 尋找城市（後端會同時處理語音生成和Firebase上傳）
-            const cityData = await this._findCity(targetData);
+            // 裝置端已選好城市時直接使用（按鈕點擊傳入的是事件物件，不是城市）
+            const preset = presetCity && typeof presetCity.latitude === 'number' ? presetCity : null;
+            const cityData = preset || await this._findCity(targetData);
             if (!cityData) {
                 throw new Error('尋找城市失敗');
             }
@@ -493,6 +617,7 @@ class WakeUpManager {
         } catch (error) {
             console.error('❌ 甦醒流程失敗:', error);
             StateManager.setState('error', error.message);
+            window.piSignals.set('error', error.message);
         }
     }
 
@@ -527,6 +652,7 @@ class WakeUpManager {
         
         // 更新UI元素
         this._updateUI(cityData);
+        window.piSignals.set('city', window.currentCityData);
         
         // 🗺️ 功能5: 地圖定位到該城市座標
         if (mainInteractiveMap) {
@@ -755,7 +881,10 @@ window.addEventListener('firebaseReady', async () => {
         
         // 設置全域函數
         window.startTheDay = WakeUpManager.startTheDay;
+        window.piStartWithCity = (city) => WakeUpManager.startTheDay(city);
         window.setState = StateManager.setState;
+        window.piSoftReset = softReset;
+        window.piSignals.set('ready');
         
         console.log('✅ 重構版本初始化完成 - 已實現功能1和2');
         
@@ -770,6 +899,12 @@ window.addEventListener('firebaseReady', async () => {
 // =====================================================
 let typewriterTimer = null;
 
+// 串流期間已推送到元素、且與完整故事開頭一致的字數
+function streamedLength(element, text) {
+    const shown = element.textContent;
+    return element.dataset.streamed === 'true' && text.startsWith(shown) ? shown.length : 0;
+}
+
 function typeWriterEffect(text, element, speed = 80) {
     return new Promise((resolve) => {
         // 清除之前的計時器
@@ -777,12 +912,14 @@ function typeWriterEffect(text, element, speed = 80) {
             clearTimeout(typewriterTimer);
         }
         
-        // 清空元素內容並添加打字狀態
-        element.textContent = '';
+        // 清空元素內容並添加打字狀態（串流時已顯示的開頭保留，只補打剩餘文字）
+        const shown = streamedLength(element, text);
+        element.dataset.streamed = '';
+        element.textContent = text.substring(0, shown);
         element.classList.add('typing');
         element.classList.remove('completed');
         
-        let index = 0;
+        let index = shown;
         
         function typeNextChar() {
             if (index < text.length) {
@@ -817,8 +954,13 @@ function startStoryTypewriter(storyText) {
         return Promise.resolve();
     }
     
-    // 使用打字機效果
-    const typeSpeed = 80;
+    // 使用打字機效果；若樹莓派提供語音長度，讓打字機與語音同步結束
+    let typeSpeed = 80;
+    const audioDuration = window.piGeneratedStory && window.piGeneratedStory.audioDuration;
+    const remaining = storyText.length - streamedLength(storyTextEl, storyText);
+    if (audioDuration && remaining > 0) {
+        typeSpeed = Math.min(200, Math.max(40, Math.round(audioDuration * 1000 / remaining)));
+    }
     console.log(`🎬 開始打字機效果 - 文字長度: ${storyText.length}, 打字速度: ${typeSpeed}ms/字`);
     
     return typeWriterEffect(storyText, storyTextEl, typeSpeed);
@@ -827,6 +969,46 @@ function startStoryTypewriter(storyText) {
 // 暴露到全域範圍
 window.startStoryTypewriter = startStoryTypewriter;
 
+// 軟重置：回到等待狀態，保留已載入的 Firebase SDK、地圖與軌跡（長按時取代整頁重新載入）
+function softReset() {
+    console.log('🔄 軟重置：回到等待狀態');
+    if (typewriterTimer) {
+        clearTimeout(typewriterTimer);
+        typewriterTimer = null;
+    }
+    const storyTextEl = document.getElementById('storyText');
+    if (storyTextEl) {
+        storyTextEl.textContent = '';
+        storyTextEl.dataset.streamed = '';
+        storyTextEl.classList.remove('typing', 'completed');
+    }
+    window.piSignals.clear('city');
+    window.piSignals.clear('error');
+    window.currentCityData = null;
+    window.piGeneratedStory = null;
+    StateManager.setState('waiting');
+    return currentState === 'waiting';
+}
+
+// 串流模式：故事生成期間樹莓派逐段推送文字，先顯示在故事區域
+window.addEventListener('piStoryChunk', (event) => {
+    const storyTextEl = document.getElementById('storyText');
+    if (!storyTextEl || !event.detail) {
+        return;
+    }
+    if (event.detail.reset) {
+        if (typewriterTimer) {
+            clearTimeout(typewriterTimer);
+            typewriterTimer = null;
+        }
+        storyTextEl.textContent = '';
+        storyTextEl.classList.remove('completed');
+        storyTextEl.classList.add('typing');
+    }
+    storyTextEl.textContent += event.detail.text;
+    storyTextEl.dataset.streamed = 'true';
+});
+
 // =====================================================
 // 📋 9. 保持必要的全域函數 (向後相容)
 // =====================================================
@@ -22,10 +22,129 @@ let trajectoryLayer = null; // 軌跡線圖層
 let trajectoryData = []; // 軌跡點數據
 let historyMarkersLayer = null; // 歷史點位圖層
 
+// 🗺️ 地圖圖磚來源：由樹莓派本機資源伺服器提供頁面時，改用其圖磚快取（離線也能顯示已快取的地圖）
+const PI_TILE_URL = location.hostname === 'localhost' && location.pathname.startsWith('/v/')
+    ? '/tiles/{z}/{x}/{y}.png'
+    : 'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png';
+
 // 新增：狀態管理
 let currentState = 'waiting'; // waiting, loading, result, error
 window.currentState = currentState;
 
+// 🔔 頁面就緒訊號：樹莓派以 execute_async_script 等待，資料一出現就繼續，不再固定 sleep
+//   ready: Firebase 登入完成、startTheDay 可呼叫
+//   city:  本次甦醒的城市資料已顯示（window.currentCityData 與 #cityName）
+//   error: 甦醒流程失敗（值為錯誤訊息）
+window.piSignals = window.piSignals || (function () {
+    const values = {};
+    const waiters = [];
+
+    function set(name, value = true) {
+        values[name] = value;
+        window.piBus && window.piBus.send({ type: 'signal', name });
+        for (let i = waiters.length - 1; i >= 0; i--) {
+            if (waiters[i].names.includes(name)) {
+                const waiter = waiters.splice(i, 1)[0];
+                clearTimeout(waiter.timer);
+                waiter.resolve({ name, value });
+            }
+        }
+    }
+
+    function clear(name) {
+        delete values[name];
+    }
+
+    // 等待任一訊號；已設定時立即返回，逾時返回 null
+    function wait(names, timeoutMs) {
+        names = Array.isArray(names) ? names : [names];
+        const ready = names.find(name => name in values);
+        if (ready) {
+            return Promise.resolve({ name: ready, value: values[ready] });
+        }
+        return new Promise(resolve => {
+            const waiter = { names, resolve };
+            waiter.timer = setTimeout(() => {
+                waiters.splice(waiters.indexOf(waiter), 1);
+                resolve(null);
+            }, timeoutMs);
+            waiters.push(waiter);
+        });
+    }
+
+    return { set, clear, wait };
+})();
+
+// 🔌 事件匯流排：與樹莓派本機 WebSocket 的雙向通道（由樹莓派以 piBus.connect(url) 建立）
+//   送出：日誌、狀態轉換、頁面訊號，以微任務合併成批次依序送出
+//   接收：樹莓派送來的事件批次，依序設定全域變數並分派 CustomEvent
+window.piBus = window.piBus || (function () {
+    const MAX_OUTBOX = 500;
+    let socket = null;
+    let url = null;
+    let seq = 0;
+    let outbox = [];
+    let flushScheduled = false;
+    let reconnectTimer = null;
+
+    function isConnected() {
+        return !!socket && socket.readyState === WebSocket.OPEN;
+    }
+
+    function connect(busUrl) {
+        url = busUrl || url;
+        if (!url || (socket && socket.readyState <= WebSocket.OPEN && socket.url.startsWith(url))) {
+            return;
+        }
+        clearTimeout(reconnectTimer);
+        socket = new WebSocket(url);
+        socket.onopen = () => flush();
+        socket.onmessage = (event) => {
+            let batch;
+            try {
+                batch = JSON.parse(event.data);
+            } catch (error) {
+                console.error('❌ [事件匯流排] 無法解析訊息:', error);
+                return;
+            }
+            (batch.messages || []).forEach(msg => {
+                if (msg.assign) {
+                    window[msg.assign] = msg.detail;
+                }
+                window.dispatchEvent(new CustomEvent(msg.name, { detail: msg.detail }));
+            });
+        };
+        socket.onclose = () => {
+            socket = null;
+            reconnectTimer = setTimeout(() => connect(), 1000);
+        };
+    }
+
+    function flush() {
+        flushScheduled = false;
+        if (!isConnected() || outbox.length === 0) {
+            return;
+        }
+        seq += 1;
+        socket.send(JSON.stringify({ seq, messages: outbox }));
+        outbox = [];
+    }
+
+    // 未連線時先保留（上限 MAX_OUTBOX），連上後一起送出
+    function send(message) {
+        outbox.push(Object.assign({ ts: Date.now() }, message));
+        if (outbox.length > MAX_OUTBOX) {
+            outbox.splice(0, outbox.length - MAX_OUTBOX);
+        }
+        if (!flushScheduled) {
+            flushScheduled = true;
+            queueMicrotask(flush);
+        }
+    }
+
+    return { connect, send, isConnected };
+})();
+
 // 🔧 全域 updateResultData 函數，確保在所有作用域都可訪問
 function updateResultData(data) {
     console.log('📊 updateResultData 被調用，數據:', data);
@@ -238,6 +357,13 @@ let storyTextEl;
                 return;
             }
             
+            // 事件匯流排已連線時直接送出（依序批次，不會像橋接元素一樣被下一則覆蓋）
+            if (window.piBus.isConnected()) {
+                window.piBus.send({ type: 'log', level, message, data: data ? (typeof data === 'string' ? data : JSON.stringify(data).substring(0, 500)) : null });
+                console.log(`🔗 [日誌橋接-${level}] ${message}`, data || '');
+                return;
+            }
+
             // 創建或更新隱藏的日誌元素供後端讀取
             let logElement = document.getElementById('frontend-log-bridge');
             if (!logElement) {
@@ -741,6 +867,7 @@ window.addEventListener('firebaseReady', async (event) => {
     // 新增：狀態管理函數
     function setState(newState, message = '') {
         console.log(`🔄 狀態切換: ${currentState} -> ${newState}`);
+        window.piBus.send({ type: 'state', state: newState, message });
         
         try {
             currentState = newState;
@@ -931,7 +1058,7 @@ window.addEventListener('firebaseReady', async (event) => {
             }
 
             // 添加地圖圖層
-            L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            L.tileLayer(PI_TILE_URL, {
                 attribution: '© OpenStreetMap contributors',
                 maxZoom: 18,
                 minZoom: 2
@@ -993,7 +1120,7 @@ window.addEventListener('firebaseReady', async (event) => {
                 scrollWheelZoom: false
             }).setView([25, 121], 2);
 
-            L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            L.tileLayer(PI_TILE_URL, {
                 attribution: '© OpenStreetMap contributors',
                 maxZoom: 18
             }).addTo(historyLeafletMap);
@@ -1022,7 +1149,7 @@ window.addEventListener('firebaseReady', async (event) => {
                 scrollWheelZoom: false
             }).setView([25, 121], 2);
 
-            L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            L.tileLayer(PI_TILE_URL, {
                 attribution: '© OpenStreetMap contributors',
                 maxZoom: 18
             }).addTo(globalLeafletMap);
@@ -1088,9 +1215,11 @@ window.addEventListener('firebaseReady', async (event) => {
     }
 
     // 開始這一天
-    async function startTheDay() {
+    async function startTheDay(presetCity = null) {
         // 立即設置調試標記
         window.debugStartTheDay = 'STARTED';
+        window.piSignals.clear('city');
+        window.piSignals.clear('error');
         
         // 🔧 重置語音故事標記，確保新的一天全新開始
         window.voiceStoryDisplayed = false;
@@ -1201,15 +1330,22 @@ window.addEventListener('firebaseReady', async (event) => {
                 requestBody.useLocalPosition = false;
             }
             
-            response = await fetch('/api/find-city-geonames', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(requestBody)
-            });
+            let data;
+            if (presetCity) {
+                // 裝置端已選好城市並開始準備故事與語音，這裡只播放定位動畫
+                console.log('📡 使用裝置端選定的城市:', presetCity);
+                data = { success: true, city: presetCity };
+            } else {
+                response = await fetch('/api/find-city-geonames', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify(requestBody)
+                });
 
-            console.log('📡 API 回應狀態:', response.status);
-            const data = await response.json();
-            console.log('📡 API 回應資料:', data);
+                console.log('📡 API 回應狀態:', response.status);
+                data = await response.json();
+                console.log('📡 API 回應資料:', data);
+            }
 
             if (data.success && data.city) {
                 console.log('🎉 API 成功回應，準備處理城市資料:', data.city);
@@ -1245,6 +1381,7 @@ window.addEventListener('firebaseReady', async (event) => {
                 firebase: !!window.firebaseSDK
             });
             setState('error', error.message || '發生未知錯誤');
+            window.piSignals.set('error', error.message || '發生未知錯誤');
             updateConnectionStatus(false);
             
             // 延長等待時間到10秒，讓用戶有時間看到錯誤
@@ -1276,6 +1413,7 @@ window.addEventListener('firebaseReady', async (event) => {
             if (countryNameEl) {
                 countryNameEl.textContent = cityData.country;
             }
+            window.piSignals.set('city', window.currentCityData);
             
             // 設定國旗
             if (countryFlagImg && cityData.country_iso_code) {
@@ -2288,6 +2426,12 @@ function updateResultData(data) {
     let typewriterTimer = null;
     let currentStoryText = '';
 
+    // 串流期間已推送到元素、且與完整故事開頭一致的字數
+    function streamedLength(element, text) {
+        const shown = element.textContent;
+        return element.dataset.streamed === 'true' && text.startsWith(shown) ? shown.length : 0;
+    }
+
     // 打字機效果函數
     function typeWriterEffect(text, element, speed = 80) {
         return new Promise((resolve) => {
@@ -2296,12 +2440,14 @@ function updateResultData(data) {
                 clearTimeout(typewriterTimer);
             }
             
-            // 清空元素內容並添加打字狀態
-            element.textContent = '';
+            // 清空元素內容並添加打字狀態（串流時已顯示的開頭保留，只補打剩餘文字）
+            const shown = streamedLength(element, text);
+            element.dataset.streamed = '';
+            element.textContent = text.substring(0, shown);
             element.classList.add('typing');
             element.classList.remove('completed');
             
-            let index = 0;
+            let index = shown;
             
             function typeNextChar() {
                 if (index < text.length) {
@@ -2337,6 +2483,22 @@ function updateResultData(data) {
         }
     }
 
+    // 軟重置：回到等待狀態，保留已載入的 Firebase SDK、地圖圖磚與字型（長按時取代整頁重新載入）
+    function softReset() {
+        console.log('🔄 軟重置：回到等待狀態');
+        stopTypeWriterEffect();
+        const storyTextEl = document.getElementById('storyText');
+        if (storyTextEl) {
+            storyTextEl.dataset.streamed = '';
+        }
+        window.piSignals.clear('city');
+        window.piSignals.clear('error');
+        window.currentCityData = null;
+        window.piGeneratedStory = null;
+        setState('waiting');
+        return currentState === 'waiting';
+    }
+
     // 計算語音播放時間 (估算)
     function estimateSpeechDuration(text) {
         // 使用 0.7 的語音速度，估算實際播放時間
@@ -2379,8 +2541,13 @@ function updateResultData(data) {
         // 儲存當前故事文字
         currentStoryText = storyText;
         
-        // 使用固定的打字速度，讓效果更明顯
-        const typeSpeed = 80; // 較快的打字速度
+        // 預設固定打字速度；若樹莓派提供語音長度，讓打字機與語音同步結束
+        let typeSpeed = 80;
+        const audioDuration = window.piGeneratedStory && window.piGeneratedStory.audioDuration;
+        const remaining = storyText.length - streamedLength(storyTextEl, storyText);
+        if (audioDuration && remaining > 0) {
+            typeSpeed = Math.min(200, Math.max(40, Math.round(audioDuration * 1000 / remaining)));
+        }
         
         console.log(`🎬 開始打字機效果 - 文字長度: ${storyText.length}, 打字速度: ${typeSpeed}ms/字`);
         console.log(`🎬 故事內容預覽: "${storyText.substring(0, 50)}..."`);
@@ -2392,6 +2559,25 @@ function updateResultData(data) {
     // 暴露 startStoryTypewriter 函數到全域作用域
     window.startStoryTypewriter = startStoryTypewriter;
 
+    // 串流模式：故事生成期間樹莓派逐段推送文字，先顯示在故事區域
+    window.addEventListener('piStoryChunk', (event) => {
+        const storyTextEl = document.getElementById('storyText');
+        if (!storyTextEl || !event.detail) {
+            return;
+        }
+        if (event.detail.reset) {
+            if (typewriterTimer) {
+                clearTimeout(typewriterTimer);
+                typewriterTimer = null;
+            }
+            storyTextEl.textContent = '';
+            storyTextEl.classList.remove('completed');
+            storyTextEl.classList.add('typing');
+        }
+        storyTextEl.textContent += event.detail.text;
+        storyTextEl.dataset.streamed = 'true';
+    });
+
     // 根據國家代碼獲取對應的語言代碼
     function getLanguageCodeFromCountry(countryCode) {
         // 國家代碼到語言代碼的映射
@@ -2548,8 +2734,11 @@ function updateResultData(data) {
         
         // 設定全域函數供實體按鈕調用
         window.startTheDay = startTheDay;
+        window.piStartWithCity = (city) => startTheDay(city);
         window.setState = setState;
+        window.piSoftReset = softReset;
         console.log('✅ 全域函數已設定');
+        window.piSignals.set('ready');
         
     } catch (error) {
         console.error('❌ Firebase 認證失敗:', error);
@@ -2682,7 +2871,7 @@ function initMainInteractiveMap(lat, lon, city, country) {
         });
         
         // 添加地圖瓦片 (灰黃配色)
-        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+        L.tileLayer(PI_TILE_URL, {
             attribution: ''
         }).addTo(mainInteractiveMap);
         
@@ -3113,7 +3302,7 @@ window.checkTrajectory = function() {
                     window.mainInteractiveMap = mainInteractiveMap;
                     
                     // 添加地圖瓦片
-                    L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+                    L.tileLayer(PI_TILE_URL, {
                         attribution: '© OpenStreetMap contributors'
                     }).addTo(mainInteractiveMap);
                     
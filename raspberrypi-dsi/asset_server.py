@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 本機網頁資源伺服器
+從本機版本化資源包提供 pi.html、pi-script*.js、pi-style.css 等檔案，開機到可互動不再受外網延遲影響
+- /v/<版本>/<檔案>：長效快取標頭（immutable），版本更新時網址改變
+- /<檔案>：導向目前版本（不快取），重新載入與預熱備用頁都會拿到最新版本
+- /api/*：轉送到線上 API；/api/config 以本機副本立即回應並在背景更新
+- /tiles/<z>/<x>/<y>.png：地圖圖磚（由 TileCache 提供，可選）
+背景定期比對線上版本，有變更時下載成新的版本目錄並切換
+"""
+
+import shutil
+import hashlib
+import logging
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.json': 'application/json; charset=utf-8',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.ico': 'image/x-icon',
+}
+
+# 轉送 API 時不複製的逐跳標頭（不要求壓縮：回應內容原樣轉回）
+_HOP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length', 'host',
+                'accept-encoding'}
+
+_CONFIG_ENDPOINT = '/api/config'
+
+# 未啟用圖磚快取時，/tiles/ 導向線上圖磚
+_TILE_FALLBACK = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'
+
+
+class AssetServer:
+    """本機版本化資源伺服器"""
+
+    def __init__(self, files: List[str], bundle_dir: str, origin: str, source_dir: Optional[str] = None,
+                 host: str = '127.0.0.1', port: int = 8766, update_interval: float = 6 * 3600,
+                 tile_cache=None):
+        """
+        Args:
+            files: 資源包內的相對路徑
+            bundle_dir: 版本化資源包的持久目錄
+            origin: 線上網站（更新檢查與 API 轉送）
+            source_dir: 首次啟動時用來建立資源包的本機檔案（例如專案目錄）
+            host: 監聽位址
+            port: 監聽埠
+            update_interval: 背景更新檢查間隔（秒）
+            tile_cache: 提供 /tiles/ 的 TileCache（可選）
+        """
+        self.files = files
+        self.bundle_dir = Path(bundle_dir)
+        self.origin = origin.rstrip('/')
+        self.source_dir = Path(source_dir) if source_dir else None
+        self.host = host
+        self.port = port
+        self.update_interval = update_interval
+        self.tile_cache = tile_cache
+
+        self.version: Optional[str] = None
+        # 上一個版本：更新前已載入的頁面仍會請求舊版本的資源
+        self.previous_version: Optional[str] = None
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._stop_event = threading.Event()
+        self._config_lock = threading.Lock()
+
+    def page_url(self, name: str) -> str:
+        """
+        頁面網址（導向目前版本）
+
+        Firebase Auth 預設只授權 localhost，因此網址使用 localhost 而非 127.0.0.1
+        """
+        return f"http://localhost:{self.port}/{name}"
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+
+    def start(self) -> bool:
+        """建立或載入資源包並開始提供服務"""
+        try:
+            self.bundle_dir.mkdir(parents=True, exist_ok=True)
+            self.version = self._read_current_version() or self._seed_bundle()
+            if not self.version:
+                logger.warning("本機資源包不存在且無法建立")
+                return False
+
+            self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+            self._httpd.daemon_threads = True
+        except OSError as e:
+            logger.warning(f"本機資源伺服器無法啟動: {e}")
+            return False
+
+        threading.Thread(target=self._httpd.serve_forever, name='AssetServer', daemon=True).start()
+        threading.Thread(target=self._update_loop, name='AssetUpdater', daemon=True).start()
+        logger.info(f"📦 本機資源伺服器已啟動: http://{self.host}:{self.port} (版本 {self.version})")
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    # ------------------------------------------------------------------
+    # 資源包
+    # ------------------------------------------------------------------
+
+    def _read_current_version(self) -> Optional[str]:
+        current = self.bundle_dir / 'current'
+        try:
+            version = current.read_text().strip()
+        except OSError:
+            return None
+        return version if (self.bundle_dir / version).is_dir() else None
+
+    def _seed_bundle(self) -> Optional[str]:
+        """首次啟動：從本機專案檔案建立資源包，沒有時從線上下載"""
+        contents = {}
+        if self.source_dir:
+            for name in self.files:
+                path = self.source_dir / name
+                if path.is_file():
+                    contents[name] = path.read_bytes()
+        if len(contents) < len(self.files):
+            logger.info("本機專案檔案不完整，從線上下載資源包")
+            contents = self._download_files()
+        return self._install(contents) if contents else None
+
+    def _download_files(self) -> Optional[Dict[str, bytes]]:
+        contents = {}
+        for name in self.files:
+            try:
+                with urllib.request.urlopen(f"{self.origin}/{name}", timeout=15) as response:
+                    contents[name] = response.read()
+            except (urllib.error.URLError, OSError) as e:
+                logger.warning(f"下載資源 {name} 失敗: {e}")
+                return None
+        return contents
+
+    @staticmethod
+    def _version_of(contents: Dict[str, bytes]) -> str:
+        digest = hashlib.sha256()
+        for name in sorted(contents):
+            digest.update(name.encode('utf-8'))
+            digest.update(hashlib.sha256(contents[name]).digest())
+        return digest.hexdigest()[:12]
+
+    def _install(self, contents: Dict[str, bytes]) -> str:
+        """寫入新的版本目錄並切換（先寫暫存目錄再改名，避免提供寫到一半的版本）"""
+        version = self._version_of(contents)
+        target = self.bundle_dir / version
+        if not target.is_dir():
+            staging = self.bundle_dir / f".{version}.tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            for name, data in contents.items():
+                path = staging / name
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(data)
+            staging.rename(target)
+
+        current_tmp = self.bundle_dir / 'current.tmp'
+        current_tmp.write_text(version)
+        current_tmp.replace(self.bundle_dir / 'current')
+
+        # 只保留目前與上一個版本
+        previous = self.version
+        for entry in self.bundle_dir.iterdir():
+            if entry.is_dir() and entry.name not in (version, previous):
+                shutil.rmtree(entry, ignore_errors=True)
+        return version
+
+    def _update_loop(self):
+        # 開機後稍候再做第一次檢查，不與頁面載入搶頻寬
+        delay = min(120, self.update_interval)
+        while not self._stop_event.wait(delay):
+            self.check_for_update()
+            delay = self.update_interval
+
+    def check_for_update(self) -> bool:
+        """
+        比對線上版本，有變更時安裝新版本
+
+        Returns:
+            bool: 是否切換到新版本
+        """
+        contents = self._download_files()
+        if not contents:
+            return False
+        version = self._version_of(contents)
+        if version == self.version:
+            return False
+        self.previous_version = self.version
+        self.version = self._install(contents)
+        logger.info(f"📦 本機資源包已更新到版本 {self.version}（下次載入頁面時生效）")
+        return True
+
+    # ------------------------------------------------------------------
+    # API 轉送
+    # ------------------------------------------------------------------
+
+    def _proxy(self, method: str, path: str, headers: Dict[str, str], body: Optional[bytes]):
+        request = urllib.request.Request(f"{self.origin}{path}", data=body, method=method, headers={
+            key: value for key, value in headers.items() if key.lower() not in _HOP_HEADERS
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, dict(e.headers), e.read()
+
+    def _config_response(self):
+        """
+        /api/config 會阻擋頁面渲染：有本機副本時立即回應並在背景更新
+        """
+        cache_file = self.bundle_dir / 'api-config.cache'
+        if cache_file.is_file():
+            threading.Thread(target=self._refresh_config, args=(cache_file,), daemon=True).start()
+            return 200, {'Content-Type': 'application/javascript; charset=utf-8'}, cache_file.read_bytes()
+        return self._refresh_config(cache_file)
+
+    def _refresh_config(self, cache_file: Path):
+        if not self._config_lock.acquire(blocking=False):
+            return 503, {}, b''
+        try:
+            status, headers, body = self._proxy('GET', _CONFIG_ENDPOINT, {}, None)
+            if status == 200 and body:
+                temp = cache_file.with_suffix('.tmp')
+                temp.write_bytes(body)
+                temp.replace(cache_file)
+            return status, headers, body
+        except (urllib.error.URLError, OSError) as e:
+            logger.debug(f"更新 /api/config 失敗: {e}")
+            return 502, {}, b''
+        finally:
+            self._config_lock.release()
+
+    # ------------------------------------------------------------------
+    # HTTP 處理
+    # ------------------------------------------------------------------
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                logger.debug(f"資源伺服器: {format % args}")
+
+            def _send(self, status: int, headers: Dict[str, str], body: bytes):
+                self.send_response(status)
+                for key, value in headers.items():
+                    if key.lower() not in _HOP_HEADERS:
+                        self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == _CONFIG_ENDPOINT:
+                    return self._send(*server._config_response())
+                if path.startswith('/api/'):
+                    return self._forward()
+                if path.startswith('/tiles/'):
+                    return self._serve_tile(path[len('/tiles/'):])
+
+                if path.startswith('/v/'):
+                    version, _, name = path[3:].partition('/')
+                    return self._serve_file(version, name)
+
+                # 未帶版本的網址導向目前版本
+                name = path.lstrip('/')
+                if name in server.files:
+                    location = f"/v/{server.version}/{name}"
+                    if '?' in self.path:
+                        location += '?' + self.path.split('?', 1)[1]
+                    return self._send(302, {'Location': location, 'Cache-Control': 'no-cache'}, b'')
+                return self._send(404, {}, b'')
+
+            do_HEAD = do_GET
+
+            def do_POST(self):
+                if self.path.startswith('/api/'):
+                    return self._forward()
+                return self._send(405, {}, b'')
+
+            def do_OPTIONS(self):
+                return self._forward()
+
+            def _forward(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else None
+                try:
+                    self._send(*server._proxy(self.command, self.path, dict(self.headers), body))
+                except (urllib.error.URLError, OSError) as e:
+                    logger.warning(f"API 轉送失敗 {self.path}: {e}")
+                    self._send(502, {}, b'')
+
+            def _serve_tile(self, name: str):
+                try:
+                    z, x, y = (int(part) for part in name[:-len('.png')].split('/'))
+                except ValueError:
+                    return self._send(404, {}, b'')
+                if not server.tile_cache:
+                    return self._send(302, {'Location': _TILE_FALLBACK.format(z=z, x=x, y=y)}, b'')
+                data = server.tile_cache.get(z, x, y)
+                if data is None:
+                    return self._send(504, {'Cache-Control': 'no-store'}, b'')
+                self._send(200, {'Content-Type': 'image/png', 'Cache-Control': 'public, max-age=2592000'}, data)
+
+            def _serve_file(self, version: str, name: str):
+                # 只提供已安裝的版本，版本片段不能指向資源包以外的目錄
+                if not version or version not in (server.version, server.previous_version):
+                    return self._send(404, {}, b'')
+                base = (server.bundle_dir / version).resolve()
+                path = (base / name).resolve()
+                if base not in path.parents or not path.is_file():
+                    return self._send(404, {}, b'')
+                self._send(200, {
+                    'Content-Type': _CONTENT_TYPES.get(path.suffix, 'application/octet-stream'),
+                    # 版本化網址內容不會改變，瀏覽器可永久快取
+                    'Cache-Control': 'public, max-age=31536000, immutable',
+                }, path.read_bytes())
+
+        return Handler
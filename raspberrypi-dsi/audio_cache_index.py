@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 音頻快取索引
+記錄每個快取音頻的格式、取樣率、長度、峰值與驗證結果（以 mmap 零複製解析文件頭，只計算一次）
+快取命中時直接使用索引資料，不再重新開啟或驗證文件
+"""
+
+import json
+import mmap
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'audio_index.json'
+
+# Layer III 位元率表 (kbps)：MPEG-1 與 MPEG-2/2.5
+_MP3_BITRATES_V1 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0]
+_MP3_BITRATES_V2 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0]
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+class AudioCacheIndex:
+    """音頻快取索引（記憶體為主，變更時寫回快取目錄）"""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.index_file = self.cache_dir / INDEX_FILENAME
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 查詢與更新
+    # ------------------------------------------------------------------
+
+    def get(self, audio_file: Path) -> Optional[Dict[str, Any]]:
+        """取得索引資料（不存取文件）"""
+        with self._lock:
+            entry = self._entries.get(audio_file.name)
+            return dict(entry) if entry else None
+
+    def describe(self, audio_file: Path) -> Dict[str, Any]:
+        """取得索引資料；若尚未索引則解析文件一次並記錄"""
+        entry = self.get(audio_file)
+        if entry is not None and 'valid' in entry:
+            return entry
+
+        # 尚未解析（或只有附加資料，例如 DSP 先寫入增益）：解析後保留既有的附加資料
+        entry = inspect_audio_file(audio_file)
+        with self._lock:
+            entry = dict(self._entries.get(audio_file.name, {}), **entry)
+            self._entries[audio_file.name] = entry
+            self._save_locked()
+        return dict(entry)
+
+    def update(self, audio_file: Path, **fields):
+        """更新索引中的附加資料（例如 DSP 增益）"""
+        # 先確保文件已被解析，避免只有附加資料的索引被誤判為無效
+        self.describe(audio_file)
+        with self._lock:
+            entry = self._entries.setdefault(audio_file.name, {})
+            entry.update(fields)
+            self._save_locked()
+
+    def is_valid(self, audio_file: Path) -> bool:
+        return self.describe(audio_file).get('valid', False)
+
+    def duration(self, audio_file: Path) -> Optional[float]:
+        return self.describe(audio_file).get('duration')
+
+    def invalidate(self, audio_file: Path):
+        """文件被覆寫或刪除時移除索引"""
+        with self._lock:
+            if self._entries.pop(audio_file.name, None) is not None:
+                self._save_locked()
+
+    def prune(self):
+        """移除已不存在文件的索引"""
+        with self._lock:
+            missing = [name for name in self._entries if not (self.cache_dir / name).exists()]
+            for name in missing:
+                del self._entries[name]
+            if missing:
+                self._save_locked()
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def _save_locked(self):
+        try:
+            temp_file = self.index_file.with_suffix('.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            temp_file.replace(self.index_file)
+        except OSError as e:
+            logger.debug(f"保存音頻快取索引失敗: {e}")
+
+
+# =============================================================================
+# 文件解析
+# =============================================================================
+
+def inspect_audio_file(audio_file: Path) -> Dict[str, Any]:
+    """以 mmap 解析音頻文件頭，返回格式資訊與驗證結果"""
+    entry: Dict[str, Any] = {'format': audio_file.suffix.lower().lstrip('.'), 'valid': False}
+    try:
+        with open(audio_file, 'rb') as f:
+            size = audio_file.stat().st_size
+            entry['size'] = size
+            if size == 0:
+                return entry
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:4] == b'RIFF':
+                    entry.update(_inspect_wav(mm))
+                else:
+                    entry.update(_inspect_mp3(mm, size))
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"解析音頻文件失敗 {audio_file.name}: {e}")
+    return entry
+
+
+def _inspect_wav(mm: mmap.mmap) -> Dict[str, Any]:
+    """走訪 RIFF chunks（只讀取 chunk 標頭，不複製音頻資料）"""
+    info: Dict[str, Any] = {'format': 'wav', 'valid': False}
+    if len(mm) < 12 or mm[8:12] != b'WAVE':
+        return info
+
+    riff_end = min(len(mm), 8 + struct.unpack_from('<I', mm, 4)[0])
+    offset = 12
+    fmt = None
+    data_offset = data_size = 0
+
+    while offset + 8 <= riff_end:
+        chunk_id = mm[offset:offset + 4]
+        chunk_size = struct.unpack_from('<I', mm, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b'fmt ' and chunk_size >= 16:
+            fmt = struct.unpack_from('<HHIIHH', mm, body)
+        elif chunk_id == b'data':
+            data_offset = body
+            data_size = min(chunk_size, len(mm) - body)
+        offset = body + chunk_size + (chunk_size & 1)  # 對齊到偶數字節邊界
+
+    if fmt is None or data_size <= 0:
+        return info
+
+    audio_format, channels, sample_rate, byte_rate, block_align, bits = fmt
+    info.update({
+        'valid': True,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'bits_per_sample': bits,
+        'duration': round(data_size / byte_rate, 3) if byte_rate else None,
+        'peak_dbfs': _pcm16_peak(mm, data_offset, data_size) if audio_format == 1 and bits == 16 else None,
+    })
+    return info
+
+
+def _pcm16_peak(mm: mmap.mmap, offset: int, size: int) -> Optional[float]:
+    """以 numpy 直接檢視 mmap 的 16-bit PCM 峰值（零複製）"""
+    if not NUMPY_AVAILABLE:
+        return None
+    samples = np.frombuffer(mm, dtype='<i2', count=size // 2, offset=offset)
+    peak = max(int(samples.max()), -int(samples.min())) if len(samples) else 0
+    del samples  # 釋放對 mmap 的參照，讓 mmap 可以關閉
+    if peak == 0:
+        return -120.0
+    return round(20 * float(np.log10(peak / 32768.0)), 2)
+
+
+def _inspect_mp3(mm: mmap.mmap, size: int) -> Dict[str, Any]:
+    """解析第一個 MP3 frame 標頭並以位元率估算長度"""
+    info: Dict[str, Any] = {'format': 'mp3', 'valid': size > 1000}  # 至少 1KB
+
+    offset = 0
+    if mm[:3] == b'ID3' and size >= 10:
+        tag = mm[6:10]
+        offset = 10 + ((tag[0] & 0x7f) << 21 | (tag[1] & 0x7f) << 14 | (tag[2] & 0x7f) << 7 | (tag[3] & 0x7f))
+
+    limit = min(size - 4, offset + 65536)
+    while 0 <= offset < limit:
+        offset = mm.find(b'\xff', offset, limit)
+        if offset < 0:
+            break
+        if (mm[offset + 1] & 0xE0) == 0xE0:
+            header = struct.unpack_from('>I', mm, offset)[0]
+            version = (header >> 19) & 0x3
+            table = _MP3_BITRATES_V1 if version == 3 else _MP3_BITRATES_V2
+            bitrate = table[(header >> 12) & 0xF]
+            rate_index = (header >> 10) & 0x3
+            if version in _MP3_SAMPLE_RATES and bitrate and rate_index < 3:
+                info['sample_rate'] = _MP3_SAMPLE_RATES[version][rate_index]
+                info['channels'] = 1 if ((header >> 6) & 0x3) == 3 else 2
+                # 以固定位元率估算長度
+                info['duration'] = round((size - offset) * 8 / (bitrate * 1000), 3)
+                break
+        offset += 1
+    return info
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 記憶體內音頻處理 (DSP)
+以 NumPy 向量化處理 PCM 陣列：重新取樣、等化、壓縮與響度 (LUFS) / 峰值標準化
+處理結果不回寫文件，增益資訊由呼叫端存入音頻快取索引
+"""
+
+import json
+import logging
+from typing import Optional, Dict, Any, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 低於此響度的區塊視為靜音（ITU-R BS.1770 絕對門檻）
+ABSOLUTE_GATE_LUFS = -70.0
+# 相對門檻（低於整體響度 10 LU 的區塊不計入）
+RELATIVE_GATE_LU = -10.0
+
+
+# =============================================================================
+# 格式轉換
+# =============================================================================
+
+def to_float(pcm: 'np.ndarray') -> 'np.ndarray':
+    """整數 PCM 轉為 (樣本數, 聲道數) 的 float32，範圍 [-1, 1]"""
+    samples = np.asarray(pcm)
+    if samples.ndim == 1:
+        samples = samples[:, np.newaxis]
+    if np.issubdtype(samples.dtype, np.integer):
+        scale = float(np.iinfo(samples.dtype).max) + 1.0
+        return samples.astype(np.float32) / scale
+    return samples.astype(np.float32)
+
+
+def to_int16(samples: 'np.ndarray', mono: bool = False) -> 'np.ndarray':
+    """float 陣列轉回 int16 PCM"""
+    pcm = np.clip(samples * 32768.0, -32768, 32767).astype(np.int16)
+    return pcm[:, 0].copy() if mono else np.ascontiguousarray(pcm)
+
+
+# =============================================================================
+# 基本處理
+# =============================================================================
+
+def resample(samples: 'np.ndarray', source_rate: int, target_rate: int) -> 'np.ndarray':
+    """線性內插重新取樣（語音用途已足夠）"""
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    duration = len(samples) / source_rate
+    target_length = max(1, int(round(duration * target_rate)))
+    source_times = np.arange(len(samples)) / source_rate
+    target_times = np.arange(target_length) / target_rate
+    return np.stack(
+        [np.interp(target_times, source_times, samples[:, ch]) for ch in range(samples.shape[1])],
+        axis=1
+    ).astype(np.float32)
+
+
+def _biquad_magnitude(b: Tuple[float, float, float], a: Tuple[float, float, float],
+                      freqs: 'np.ndarray', rate: int) -> 'np.ndarray':
+    """計算雙二階濾波器在指定頻率的幅度響應"""
+    z = np.exp(-1j * 2 * np.pi * freqs / rate)
+    numerator = b[0] + b[1] * z + b[2] * z * z
+    denominator = a[0] + a[1] * z + a[2] * z * z
+    return np.abs(numerator / denominator)
+
+
+def _peaking_coeffs(freq: float, gain_db: float, q: float, rate: int):
+    """RBJ cookbook 峰值等化器係數"""
+    amp = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * freq / rate
+    alpha = np.sin(w0) / (2 * q)
+    b = (1 + alpha * amp, -2 * np.cos(w0), 1 - alpha * amp)
+    a = (1 + alpha / amp, -2 * np.cos(w0), 1 - alpha / amp)
+    return b, a
+
+
+def _high_shelf_coeffs(freq: float, gain_db: float, q: float, rate: int):
+    """RBJ cookbook 高架濾波器係數"""
+    amp = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * freq / rate
+    alpha = np.sin(w0) / (2 * q)
+    cos_w0 = np.cos(w0)
+    sqrt_amp = 2 * np.sqrt(amp) * alpha
+    b = (amp * ((amp + 1) + (amp - 1) * cos_w0 + sqrt_amp),
+         -2 * amp * ((amp - 1) + (amp + 1) * cos_w0),
+         amp * ((amp + 1) + (amp - 1) * cos_w0 - sqrt_amp))
+    a = ((amp + 1) - (amp - 1) * cos_w0 + sqrt_amp,
+         2 * ((amp - 1) - (amp + 1) * cos_w0),
+         (amp + 1) - (amp - 1) * cos_w0 - sqrt_amp)
+    return b, a
+
+
+def _high_pass_coeffs(freq: float, q: float, rate: int):
+    """RBJ cookbook 高通濾波器係數"""
+    w0 = 2 * np.pi * freq / rate
+    alpha = np.sin(w0) / (2 * q)
+    cos_w0 = np.cos(w0)
+    b = ((1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2)
+    a = (1 + alpha, -2 * cos_w0, 1 - alpha)
+    return b, a
+
+
+def _apply_response(samples: 'np.ndarray', rate: int, response) -> 'np.ndarray':
+    """在頻域套用零相位幅度響應（整段 FFT，向量化）"""
+    if len(samples) == 0:
+        return samples
+    spectrum = np.fft.rfft(samples, axis=0)
+    freqs = np.fft.rfftfreq(len(samples), d=1.0 / rate)
+    spectrum *= response(freqs)[:, np.newaxis]
+    return np.fft.irfft(spectrum, n=len(samples), axis=0).astype(np.float32)
+
+
+def equalize(samples: 'np.ndarray', rate: int, freq: float, gain_db: float, q: float) -> 'np.ndarray':
+    """峰值等化（對應原本 sox 的 equalizer 參數）"""
+    if gain_db == 0:
+        return samples
+    b, a = _peaking_coeffs(freq, gain_db, q, rate)
+    return _apply_response(samples, rate, lambda f: _biquad_magnitude(b, a, f, rate))
+
+
+def compress(samples: 'np.ndarray', rate: int, threshold_db: float, ratio: float,
+             window_ms: float = 10, smoothing_ms: float = 50) -> 'np.ndarray':
+    """以區塊 RMS 包絡計算增益的壓縮器（向量化近似 attack/release）"""
+    if ratio <= 1 or len(samples) == 0:
+        return samples
+    window = max(1, int(rate * window_ms / 1000))
+    blocks = -(-len(samples) // window)
+    padded = np.zeros((blocks * window, samples.shape[1]), dtype=np.float32)
+    padded[:len(samples)] = samples
+
+    rms = np.sqrt(np.mean(padded.reshape(blocks, window, -1) ** 2, axis=(1, 2)) + 1e-12)
+    level_db = 20 * np.log10(rms)
+    gain_db = np.minimum(0.0, (threshold_db - level_db) * (1 - 1 / ratio))
+
+    smooth = max(1, int(smoothing_ms / window_ms))
+    if smooth > 1:
+        kernel = np.ones(smooth) / smooth
+        gain_db = np.convolve(np.pad(gain_db, (smooth - 1, 0), mode='edge'), kernel, mode='valid')
+
+    centers = (np.arange(blocks) + 0.5) * window
+    sample_gain = 10 ** (np.interp(np.arange(len(samples)), centers, gain_db) / 20)
+    return (samples * sample_gain[:, np.newaxis]).astype(np.float32)
+
+
+# =============================================================================
+# 響度量測
+# =============================================================================
+
+def _k_weighting(freqs: 'np.ndarray', rate: int) -> 'np.ndarray':
+    """ITU-R BS.1770 K 加權（高架預濾波 + RLB 高通）"""
+    shelf_b, shelf_a = _high_shelf_coeffs(1500.0, 4.0, 1 / np.sqrt(2), rate)
+    hp_b, hp_a = _high_pass_coeffs(38.0, 0.5, rate)
+    return _biquad_magnitude(shelf_b, shelf_a, freqs, rate) * _biquad_magnitude(hp_b, hp_a, freqs, rate)
+
+
+def integrated_loudness(samples: 'np.ndarray', rate: int) -> float:
+    """計算整合響度 (LUFS)，400ms 區塊、75% 重疊、絕對與相對門檻"""
+    weighted = _apply_response(samples, rate, lambda f: _k_weighting(f, rate))
+    block = int(rate * 0.4)
+    step = int(rate * 0.1)
+    if len(weighted) < block:
+        block = step = len(weighted)
+    if block == 0:
+        return ABSOLUTE_GATE_LUFS
+
+    # 以累積和取得每個區塊的能量
+    energy = np.concatenate([np.zeros(1), np.cumsum(np.sum(weighted.astype(np.float64) ** 2, axis=1))])
+    starts = np.arange(0, len(weighted) - block + 1, step)
+    mean_square = (energy[starts + block] - energy[starts]) / block
+    block_loudness = -0.691 + 10 * np.log10(mean_square + 1e-12)
+
+    gated = mean_square[block_loudness > ABSOLUTE_GATE_LUFS]
+    if len(gated) == 0:
+        return ABSOLUTE_GATE_LUFS
+    relative_gate = -0.691 + 10 * np.log10(np.mean(gated)) + RELATIVE_GATE_LU
+    gated = mean_square[(block_loudness > ABSOLUTE_GATE_LUFS) & (block_loudness > relative_gate)]
+    if len(gated) == 0:
+        return ABSOLUTE_GATE_LUFS
+    return float(-0.691 + 10 * np.log10(np.mean(gated)))
+
+
+def peak_dbfs(samples: 'np.ndarray') -> float:
+    """取樣峰值 (dBFS)"""
+    peak = float(np.max(np.abs(samples))) if len(samples) else 0.0
+    return 20 * float(np.log10(peak)) if peak > 0 else -120.0
+
+
+# =============================================================================
+# 處理流程
+# =============================================================================
+
+def settings_key(settings: Dict[str, Any]) -> str:
+    """處理參數的穩定字串，用於判斷 metadata 是否仍有效"""
+    return json.dumps(settings, sort_keys=True)
+
+
+def process(pcm: 'np.ndarray', rate: int, settings: Dict[str, Any],
+            gain_db: Optional[float] = None, target_rate: Optional[int] = None
+            ) -> Tuple['np.ndarray', Dict[str, Any]]:
+    """
+    完整處理鏈：重新取樣 → 等化 → 壓縮 → 響度/峰值標準化
+
+    Args:
+        pcm: 整數 PCM 陣列（單聲道或 (樣本數, 聲道數)）
+        rate: 取樣率
+        settings: AUDIO_CONFIG['dsp'] 處理參數
+        gain_db: 已快取的標準化增益；為 None 時重新量測
+        target_rate: 目標取樣率（可選）
+
+    Returns:
+        Tuple[np.ndarray, Dict]: (處理後的 int16 PCM, 增益 metadata)
+    """
+    mono = np.asarray(pcm).ndim == 1
+    samples = to_float(pcm)
+
+    if target_rate and target_rate != rate:
+        samples = resample(samples, rate, target_rate)
+        rate = target_rate
+
+    samples = equalize(samples, rate, settings['eq_freq'], settings['eq_gain_db'], settings['eq_q'])
+    samples = compress(samples, rate, settings['compressor_threshold_db'], settings['compressor_ratio'])
+
+    metadata = None
+    if gain_db is None:
+        loudness = integrated_loudness(samples, rate)
+        peak = peak_dbfs(samples)
+        gain_db = settings['target_lufs'] - loudness
+        # 增益不可讓峰值超過上限
+        gain_db = float(min(gain_db, settings['peak_dbfs'] - peak, settings['max_gain_db']))
+        metadata = {
+            'loudness_lufs': round(loudness, 2),
+            'peak_dbfs': round(peak, 2),
+            'gain_db': round(gain_db, 2),
+            'settings': settings_key(settings),
+        }
+
+    samples *= 10 ** (gain_db / 20)
+    limit = 10 ** (settings['peak_dbfs'] / 20)
+    np.clip(samples, -limit, limit, out=samples)
+    return to_int16(samples, mono=mono), metadata
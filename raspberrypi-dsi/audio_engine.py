@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 常駐音頻輸出引擎
+單一開啟的輸出設備、記憶體中已解碼的音頻佇列、事件式完成回調與預載提示音
+播放時量測排程停頓（疑似 underrun）與啟動延遲，在範圍內自動調整緩衝區大小與執行緒優先權
+"""
+
+import os
+import json
+import math
+import time
+import queue
+import array
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Optional, Callable, Dict, Tuple, Union, List, Any
+
+from lazy_imports import lazy_module, module_available
+
+# pygame 在輸出引擎啟動時才載入
+PYGAME_AVAILABLE = module_available('pygame')
+pygame = lazy_module('pygame')
+
+logger = logging.getLogger(__name__)
+
+# 自動調整緩衝區時，播放期間量測排程停頓的取樣間隔（秒）
+POLL_INTERVAL = 0.02
+
+# SDL 音頻執行緒名稱前綴（/proc/self/task/*/comm）
+SDL_AUDIO_THREAD_PREFIX = 'SDLAudio'
+
+
+class PlaybackRequest:
+    """播放請求，可等待完成或註冊完成回調"""
+
+    def __init__(self, source: Union[Path, 'pygame.mixer.Sound'],
+                 on_complete: Optional[Callable[[bool], None]] = None):
+        self.source = source
+        self.on_complete = on_complete
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.success = False
+        self.cancelled = False
+        # stop() 打斷這個請求（每個請求各自一個，不會被下一個請求清除）
+        self.interrupt = threading.Event()
+        # 加入佇列時的 stop() 世代，較舊的請求即使已被播放執行緒取出也不播放
+        self.generation = 0
+        self.enqueued_at = time.monotonic()
+        self.start_latency: Optional[float] = None
+        self.underruns = 0
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待播放結束，返回播放是否成功"""
+        self.done.wait(timeout)
+        return self.done.is_set() and self.success
+
+    def _finish(self, success: bool):
+        self.success = success
+        # 未開始就結束（取消或失敗）時也喚醒等待開始的執行緒；start_latency 為 None 表示未實際開始
+        self.started.set()
+        self.done.set()
+        if self.on_complete:
+            try:
+                self.on_complete(success)
+            except Exception as e:
+                logger.warning(f"播放完成回調失敗: {e}")
+
+
+class AudioOutputEngine:
+    """常駐音頻輸出引擎（pygame mixer 只開啟一次）"""
+
+    def __init__(self, sample_rate: int = 44100, channels: int = 2,
+                 buffer: int = 512, decoded_cache_size: int = 4,
+                 processor: Optional[Callable[['pygame.mixer.Sound', Path], 'pygame.mixer.Sound']] = None,
+                 adaptive: Optional[Dict[str, Any]] = None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.buffer = buffer
+        self.decoded_cache_size = decoded_cache_size
+        # 解碼後、放入快取前的處理（例如響度標準化）
+        self.processor = processor
+        # 自動調整緩衝區與優先權的範圍（None 表示固定設定）
+        self.adaptive = adaptive
+
+        self.initialized = False
+        self.volume = 1.0
+        self.speech_channel = None
+        self.earcon_channel = None
+
+        self._queue: "queue.Queue[Optional[PlaybackRequest]]" = queue.Queue()
+        self._current: Optional[PlaybackRequest] = None
+        # stop() 的次數；與 _current 一起由 _state_lock 保護
+        self._generation = 0
+        self._state_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._decoded: "OrderedDict[Tuple[str, int], pygame.mixer.Sound]" = OrderedDict()
+        self._decoded_lock = threading.Lock()
+        self._earcons: Dict[str, 'pygame.mixer.Sound'] = {}
+        self._earcon_specs: Dict[str, Tuple[int, float, float]] = {}
+        self._silences: Dict[int, 'pygame.mixer.Sound'] = {}
+        # 重新開啟設備時，避免其他執行緒同時解碼或播放
+        self._mixer_lock = threading.RLock()
+
+        self._nice = 0
+        self._clean_clips = 0
+        self._priority_warned = False
+        self.stats: Dict[str, Any] = {
+            'buffer': buffer,
+            'clips': 0,
+            'underruns': 0,
+            'last_clip_underruns': 0,
+            'start_latency_last': None,
+            'start_latency_avg': None,
+            'start_latency_max': None,
+            'buffer_changes': 0,
+            'nice': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+
+    def start(self) -> bool:
+        """開啟輸出設備並啟動播放執行緒"""
+        if not PYGAME_AVAILABLE:
+            logger.warning("pygame 未安裝，無法啟動音頻輸出引擎")
+            return False
+        try:
+            self._open_mixer()
+
+            self._worker = threading.Thread(target=self._run, name='AudioOutputEngine', daemon=True)
+            self._worker.start()
+            self.initialized = True
+            logger.info(f"🔊 音頻輸出引擎已啟動 ({self.sample_rate}Hz, buffer={self.buffer})")
+            return True
+
+        except Exception as e:
+            logger.warning(f"音頻輸出引擎啟動失敗: {e}")
+            return False
+
+    def _open_mixer(self):
+        """以目前的緩衝區大小開啟輸出設備"""
+        pygame.mixer.pre_init(
+            frequency=self.sample_rate,
+            size=-16,
+            channels=self.channels,
+            buffer=self.buffer
+        )
+        pygame.mixer.init()
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), 2))
+        self.speech_channel = pygame.mixer.Channel(0)
+        self.earcon_channel = pygame.mixer.Channel(1)
+        pygame.mixer.set_reserved(2)
+
+    def _reopen_mixer(self, buffer: int):
+        """以新的緩衝區大小重新開啟設備（只在佇列空閒時由播放執行緒呼叫）"""
+        with self._mixer_lock:
+            pygame.mixer.quit()
+            self.buffer = buffer
+            # 舊設備的 Sound 物件已失效，需重新解碼
+            with self._decoded_lock:
+                self._decoded.clear()
+            self._silences.clear()
+            self._open_mixer()
+            self._earcons.clear()
+            for name, (frequency, duration, volume) in self._earcon_specs.items():
+                self.register_earcon(name, frequency, duration, volume)
+
+    def shutdown(self):
+        """停止播放並關閉輸出設備"""
+        if not self.initialized:
+            return
+        self.stop()
+        self._queue.put(None)
+        if self._worker:
+            self._worker.join(timeout=2)
+        try:
+            pygame.mixer.quit()
+        except Exception:
+            pass
+        self.initialized = False
+        logger.info("音頻輸出引擎已關閉")
+
+    # ------------------------------------------------------------------
+    # 解碼與預載
+    # ------------------------------------------------------------------
+
+    def load(self, audio_file: Path) -> Optional['pygame.mixer.Sound']:
+        """將音頻文件解碼到記憶體（以路徑與修改時間快取）"""
+        try:
+            key = (str(audio_file), audio_file.stat().st_mtime_ns)
+        except OSError:
+            return None
+
+        with self._decoded_lock:
+            sound = self._decoded.get(key)
+            if sound is not None:
+                self._decoded.move_to_end(key)
+                return sound
+
+        try:
+            with self._mixer_lock:
+                sound = pygame.mixer.Sound(str(audio_file))
+        except Exception as e:
+            logger.debug(f"解碼音頻失敗 {audio_file.name}: {e}")
+            return None
+
+        if self.processor:
+            try:
+                sound = self.processor(sound, audio_file)
+            except Exception as e:
+                logger.warning(f"音頻處理失敗，使用原始音頻: {e}")
+
+        with self._decoded_lock:
+            self._decoded[key] = sound
+            while len(self._decoded) > self.decoded_cache_size:
+                self._decoded.popitem(last=False)
+        return sound
+
+    def preload(self, audio_file: Path) -> bool:
+        """預先解碼音頻，讓之後的播放不必讀取文件"""
+        return self.initialized and self.load(audio_file) is not None
+
+    def register_earcon(self, name: str, frequency: int, duration: float, volume: float = 0.5):
+        """產生正弦波提示音並常駐於記憶體"""
+        if not self.initialized:
+            return
+        self._earcon_specs[name] = (frequency, duration, volume)
+        sample_rate, _, mixer_channels = pygame.mixer.get_init()
+        frames = int(sample_rate * duration)
+        fade = max(1, int(sample_rate * 0.005))  # 5ms 淡入淡出，避免爆音
+        amplitude = int(32767 * volume)
+
+        samples = array.array('h')
+        for i in range(frames):
+            envelope = min(1.0, i / fade, (frames - i) / fade)
+            value = int(amplitude * envelope * math.sin(2 * math.pi * frequency * i / sample_rate))
+            samples.extend([value] * mixer_channels)
+
+        self._earcons[name] = pygame.mixer.Sound(buffer=samples.tobytes())
+
+    def has_earcon(self, name: str) -> bool:
+        return name in self._earcons
+
+    def silence(self, duration: float) -> Optional['pygame.mixer.Sound']:
+        """取得指定長度的靜音（依毫秒快取）"""
+        if not self.initialized or duration <= 0:
+            return None
+        millis = int(duration * 1000)
+        sound = self._silences.get(millis)
+        if sound is None:
+            sample_rate, _, mixer_channels = pygame.mixer.get_init()
+            frames = sample_rate * millis // 1000
+            sound = pygame.mixer.Sound(buffer=bytes(frames * mixer_channels * 2))
+            self._silences[millis] = sound
+        return sound
+
+    # ------------------------------------------------------------------
+    # 播放
+    # ------------------------------------------------------------------
+
+    def enqueue(self, source: Union[Path, 'pygame.mixer.Sound'],
+                on_complete: Optional[Callable[[bool], None]] = None) -> PlaybackRequest:
+        """將音頻加入播放佇列，立即返回播放請求"""
+        request = PlaybackRequest(source, on_complete)
+        with self._state_lock:
+            request.generation = self._generation
+        if not self.initialized:
+            request._finish(False)
+            return request
+        if isinstance(source, Path):
+            # 在呼叫端執行緒先行解碼，播放執行緒只負責送出緩衝區
+            self.load(source)
+        self._queue.put(request)
+        return request
+
+    def play(self, audio_file: Path, timeout: Optional[float] = None) -> bool:
+        """播放音頻並等待完成"""
+        return self.enqueue(audio_file).wait(timeout)
+
+    def play_sequence(self, audio_files: List[Path], gap: float = 0.0,
+                      timeout: Optional[float] = None) -> bool:
+        """依序播放多段音頻（段落間插入靜音）並等待全部完成"""
+        requests = []
+        for index, audio_file in enumerate(audio_files):
+            if index and gap > 0:
+                requests.append(self.enqueue(self.silence(gap)))
+            requests.append(self.enqueue(audio_file))
+        # 任一段被中斷時後續段落也會被 stop() 清除
+        return all(request.wait(timeout) for request in requests)
+
+    def play_earcon(self, name: str) -> bool:
+        """在獨立聲道播放預載提示音（不阻塞、不進入語音佇列）"""
+        with self._mixer_lock:
+            sound = self._earcons.get(name)
+            if not self.initialized or sound is None:
+                return False
+            self.earcon_channel.play(sound)
+        return True
+
+    def set_volume(self, volume: float):
+        """設定語音聲道音量（0.0 - 1.0，系統沒有音量控制時使用）"""
+        self.volume = max(0.0, min(1.0, volume))
+        if self.speech_channel:
+            self.speech_channel.set_volume(self.volume)
+
+    def stop(self):
+        """停止目前播放並清空佇列"""
+        drained = []
+        with self._state_lock:
+            # 播放執行緒剛取出、尚未開始播放的請求屬於舊世代，不會播放
+            self._generation += 1
+            while True:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is not None:
+                    drained.append(request)
+            current = self._current
+            if current is not None:
+                current.cancelled = True
+                current.interrupt.set()
+        for request in drained:
+            request.cancelled = True
+            request._finish(False)
+        if self.speech_channel:
+            self.speech_channel.stop()
+
+    def is_busy(self) -> bool:
+        return self._current is not None or not self._queue.empty()
+
+    def _run(self):
+        """播放執行緒：依序播放佇列中的音頻"""
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+
+            with self._state_lock:
+                if request.generation != self._generation:
+                    request.cancelled = True
+                else:
+                    self._current = request
+            if request.cancelled:
+                request._finish(False)
+                continue
+
+            success = False
+            try:
+                sound = request.source
+                if isinstance(sound, Path):
+                    sound = self.load(sound)
+                if sound is not None and not request.interrupt.is_set():
+                    self.speech_channel.play(sound)
+                    self.speech_channel.set_volume(self.volume)
+                    request.start_latency = time.monotonic() - request.enqueued_at
+                    request.started.set()
+                    interrupted = self._wait_playback(sound.get_length(), request)
+                    if interrupted:
+                        # stop() 可能在 play() 之前就停止了聲道，這裡再停一次
+                        self.speech_channel.stop()
+                    success = not interrupted
+            except Exception as e:
+                logger.error(f"音頻輸出引擎播放失敗: {e}")
+            finally:
+                self._current = None
+                request._finish(success)
+
+            if request.start_latency is not None:
+                self._record(request)
+                if self.adaptive and self._queue.empty():
+                    self._adapt(request.underruns)
+
+    def _wait_playback(self, length: float, request: PlaybackRequest) -> bool:
+        """
+        等待播放結束；自動調整緩衝區時同時量測排程停頓
+
+        播放執行緒晚醒的時間超過一個緩衝區週期時，SDL 音頻執行緒很可能同樣沒有被排程到，
+        視為一次疑似 underrun
+
+        Returns:
+            bool: 是否被 stop() 打斷
+        """
+        period = self.buffer / self.sample_rate
+        if not self.adaptive:
+            # 不量測停頓：等到音頻長度結束（stop() 立即喚醒），再等緩衝區中的尾端播完
+            if request.interrupt.wait(length):
+                return True
+            while self.speech_channel.get_busy():
+                if request.interrupt.wait(max(period, 0.01)):
+                    return True
+            return False
+
+        stall_limit = period * (self.adaptive or {}).get('stall_factor', 1.0)
+        end = time.monotonic() + length
+        last = time.monotonic()
+        while True:
+            if request.interrupt.wait(POLL_INTERVAL):
+                return True
+            now = time.monotonic()
+            if now - last - POLL_INTERVAL > stall_limit:
+                request.underruns += 1
+            last = now
+            if now >= end and not self.speech_channel.get_busy():
+                return False
+
+    # ------------------------------------------------------------------
+    # 健康統計與自動調整
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得音頻健康統計"""
+        return dict(self.stats)
+
+    def _record(self, request: PlaybackRequest):
+        stats = self.stats
+        stats['clips'] += 1
+        stats['underruns'] += request.underruns
+        stats['last_clip_underruns'] = request.underruns
+        latency = round(request.start_latency, 4)
+        stats['start_latency_last'] = latency
+        previous = stats['start_latency_avg']
+        # 指數移動平均
+        stats['start_latency_avg'] = latency if previous is None else round(previous * 0.8 + latency * 0.2, 4)
+        stats['start_latency_max'] = max(latency, stats['start_latency_max'] or 0)
+        if request.underruns:
+            logger.warning(f"⚠️ 播放期間偵測到 {request.underruns} 次疑似 underrun (buffer={self.buffer})")
+        self._write_health()
+
+    def _adapt(self, underruns: int):
+        """依最近一段的 underrun 調整緩衝區與優先權（在上下限之內）"""
+        config = self.adaptive
+        if underruns:
+            self._clean_clips = 0
+            self._raise_priority()
+            if self.buffer < config['max_buffer']:
+                self._resize_buffer(min(self.buffer * 2, config['max_buffer']))
+            return
+
+        self._clean_clips += 1
+        if self._clean_clips >= config['clean_clips_to_shrink'] and self.buffer > config['min_buffer']:
+            self._clean_clips = 0
+            self._resize_buffer(max(self.buffer // 2, config['min_buffer']))
+
+    def _resize_buffer(self, buffer: int):
+        previous = self.buffer
+        try:
+            self._reopen_mixer(buffer)
+            self.stats['buffer'] = buffer
+            self.stats['buffer_changes'] += 1
+            logger.info(f"🎚️ 音頻緩衝區調整: {previous} → {buffer}")
+        except Exception as e:
+            logger.error(f"調整音頻緩衝區失敗，恢復 {previous}: {e}")
+            self._reopen_mixer(previous)
+        self._write_health()
+
+    def _raise_priority(self):
+        """提高播放執行緒與 SDL 音頻執行緒的優先權（nice 值不低於下限）"""
+        target = max(self._nice - 5, self.adaptive['min_nice'])
+        if target == self._nice:
+            return
+        thread_ids = [threading.get_native_id()]
+        try:
+            for task in Path('/proc/self/task').iterdir():
+                comm = (task / 'comm').read_text().strip()
+                if comm.startswith(SDL_AUDIO_THREAD_PREFIX):
+                    thread_ids.append(int(task.name))
+        except OSError:
+            pass
+
+        try:
+            for tid in thread_ids:
+                os.setpriority(os.PRIO_PROCESS, tid, target)
+            self._nice = target
+            self.stats['nice'] = target
+            logger.info(f"🎚️ 音頻執行緒優先權提高: nice={target} ({len(thread_ids)} 個執行緒)")
+        except (OSError, AttributeError) as e:
+            if not self._priority_warned:
+                logger.warning(f"無法提高音頻執行緒優先權（需要 CAP_SYS_NICE）: {e}")
+                self._priority_warned = True
+
+    def _write_health(self):
+        """寫出健康統計供現場檢查（位於 RAM，不寫入 SD 卡）"""
+        health_file = (self.adaptive or {}).get('health_file')
+        if not health_file:
+            return
+        try:
+            with open(health_file, 'w', encoding='utf-8') as f:
+                json.dump(dict(self.stats, updated=time.time()), f)
+        except OSError as e:
+            logger.debug(f"寫出音頻健康統計失敗: {e}")
@@ -11,27 +11,32 @@ import threading
 import logging
 import hashlib
 import subprocess
-import struct
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from datetime import datetime
+from typing import Optional, Dict, Any, Tuple, List, Callable, Union
 
-try:
-    import pyttsx3
-    PYTTSX3_AVAILABLE = True
-except ImportError:
-    PYTTSX3_AVAILABLE = False
+from lazy_imports import lazy_module, module_available, preload
 
-try:
-    import pygame
-    PYGAME_AVAILABLE = True
-except ImportError:
-    PYGAME_AVAILABLE = False
+# 大型選用套件延後到第一次使用時才載入（openai 在 Pi 上載入需要數秒）
+PYTTSX3_AVAILABLE = module_available('pyttsx3')
+pyttsx3 = lazy_module('pyttsx3')
 
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+PYGAME_AVAILABLE = module_available('pygame')
+pygame = lazy_module('pygame')
+
+OPENAI_AVAILABLE = module_available('openai')
+openai = lazy_module('openai')
+
+from festival_server import FestivalServer
+from audio_engine import AudioOutputEngine
+from audio_process import AudioProcessClient
+from capability_registry import CapabilityRegistry
+from audio_cache_index import AudioCacheIndex
+from audio_store import TieredAudioStore
+from story_pregenerator import StoryPregenerator, find_city
+from story_stream import StoryStreamConsumer, split_first_sentence
+from tts_scheduler import LatencyModel, TTSScheduler
+import audio_dsp
 
 from config import (
     AUDIO_CONFIG, 
@@ -39,21 +44,69 @@ from config import (
     SPEAKER_CONFIG,
     MORNING_GREETINGS,
     TTS_LANGUAGE_MAP,
-    AUDIO_FILES
+    AUDIO_FILES,
+    API_ENDPOINTS,
+    PREGENERATION_CONFIG
 )
 
+class SegmentedAudio:
+    """由多段快取音頻組成、播放時才串接的音頻（例如問候語 + 故事）"""
+    
+    def __init__(self, segments: List[Path], gap: float = 0.0):
+        self.segments = list(segments)
+        self.gap = gap
+    
+    @property
+    def name(self) -> str:
+        return ' + '.join(segment.name for segment in self.segments)
+    
+    def exists(self) -> bool:
+        return bool(self.segments) and all(segment.exists() for segment in self.segments)
+
+
 class AudioManager:
     """音頻管理器"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.tts_engine = None
+        self._openai_client = None
+        self._openai_enabled = False
+        self._openai_lock = threading.Lock()
+        self.festival_server = None
+        self.output_engine = None
+        self.pregenerator = None
         self.audio_initialized = False
         self.current_volume = AUDIO_CONFIG['volume']
-        self.cache_dir = Path(TTS_CONFIG['cache_dir'])
         
-        # 確保快取目錄存在
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # 分層音頻儲存：快取目錄位於 RAM，持久層在背景壓縮寫入
+        storage = AUDIO_CONFIG['storage']
+        self.audio_store = TieredAudioStore(
+            ram_dir=Path(TTS_CONFIG['cache_dir']),
+            persistent_dir=Path(storage['persistent_dir']),
+            ram_max_bytes=storage['ram_max_mb'] * 1024 * 1024,
+            ram_min_age=storage['ram_min_age'],
+            persistent_max_files=storage['persistent_max_files'],
+            codec=storage['persistent_codec'],
+            on_evict=self._on_audio_evicted
+        )
+        self.audio_store.start()
+        self.cache_dir = self.audio_store.ram_dir
+        
+        # 快取音頻的格式、長度與驗證結果索引
+        self.audio_index = AudioCacheIndex(self.cache_dir)
+        
+        # 各 TTS 引擎/模型的延遲記錄，用於依期限選擇模型與競速
+        self.tts_scheduler = TTSScheduler(
+            # 記錄保存在持久層（重開機後保留），由背景寫入執行緒寫出
+            LatencyModel(self.audio_store.persistent_dir / 'tts_latency.json', schedule_save=self.audio_store.defer),
+            deadline=TTS_CONFIG['synthesis_deadline'],
+            hard_timeout=TTS_CONFIG['synthesis_timeout']
+        )
+        
+        # 一次性偵測系統音頻能力，之後的查詢都從記憶體回答
+        self.capabilities = CapabilityRegistry(AUDIO_CONFIG['capability_cache_file'])
+        self.capabilities.load_or_probe()
         
         # 初始化音頻系統
         self._initialize_audio()
@@ -71,20 +124,45 @@ class AudioManager:
                 self.logger.info("音頻功能已禁用")
                 return
             
-            # 嘗試初始化 pygame mixer
+            # 嘗試啟動常駐輸出引擎（pygame mixer 只開啟一次）
             if PYGAME_AVAILABLE:
-                try:
-                    pygame.mixer.pre_init(
-                        frequency=AUDIO_CONFIG['sample_rate'],
-                        size=-16,
+                adaptive = AUDIO_CONFIG.get('adaptive_buffer', {})
+                adaptive = adaptive if adaptive.get('enabled') else None
+                process_config = AUDIO_CONFIG.get('audio_process', {})
+                engine = None
+                if process_config.get('enabled'):
+                    # 獨立音頻程序：主程序解碼與 DSP，PCM 經共享記憶體送出
+                    engine = AudioProcessClient(
+                        sample_rate=AUDIO_CONFIG['sample_rate'],
                         channels=AUDIO_CONFIG['channels'],
-                        buffer=512
+                        buffer=AUDIO_CONFIG.get('mixer_buffer', 512),
+                        decoded_cache_size=AUDIO_CONFIG.get('decoded_cache_size', 4),
+                        ring_bytes=process_config['ring_mb'] * 1024 * 1024,
+                        processor=self._process_pcm if self._dsp_enabled() else None,
+                        adaptive=adaptive,
+                        max_restarts=process_config['max_restarts']
                     )
-                    pygame.mixer.init()
+                    if not engine.start():
+                        self.logger.warning("獨立音頻程序無法啟動，改在主程序輸出")
+                        engine = None
+                if engine is None:
+                    engine = AudioOutputEngine(
+                        sample_rate=AUDIO_CONFIG['sample_rate'],
+                        channels=AUDIO_CONFIG['channels'],
+                        buffer=AUDIO_CONFIG.get('mixer_buffer', 512),
+                        decoded_cache_size=AUDIO_CONFIG.get('decoded_cache_size', 4),
+                        processor=self._process_decoded_sound if self._dsp_enabled() else None,
+                        adaptive=adaptive
+                    )
+                    if not engine.start():
+                        engine = None
+                if engine:
+                    self.output_engine = engine
                     self.audio_initialized = True
+                    # 預先將提示音產生到記憶體
+                    for name, (frequency, duration) in AUDIO_CONFIG.get('earcons', {}).items():
+                        engine.register_earcon(name, frequency, duration)
                     self.logger.info("Pygame 音頻系統初始化成功")
-                except Exception as e:
-                    self.logger.warning(f"Pygame 初始化失敗: {e}")
             
             # 如果 pygame 不可用，使用 ALSA
             if not self.audio_initialized:
@@ -98,37 +176,25 @@ class AudioManager:
     
     def _check_alsa_audio(self):
         """檢查 ALSA 音頻系統"""
-        try:
-            # 檢查 ALSA 設備
-            result = subprocess.run(['aplay', '-l'], 
-                                  capture_output=True, 
-                                  text=True, 
-                                  timeout=5)
-            if result.returncode == 0:
-                self.audio_initialized = True
-                self.logger.info("ALSA 音頻系統可用")
-            else:
-                self.logger.warning("ALSA 音頻設備檢查失敗")
-        except Exception as e:
-            self.logger.warning(f"ALSA 檢查失敗: {e}")
+        if self.capabilities.alsa_devices:
+            self.audio_initialized = True
+            self.logger.info("ALSA 音頻系統可用")
+        else:
+            self.logger.warning("ALSA 音頻設備檢查失敗")
     
     def _initialize_tts(self):
         """初始化 TTS 引擎"""
         try:
-            # 初始化 OpenAI 客戶端
-            self.openai_client = None
+            # OpenAI 客戶端在第一次使用時才建立；openai 套件先在背景載入，不延遲開機
+            self._openai_client = None
+            self._openai_enabled = False
             
             if TTS_CONFIG['engine'] == 'openai':
                 # 初始化 OpenAI TTS
                 if OPENAI_AVAILABLE and TTS_CONFIG['openai_api_key']:
-                    try:
-                        self.openai_client = openai.OpenAI(
-                            api_key=TTS_CONFIG['openai_api_key']
-                        )
-                        self.logger.info("✨ OpenAI TTS 引擎初始化成功！")
-                    except Exception as e:
-                        self.logger.warning(f"OpenAI TTS 初始化失敗: {e}，切換到 Festival")
-                        TTS_CONFIG['engine'] = 'festival'
+                    self._openai_enabled = True
+                    preload(['openai'])
+                    self.logger.info("✨ OpenAI TTS 引擎已啟用（背景載入中）")
                 else:
                     if not OPENAI_AVAILABLE:
                         self.logger.warning("OpenAI 庫未安裝，切換到 Festival")
@@ -138,18 +204,12 @@ class AudioManager:
             
             if TTS_CONFIG['engine'] == 'festival':
                 # 檢查 Festival 是否可用
-                try:
-                    result = subprocess.run(['festival', '--version'], 
-                                          capture_output=True, timeout=5)
-                    if result.returncode == 0:
-                        self.logger.info("Festival TTS 引擎初始化成功")
-                        # 檢查可用的女性聲音
-                        self._check_festival_voices()
-                    else:
-                        self.logger.warning("Festival 不可用，回退到 espeak")
-                        TTS_CONFIG['engine'] = 'espeak'
-                except Exception as e:
-                    self.logger.warning(f"Festival 檢查失敗: {e}，回退到 espeak")
+                if self.capabilities.has('festival'):
+                    self.logger.info(f"Festival TTS 引擎初始化成功 ({self.capabilities.version('festival')})")
+                    # 檢查可用的女性聲音
+                    self._check_festival_voices()
+                else:
+                    self.logger.warning("Festival 不可用，回退到 espeak")
                     TTS_CONFIG['engine'] = 'espeak'
                     
             elif TTS_CONFIG['engine'] == 'pyttsx3' and PYTTSX3_AVAILABLE:
@@ -168,24 +228,35 @@ class AudioManager:
         except Exception as e:
             self.logger.error(f"TTS 引擎初始化失敗: {e}")
     
+    @property
+    def openai_client(self):
+        """OpenAI 客戶端（第一次使用時建立，建立失敗時切換到 Festival）"""
+        if self._openai_client is None and self._openai_enabled:
+            with self._openai_lock:
+                if self._openai_client is None and self._openai_enabled:
+                    try:
+                        self._openai_client = openai.OpenAI(api_key=TTS_CONFIG['openai_api_key'])
+                        self.logger.info("✨ OpenAI TTS 客戶端已建立")
+                    except Exception as e:
+                        self.logger.warning(f"OpenAI TTS 初始化失敗: {e}，切換到 Festival")
+                        self._openai_enabled = False
+                        TTS_CONFIG['engine'] = 'festival'
+        return self._openai_client
+    
     def _check_festival_voices(self):
-        """檢查 Festival 可用的聲音"""
+        """檢查 Festival 可用的聲音（優先啟動常駐伺服器，一次載入聲音）"""
+        if TTS_CONFIG.get('festival_server_enabled', True) and self._start_festival_server():
+            return
+        
         try:
-            # 檢查可用聲音
+            # 依啟動時掃描的已安裝聲音判斷
             available_voices = []
             for voice in TTS_CONFIG['festival_female_voices']:
-                # 測試聲音是否可用
-                test_cmd = f'echo "test" | festival --tts --voice {voice}'
-                try:
-                    result = subprocess.run(test_cmd, shell=True, 
-                                          capture_output=True, timeout=10)
-                    if result.returncode == 0:
-                        available_voices.append(voice)
-                        self.logger.info(f"✅ Festival 聲音可用: {voice}")
-                    else:
-                        self.logger.debug(f"❌ Festival 聲音不可用: {voice}")
-                except:
-                    pass
+                if self.capabilities.has_festival_voice(voice):
+                    available_voices.append(voice)
+                    self.logger.info(f"✅ Festival 聲音可用: {voice}")
+                else:
+                    self.logger.debug(f"❌ Festival 聲音不可用: {voice}")
             
             if available_voices:
                 TTS_CONFIG['festival_voice'] = available_voices[0]
@@ -197,6 +268,33 @@ class AudioManager:
         except Exception as e:
             self.logger.warning(f"檢查 Festival 聲音失敗: {e}")
 
+    def _start_festival_server(self) -> bool:
+        """啟動 Festival 常駐伺服器並記錄選用的聲音"""
+        try:
+            server = FestivalServer(
+                voices=TTS_CONFIG['festival_female_voices'],
+                work_dir=self.cache_dir,
+                port=TTS_CONFIG.get('festival_server_port', 1314),
+                timeout=TTS_CONFIG.get('festival_server_timeout', 30),
+                max_restarts=TTS_CONFIG.get('festival_server_max_restarts', 3),
+                health_interval=TTS_CONFIG.get('festival_server_health_interval', 60)
+            )
+            if not server.start():
+                self.logger.warning("Festival 伺服器啟動失敗，改用單次程序模式")
+                return False
+            
+            self.festival_server = server
+            if server.voice:
+                TTS_CONFIG['festival_voice'] = server.voice
+                self.logger.info(f"選擇 Festival 女性聲音: {server.voice}")
+            else:
+                self.logger.warning("未找到女性聲音，使用預設聲音")
+            return True
+            
+        except Exception as e:
+            self.logger.warning(f"Festival 伺服器初始化失敗: {e}")
+            return False
+
     def _set_female_voice_pyttsx3(self):
         """設置 pyttsx3 的女性聲音"""
         try:
@@ -343,7 +441,10 @@ class AudioManager:
             self.logger.error(f"準備問候語音頻失敗: {e}")
             return None
     
-    def prepare_greeting_audio_with_content(self, country_code: str, city_name: str = "", country_name: str = "", city_data: dict = None) -> Tuple[Optional[Path], Optional[Dict[str, Any]]]:
+    def prepare_greeting_audio_with_content(self, country_code: str, city_name: str = "", country_name: str = "", city_data: dict = None,
+                                            on_story_text: Optional[Callable[[str, bool], None]] = None,
+                                            cancel_token=None
+                                            ) -> Tuple[Optional[Union[Path, SegmentedAudio]], Optional[Dict[str, Any]]]:
         """
         準備完整問候語音頻並返回故事內容（用於網頁顯示）
         
@@ -352,9 +453,11 @@ class AudioManager:
             city_name: 城市名稱
             country_name: 國家名稱
             city_data: 完整城市數據，包含坐標信息
+            on_story_text: 串流模式下收到故事文字時呼叫，參數為 (新增文字, 是否為第一段)
+            cancel_token: 取消權杖（具 cancelled 屬性），取消後不再呼叫 API 或合成語音
         
         Returns:
-            Tuple[Path, Dict]: (音頻文件路徑, 故事內容字典)
+            Tuple[Union[Path, SegmentedAudio], Dict]: (音頻文件路徑或分段音頻, 故事內容字典)
         """
         try:
             if not AUDIO_CONFIG['enabled']:
@@ -362,9 +465,20 @@ class AudioManager:
                 return None, None
             
             self.logger.info("🎧 準備完整問候語音頻（同步模式）...")
-            
-            # 📡 獲取完整問候語和故事
-            greeting_data = self._fetch_greeting_and_story_from_api(city_name, country_name, country_code)
+            self.notify_activity()
+            
+            # 📡 獲取完整問候語和故事（優先使用閒置時預先生成的內容）
+            greeting_data = self.pregenerator.take(city_name, country_name) if self.pregenerator else None
+            audio_file = None
+            if not greeting_data and TTS_CONFIG.get('stream_story'):
+                # 串流模式：故事生成期間即開始合成問候語與第一句
+                greeting_data, audio_file = self._prepare_streamed_story(city_name, country_name, country_code,
+                                                                         on_story_text, cancel_token)
+            if cancel_token is not None and cancel_token.cancelled:
+                self.logger.info("⏹️ 甦醒流程已取消，停止準備音頻")
+                return None, None
+            if not greeting_data:
+                greeting_data = self._fetch_greeting_and_story_from_api(city_name, country_name, country_code)
             
             if greeting_data:
                 greeting_text = greeting_data['greeting']
@@ -374,19 +488,24 @@ class AudioManager:
                 self.logger.info(f"🔍 準備音頻 - 問候語資料: {greeting_data}")
                 self.logger.info(f"🔍 準備音頻 - story_text: '{story_text}'")
                 
-                # 創建完整的音頻內容：問候語 + 故事
+                # 完整的音頻內容：問候語 + 故事
                 full_content = f"{greeting_text}。{story_text}"
                 self.logger.info(f"完整音頻內容: {full_content}")
                 
-                # 🌟 準備 Nova 音頻
-                self.logger.info("🌟 準備 Nova 音頻：整合模式")
-                
-                # 生成音頻文件
-                audio_file = self._generate_audio_openai_direct(full_content, language_code, voice='nova')
+                # 🌟 準備 Nova 音頻：問候語與故事分段快取，播放時串接
+                if not audio_file:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        self.logger.info("⏹️ 甦醒流程已取消，不合成語音")
+                        return None, None
+                    self.logger.info("🌟 準備 Nova 音頻：分段模式")
+                    audio_file = self._prepare_segmented_audio(greeting_text, story_text, language_code)
                 
                 if audio_file and audio_file.exists():
                     self.logger.info(f"✨ Nova 整合音頻生成成功: {audio_file.name}")
                     
+                    # 預先解碼到記憶體，播放時不需再讀取文件
+                    self.preload_audio_file(audio_file)
+                    
                     # 準備返回的故事內容，包含城市和國家資訊
                     story_content = {
                         'greeting': greeting_text,
@@ -398,7 +517,8 @@ class AudioManager:
                         'country': country_name,
                         'countryCode': country_code,
                         'latitude': city_data.get('latitude', 0) if city_data else 0,
-                        'longitude': city_data.get('longitude', 0) if city_data else 0
+                        'longitude': city_data.get('longitude', 0) if city_data else 0,
+                        'audioDuration': self.get_audio_duration(audio_file)
                     }
                     
                     # 🔧 立即上傳故事到Firebase，確保數據持久化
@@ -421,6 +541,161 @@ class AudioManager:
             self.logger.error(f"準備完整音頻失敗: {e}")
             return None, None
     
+    def _prepare_segmented_audio(self, greeting_text: str, story_text: str,
+                                 language_code: str) -> Optional[SegmentedAudio]:
+        """
+        分別合成問候語與故事片段（同語言的問候語在各城市間共用快取）
+        
+        Args:
+            greeting_text: 當地語言問候語
+            story_text: 中文故事
+            language_code: 問候語語言代碼
+        
+        Returns:
+            SegmentedAudio: 可播放的分段音頻，全部失敗時返回 None
+        """
+        greeting_result = {}
+        
+        def synthesize_greeting():
+            greeting_result['file'] = self._synthesize_with_deadline(greeting_text, language_code, voice='nova')
+        
+        # 問候語通常命中快取；未命中時與故事同時合成
+        greeting_thread = threading.Thread(target=synthesize_greeting, daemon=True)
+        greeting_thread.start()
+        
+        story_file = None
+        if story_text:
+            story_file = self._synthesize_with_deadline(story_text, TTS_CONFIG['story_language'], voice='nova')
+        
+        greeting_thread.join(TTS_CONFIG['synthesis_timeout'])
+        greeting_file = greeting_result.get('file')
+        if not greeting_file:
+            self.logger.warning("問候語片段生成失敗，只播放故事")
+        
+        segments = [segment for segment in (greeting_file, story_file) if segment]
+        if not segments:
+            return None
+        return SegmentedAudio(segments, gap=TTS_CONFIG['segment_gap'])
+    
+    def _prepare_streamed_story(self, city: str, country: str, country_code: str,
+                                on_story_text: Optional[Callable[[str, bool], None]] = None, cancel_token=None
+                                ) -> Tuple[Optional[Dict[str, Any]], Optional[SegmentedAudio]]:
+        """
+        讀取串流故事：收到問候語即開始合成，第一句完整時開始合成第一句，其餘在串流完成後合成
+        
+        Args:
+            city: 城市名稱
+            country: 國家名稱
+            country_code: 國家代碼
+            on_story_text: 收到故事文字時呼叫（推送到網頁打字機）
+            cancel_token: 取消權杖，取消時中止串流
+        
+        Returns:
+            Tuple[Dict, SegmentedAudio]: (問候語和故事資料, 分段音頻)，串流失敗時返回 (None, None)
+        """
+        results: Dict[str, Optional[Path]] = {}
+        threads: Dict[str, threading.Thread] = {}
+        first_sentence = {}
+        
+        def synthesize(key: str, text: str, language_code: str):
+            results[key] = self._synthesize_with_deadline(text, language_code, voice='nova')
+        
+        def start(key: str, text: str, language_code: str):
+            threads[key] = threading.Thread(target=synthesize, args=(key, text, language_code),
+                                            name=f'StreamTTS-{key}', daemon=True)
+            threads[key].start()
+        
+        def on_greeting(data: Dict[str, Any]):
+            self.logger.info(f"📨 串流收到問候語: {data.get('greeting')}")
+            start('greeting', data['greeting'], data['languageCode'])
+        
+        def on_text(delta: str, story: str):
+            if on_story_text:
+                try:
+                    on_story_text(delta, len(story) == len(delta))
+                except Exception as e:
+                    self.logger.debug(f"推送故事文字失敗: {e}")
+            if 'text' not in first_sentence:
+                split = split_first_sentence(story)
+                if split:
+                    first_sentence['text'] = split[0]
+                    self.logger.info(f"📨 第一句已完整，開始合成: {split[0]}")
+                    start('first', split[0], TTS_CONFIG['story_language'])
+        
+        start_time = time.time()
+        consumer = StoryStreamConsumer(API_ENDPOINTS['generate_story_stream'])
+        result = consumer.consume(self._story_request_data(city, country, country_code), on_greeting, on_text,
+                                  cancel=cancel_token)
+        if not result:
+            self.logger.warning("串流故事失敗，改用一般故事 API")
+            return None, None
+        
+        greeting_data = {
+            'greeting': result['greeting'],
+            'language': result['language'],
+            'languageCode': result['languageCode'],
+            'chineseStory': result['story']
+        }
+        self.logger.info(f"📨 串流故事完成 ({time.time() - start_time:.1f} 秒): {greeting_data['chineseStory']}")
+        
+        if 'greeting' not in threads:
+            start('greeting', greeting_data['greeting'], greeting_data['languageCode'])
+        
+        # 第一句與完整故事不一致時（理論上不會發生）整段重新合成
+        story_text = greeting_data['chineseStory']
+        first = first_sentence.get('text')
+        if first and story_text.startswith(first):
+            rest = story_text[len(first):].strip()
+        else:
+            first, rest = None, story_text
+        
+        rest_file = self._synthesize_with_deadline(rest, TTS_CONFIG['story_language'], voice='nova') if rest else None
+        for thread in threads.values():
+            thread.join(TTS_CONFIG['synthesis_timeout'])
+        
+        segments = [results.get('greeting'), results.get('first') if first else None, rest_file]
+        if first and not results.get('first'):
+            # 第一句合成失敗時不能只播放後半段
+            segments[1:] = [self._synthesize_with_deadline(story_text, TTS_CONFIG['story_language'], voice='nova')]
+        segments = [segment for segment in segments if segment]
+        if not segments:
+            return greeting_data, None
+        return greeting_data, SegmentedAudio(segments, gap=TTS_CONFIG['segment_gap'])
+    
+    def start_pregeneration(self) -> bool:
+        """啟動閒置時的故事與語音預先生成（需要 OpenAI TTS）"""
+        if not PREGENERATION_CONFIG.get('enabled') or not AUDIO_CONFIG['enabled']:
+            return False
+        if not self.openai_client:
+            self.logger.info("未使用 OpenAI TTS，不啟動預先生成")
+            return False
+        if self.pregenerator is None:
+            self.pregenerator = StoryPregenerator(self, PREGENERATION_CONFIG, API_ENDPOINTS['find_city'])
+        self.pregenerator.start()
+        return True
+    
+    def resolve_city(self, moment: datetime, timeout: float = 2) -> Optional[Dict[str, Any]]:
+        """
+        在裝置端決定本次甦醒的城市（優先使用已預先生成的候選城市，故事與語音可直接命中）
+        
+        Args:
+            moment: 甦醒時間
+            timeout: 詢問城市 API 的逾時秒數（在按鈕回調中執行，網頁動畫開始前不能等太久）
+        
+        Returns:
+            Dict: API 格式的城市資料，失敗時返回 None
+        """
+        city = self.pregenerator.prepared_city(moment) if self.pregenerator else None
+        if city:
+            self.logger.info(f"🎯 使用預先生成的候選城市: {city.get('name') or city.get('city', '')}")
+            return city
+        return find_city(API_ENDPOINTS['find_city'], moment, timeout=timeout)
+    
+    def notify_activity(self):
+        """通知有使用者互動，預先生成暫停讓出資源"""
+        if self.pregenerator:
+            self.pregenerator.notify_activity()
+    
     # 快速模式已移除 - 只使用完整 Nova 語音播放
     
     def _generate_integrated_audio(self, content: str) -> Optional[Path]:
@@ -450,12 +725,17 @@ class AudioManager:
             self.logger.error(f"Nova 整合音頻生成失敗: {e}")
             return None
     
-    def play_audio_file_direct(self, audio_file: Path) -> bool:
+    def stop_playback(self):
+        """停止目前的播放（過期的甦醒流程被取消時呼叫）"""
+        if self.output_engine:
+            self.output_engine.stop()
+    
+    def play_audio_file_direct(self, audio_file: Union[Path, SegmentedAudio]) -> bool:
         """
         直接播放音頻文件（同步模式專用）
         
         Args:
-            audio_file: 音頻文件路徑
+            audio_file: 音頻文件路徑或分段音頻
         
         Returns:
             bool: 播放是否成功
@@ -468,7 +748,10 @@ class AudioManager:
             self.logger.info(f"🎵 直接播放音頻: {audio_file.name}")
             
             # 使用現有的播放方法
-            success = self._play_audio_file(audio_file)
+            if isinstance(audio_file, SegmentedAudio):
+                success = self._play_segmented_audio(audio_file)
+            else:
+                success = self._play_audio_file(audio_file)
             
             if success:
                 self.logger.info("✅ 直接音頻播放成功")
@@ -587,6 +870,22 @@ class AudioManager:
             self.logger.error(f"播放文字失敗: {e}")
             return False
 
+    def _story_request_data(self, city: str, country: str, country_code: str) -> Dict[str, str]:
+        """故事生成 API 的請求資料（一般與串流版本共用）"""
+        # 清理城市名稱（移除冒號和空格）
+        city = city.strip().rstrip(':').strip() if city else ''
+        country = country.strip() if country else ''
+        
+        # 如果沒有提供國家代碼，嘗試從國家名稱獲取
+        if not country_code:
+            country_code = self._get_country_code(country)
+        
+        return {
+            "city": city,
+            "country": country,
+            "countryCode": country_code
+        }
+    
     def _fetch_greeting_and_story_from_api(self, city: str, country: str, country_code: str) -> Optional[Dict[str, Any]]:
         """
         從 ChatGPT API 獲取當地語言問候語和中文故事
@@ -606,20 +905,8 @@ class AudioManager:
             # API 端點 - 使用正確的 Pi 故事生成 API
             api_url = 'https://subjective-clock.vercel.app/api/generatePiStory'
             
-            # 清理城市名稱（移除冒號和空格）
-            city = city.strip().rstrip(':').strip() if city else ''
-            country = country.strip() if country else ''
-            
-            # 如果沒有提供國家代碼，嘗試從國家名稱獲取
-            if not country_code:
-                country_code = self._get_country_code(country)
-            
             # 請求資料
-            request_data = {
-                "city": city,
-                "country": country,
-                "countryCode": country_code
-            }
+            request_data = self._story_request_data(city, country, country_code)
             
             self.logger.info(f"調用故事生成 API: {api_url}")
             self.logger.info(f"請求資料: {request_data}")
@@ -807,15 +1094,20 @@ class AudioManager:
         text_hash = hashlib.md5(f"{text}_{language}".encode()).hexdigest()
         audio_file = self.cache_dir / f"greeting_{language}_{text_hash}.wav"
         
+        if not audio_file.exists():
+            # RAM 層沒有時從持久層還原
+            self.audio_store.restore(audio_file)
+        
         if audio_file.exists():
             # 檢查文件是否過期
             file_age = time.time() - audio_file.stat().st_mtime
-            if file_age < AUDIO_FILES['cache_timeout']:
+            if file_age < AUDIO_FILES['cache_timeout'] and self.audio_index.is_valid(audio_file):
                 self.logger.debug(f"使用快取音頻文件: {audio_file}")
                 return audio_file
             else:
-                # 刪除過期文件
+                # 刪除過期或無效文件
                 audio_file.unlink()
+                self.audio_index.invalidate(audio_file)
         
         return None
     
@@ -825,24 +1117,26 @@ class AudioManager:
             text_hash = hashlib.md5(f"{text}_{language}".encode()).hexdigest()
             audio_file = self.cache_dir / f"greeting_{language}_{text_hash}.wav"
             
+            # 即將重新生成，舊的索引資料失效
+            self.audio_index.invalidate(audio_file)
+            
             # 主要引擎嘗試
             result_file = None
             
             # OpenAI TTS 優先（最高品質，支援所有語言）
             if TTS_CONFIG['engine'] == 'openai' and self.openai_client:
-                self.logger.info(f"🤖 使用 OpenAI TTS 生成 {language} 語音")
-                result_file = self._generate_audio_openai(text, audio_file)
+                model = self._choose_openai_model(text)
+                self.logger.info(f"🤖 使用 OpenAI TTS 生成 {language} 語音 ({model})")
                 
-                # OpenAI 失敗時，根據語言選擇備用
-                if result_file is None:
-                    self.logger.warning("OpenAI TTS 失敗，使用備用引擎")
-                    if language in ['zh', 'zh-CN', 'zh-TW', 'ru']:
-                        result_file = self._generate_audio_espeak(text, language, audio_file)
-                    else:
-                        # 嘗試 Festival
-                        result_file = self._generate_audio_festival(text, audio_file)
-                        if result_file is None:
-                            result_file = self._generate_audio_espeak(text, language, audio_file)
+                # OpenAI 逾時或失敗時，由本地引擎接手（寫入不同文件，避免互相覆蓋）
+                local_file = self.cache_dir / f"greeting_local_{audio_file.name[len('greeting_'):]}"
+                _, result_file = self.tts_scheduler.race(
+                    primary=lambda: self._generate_audio_openai(text, audio_file, model),
+                    insurance=(lambda: self._generate_audio_local(text, language, local_file))
+                    if self._local_tts_available() else None,
+                    validate=self._is_playable,
+                    predicted=self.tts_scheduler.latency.predict('openai', model, len(text))
+                )
             
             # 如果不是 OpenAI 引擎，中文、俄語等特定語言使用 espeak
             elif language in ['zh', 'zh-CN', 'zh-TW', 'ru']:
@@ -878,18 +1172,15 @@ class AudioManager:
             
             # 最終驗證和備用
             if result_file and result_file.exists():
-                # 根據文件格式進行驗證
-                if result_file.suffix.lower() == '.wav':
-                    is_valid = self._validate_wav_file(result_file)
-                else:
-                    # MP3 或其他格式，檢查文件大小
-                    is_valid = result_file.stat().st_size > 1000  # 至少 1KB
+                # 根據文件格式進行驗證（結果記錄在索引中，之後不再重複驗證）
+                is_valid = self.audio_index.is_valid(result_file)
                 
                 # 測試播放能力
                 can_play = self._test_audio_playback(result_file)
                 
                 if is_valid and can_play:
                     self.logger.info(f"音頻文件生成成功: {result_file}")
+                    self._store_generated(result_file)
                     return result_file
                 else:
                     self.logger.warning(f"音頻文件驗證失敗 - 格式: {is_valid}, 播放: {can_play}")
@@ -905,6 +1196,7 @@ class AudioManager:
                         result = subprocess.run(cmd, capture_output=True, timeout=30)
                         if result.returncode == 0 and simple_audio_file.exists():
                             simple_audio_file.rename(audio_file)
+                            self.audio_index.invalidate(audio_file)
                             return audio_file
                     except:
                         pass
@@ -916,7 +1208,100 @@ class AudioManager:
             self.logger.error(f"生成音頻失敗: {e}")
             return None
 
-    def _generate_audio_openai_direct(self, text: str, language_code: str, voice: str = None) -> Optional[Path]:
+    def _direct_audio_path(self, text: str, language_code: str, voice: str = None) -> Path:
+        """OpenAI 直接生成音頻的快取路徑（不含模型，任何模型的結果都可重用）"""
+        selected_voice = voice or TTS_CONFIG['openai_voice']
+        text_hash = hashlib.md5(f"{text}_{language_code}_{selected_voice}".encode()).hexdigest()
+        return self.cache_dir / f"openai_direct_{language_code}_{selected_voice}_{text_hash}.wav"
+    
+    def _find_cached_direct_audio(self, audio_file: Path) -> Optional[Path]:
+        """檢查是否已有快取（索引命中時不重新開啟文件；RAM 層沒有時從持久層還原）"""
+        candidates = (audio_file, audio_file.with_suffix('.mp3'))
+        for cached_file in candidates:
+            if cached_file.exists() and self.audio_index.is_valid(cached_file):
+                return cached_file
+        for cached_file in candidates:
+            if self.audio_store.restore(cached_file) and self.audio_index.is_valid(cached_file):
+                return cached_file
+        return None
+    
+    def _store_generated(self, audio_file: Optional[Path], persist: bool = True):
+        """新生成的音頻計入 RAM 層，並排入持久層背景寫入（persist 為 False 時只留在 RAM 層）"""
+        if audio_file:
+            self.audio_store.commit(audio_file, persist)
+    
+    def _on_audio_evicted(self, audio_file: Path):
+        """音頻移出 RAM 層時，索引資料一併失效"""
+        self.audio_index.invalidate(audio_file)
+    
+    def _choose_openai_model(self, text: str) -> str:
+        """依文字長度與期限選擇 OpenAI 模型"""
+        models = TTS_CONFIG.get('openai_models') or [TTS_CONFIG['openai_model']]
+        return self.tts_scheduler.choose_model('openai', models, len(text))
+    
+    def _local_tts_available(self) -> bool:
+        """是否有可作為保險的本地 TTS 引擎"""
+        return bool(self.festival_server) or self.capabilities.has('festival') or self.capabilities.has('espeak')
+    
+    def _is_playable(self, audio_file: Path) -> bool:
+        """競速結果驗證：格式有效且可播放"""
+        return audio_file.exists() and self.audio_index.is_valid(audio_file) and self._test_audio_playback(audio_file)
+    
+    def _synthesize_with_deadline(self, text: str, language_code: str, voice: str = None,
+                                  local_language: str = None) -> Optional[Path]:
+        """
+        在期限內合成語音：依延遲記錄選擇模型，預測逾時時同時啟動本地引擎，使用先完成且有效的結果
+        
+        Args:
+            text: 要轉換的文字
+            language_code: 語言代碼
+            voice: OpenAI 語音
+            local_language: 本地引擎使用的語言（預設同 language_code）
+        
+        Returns:
+            Path: 音頻文件路徑，如果失敗則返回 None
+        """
+        audio_file = self._direct_audio_path(text, language_code, voice)
+        cached_file = self._find_cached_direct_audio(audio_file)
+        if cached_file:
+            self.logger.info(f"使用快取的音頻文件: {cached_file}")
+            return cached_file
+        
+        local_file = self.cache_dir / f"greeting_local_{audio_file.name[len('openai_direct_'):]}"
+        if not self.openai_client:
+            return self._generate_audio_local(text, local_language or language_code, local_file)
+        
+        model = self._choose_openai_model(text)
+        _, result_file = self.tts_scheduler.race(
+            primary=lambda: self._generate_audio_openai_direct(text, language_code, voice, model),
+            insurance=(lambda: self._generate_audio_local(text, local_language or language_code, local_file))
+            if self._local_tts_available() else None,
+            validate=self._is_playable,
+            predicted=self.tts_scheduler.latency.predict('openai', model, len(text))
+        )
+        return result_file
+    
+    def _generate_audio_local(self, text: str, language: str, audio_file: Path) -> Optional[Path]:
+        """使用本地引擎生成音頻（中文、俄語使用 espeak，其他先試 Festival）"""
+        language = language.split('-')[0] if language not in ['zh-CN', 'zh-TW'] else language
+        start_time = time.time()
+        engine = 'espeak'
+        if language in ['zh', 'zh-CN', 'zh-TW', 'ru']:
+            result_file = self._generate_audio_espeak(text, language, audio_file)
+        else:
+            engine = 'festival'
+            result_file = self._generate_audio_festival(text, audio_file)
+            if result_file is None:
+                engine = 'espeak'
+                result_file = self._generate_audio_espeak(text, language, audio_file)
+        
+        if result_file:
+            self.tts_scheduler.latency.record(engine, None, len(text), time.time() - start_time)
+            self._store_generated(result_file)
+        return result_file
+    
+    def _generate_audio_openai_direct(self, text: str, language_code: str, voice: str = None,
+                                      model: str = None, persist: bool = True) -> Optional[Path]:
         """
         直接使用 OpenAI TTS 生成音頻（繞過其他引擎選擇）
         
@@ -924,32 +1309,37 @@ class AudioManager:
             text: 要轉換的文字
             language_code: 語言代碼
             voice: 指定的語音模型（可選，默認使用配置中的語音）
+            model: OpenAI TTS 模型（可選，默認使用配置中的模型）
+            persist: 是否寫入持久層（預先生成的音頻使用後才寫入）
         
         Returns:
             Path: 生成的音頻文件路徑，如果失敗則返回 None
         """
         try:
             # 創建音頻文件路徑
-            import hashlib
             selected_voice = voice or TTS_CONFIG['openai_voice']
-            text_hash = hashlib.md5(f"{text}_{language_code}_{selected_voice}".encode()).hexdigest()
-            audio_file = self.cache_dir / f"openai_direct_{language_code}_{selected_voice}_{text_hash}.wav"
+            model = model or TTS_CONFIG['openai_model']
+            audio_file = self._direct_audio_path(text, language_code, selected_voice)
             
             # 檢查是否已有快取
-            if audio_file.exists():
-                self.logger.info(f"使用快取的音頻文件: {audio_file}")
-                return audio_file
+            cached_file = self._find_cached_direct_audio(audio_file)
+            if cached_file:
+                self.logger.info(f"使用快取的音頻文件: {cached_file}")
+                return cached_file
+            self.audio_index.invalidate(audio_file)
+            self.audio_index.invalidate(audio_file.with_suffix('.mp3'))
             
             # 調用 OpenAI TTS API
             if not self.openai_client:
                 self.logger.error("OpenAI 客戶端未初始化")
                 return None
                 
-            self.logger.info(f"🤖 使用 OpenAI TTS 生成音頻: {selected_voice}")
+            start_time = time.time()
+            self.logger.info(f"🤖 使用 OpenAI TTS 生成音頻: {selected_voice} ({model})")
             
             # 調用 OpenAI TTS API
             response = self.openai_client.audio.speech.create(
-                model=TTS_CONFIG['openai_model'],
+                model=model,
                 voice=selected_voice,
                 input=text,
                 speed=TTS_CONFIG['openai_speed']
@@ -1000,6 +1390,8 @@ class AudioManager:
                 
                 # 最終驗證文件
                 if audio_file.exists() and audio_file.stat().st_size > 0:
+                    self.tts_scheduler.latency.record('openai', model, len(text), time.time() - start_time)
+                    self._store_generated(audio_file, persist)
                     self.logger.info(f"✨ OpenAI TTS 音頻生成成功: {audio_file}")
                     return audio_file
                 else:
@@ -1013,18 +1405,21 @@ class AudioManager:
             self.logger.error(f"Nova 直接生成失敗: {e}")
             return None
     
-    def _generate_audio_openai(self, text: str, audio_file: Path) -> Optional[Path]:
+    def _generate_audio_openai(self, text: str, audio_file: Path, model: str = None) -> Optional[Path]:
         """使用 OpenAI TTS 生成音頻"""
         try:
             if not self.openai_client:
                 self.logger.error("OpenAI 客戶端未初始化")
                 return None
-                
+            
+            selected_voice = TTS_CONFIG['openai_voice']
+            model = model or TTS_CONFIG['openai_model']
+            start_time = time.time()
             self.logger.info(f"🤖 使用 OpenAI TTS 生成音頻: {selected_voice}")
             
             # 調用 OpenAI TTS API
             response = self.openai_client.audio.speech.create(
-                model=TTS_CONFIG['openai_model'],
+                model=model,
                 voice=selected_voice,
                 input=text,
                 speed=TTS_CONFIG['openai_speed']
@@ -1074,6 +1469,8 @@ class AudioManager:
                 
                 # 最終驗證文件
                 if audio_file.exists() and audio_file.stat().st_size > 0:
+                    self.tts_scheduler.latency.record('openai', model, len(text), time.time() - start_time)
+                    self._store_generated(audio_file)
                     self.logger.info(f"✨ OpenAI TTS 音頻生成成功: {audio_file}")
                     return audio_file
                 else:
@@ -1088,7 +1485,25 @@ class AudioManager:
             return None
 
     def _generate_audio_festival(self, text: str, audio_file: Path) -> Optional[Path]:
-        """使用 Festival 生成音頻"""
+        """使用 Festival 生成音頻（優先使用常駐伺服器）"""
+        if self.festival_server:
+            duration_stretch = 1.0 if TTS_CONFIG['speed'] >= 150 else 1.2
+            result_file = self.festival_server.synthesize(text, audio_file, duration_stretch)
+            
+            if result_file and self._validate_wav_file(result_file) and self._test_audio_playback(result_file):
+                if TTS_CONFIG.get('enable_audio_enhancement', True):
+                    self._enhance_audio_quality(result_file)
+                self.logger.info(f"Festival 伺服器音頻生成成功: {result_file}")
+                return result_file
+            
+            self.logger.warning("Festival 伺服器生成失敗，改用單次程序模式")
+            if audio_file.exists():
+                audio_file.unlink()
+        
+        return self._generate_audio_festival_subprocess(text, audio_file)
+
+    def _generate_audio_festival_subprocess(self, text: str, audio_file: Path) -> Optional[Path]:
+        """使用單次 Festival 程序生成音頻（伺服器不可用時的備用方案）"""
         try:
             # 創建 Festival 腳本
             # 修復聲音名稱 - 移除重複的 voice_ 前綴
@@ -1186,114 +1601,100 @@ class AudioManager:
             return None
 
     def _validate_wav_file(self, audio_file: Path) -> bool:
-        """驗證 WAV 文件格式是否正確"""
+        """驗證 WAV 文件格式是否正確（解析一次，結果記錄在快取索引）"""
         try:
-            # 檢查文件大小（至少需要 44 字節的 WAV 頭 + 一些音頻數據）
-            if not audio_file.exists() or audio_file.stat().st_size < 100:
-                return False
-            
-            # 讀取 WAV 文件頭
-            with open(audio_file, 'rb') as f:
-                # 檢查 RIFF 標識
-                riff_header = f.read(4)
-                if riff_header != b'RIFF':
-                    return False
-                
-                # 讀取文件大小
-                file_size = int.from_bytes(f.read(4), byteorder='little')
-                
-                # 檢查 WAVE 標識
-                wave_header = f.read(4)
-                if wave_header != b'WAVE':
-                    return False
-                
-                # 尋找必要的 chunks
-                found_fmt = False
-                found_data = False
-                data_size = 0
-                
-                while f.tell() < len(riff_header) + 4 + file_size:
-                    try:
-                        chunk_header = f.read(4)
-                        if len(chunk_header) < 4:
-                            break
-                        
-                        chunk_size_bytes = f.read(4)
-                        if len(chunk_size_bytes) < 4:
-                            break
-                            
-                        chunk_size = int.from_bytes(chunk_size_bytes, byteorder='little')
-                        
-                        if chunk_header == b'fmt ':
-                            found_fmt = True
-                            # 跳過 fmt chunk 內容
-                            f.seek(chunk_size, 1)
-                        elif chunk_header == b'data':
-                            found_data = True
-                            data_size = chunk_size
-                            # 不需要讀取 data chunk 內容
-                            f.seek(chunk_size, 1)
-                        else:
-                            # 跳過其他 chunk
-                            f.seek(chunk_size, 1)
-                        
-                        # 對齊到偶數字節邊界
-                        if chunk_size % 2 == 1:
-                            f.seek(1, 1)
-                            
-                    except (struct.error, OSError):
-                        break
-                
-                # 檢查是否找到必要的 chunks 且有實際音頻數據
-                return found_fmt and found_data and data_size > 0
-                
+            info = self.audio_index.describe(audio_file)
+            return info.get('format') == 'wav' and info.get('valid', False)
         except Exception as e:
             self.logger.debug(f"WAV 文件驗證失敗: {e}")
             return False
 
+    def get_audio_duration(self, audio_file: Path) -> Optional[float]:
+        """
+        取得音頻長度（秒），供網頁端依語音長度調整打字機效果
+        
+        Args:
+            audio_file: 音頻文件路徑或分段音頻
+        
+        Returns:
+            float: 音頻長度，無法取得時返回 None
+        """
+        if not audio_file:
+            return None
+        if isinstance(audio_file, SegmentedAudio):
+            durations = [self.audio_index.duration(segment) for segment in audio_file.segments]
+            if None in durations:
+                return None
+            return sum(durations) + audio_file.gap * (len(durations) - 1)
+        return self.audio_index.duration(audio_file)
+
     def _test_audio_playback(self, audio_file: Path) -> bool:
         """測試音頻文件是否能正確播放（支援 WAV 和 MP3）"""
         try:
-            if not PYGAME_AVAILABLE:
-                return True  # 如果沒有 pygame，假設可以播放
+            if not self.output_engine:
+                # 沒有輸出引擎時，依啟動時偵測的外部播放器判斷
+                return not PYGAME_AVAILABLE or self.capabilities.can_play_externally(audio_file.suffix)
             
-            # 嘗試用 pygame 載入文件
-            try:
-                pygame.mixer.music.load(str(audio_file))
+            # 解碼結果會保留在記憶體，播放時直接重用
+            if self.output_engine.load(audio_file) is not None:
                 return True
-            except pygame.error:
-                # pygame 失敗，檢查是否有其他播放器
-                if audio_file.suffix.lower() == '.mp3':
-                    # 檢查是否有 MP3 播放器
-                    try:
-                        result = subprocess.run(['which', 'mpg123'], 
-                                              capture_output=True, timeout=5)
-                        if result.returncode == 0:
-                            return True
-                    except:
-                        pass
-                    
-                    try:
-                        result = subprocess.run(['which', 'ffplay'], 
-                                              capture_output=True, timeout=5)
-                        if result.returncode == 0:
-                            return True
-                    except:
-                        pass
-                
-                return False
+            
+            # 輸出引擎無法解碼，檢查是否有其他播放器
+            return audio_file.suffix.lower() == '.mp3' and self.capabilities.can_play_externally('.mp3')
             
         except Exception as e:
             self.logger.debug(f"音頻文件播放測試失敗: {e}")
             return False
 
+    def _dsp_enabled(self) -> bool:
+        """是否使用記憶體內 DSP（需要 numpy 與 pygame.sndarray）"""
+        return AUDIO_CONFIG.get('dsp', {}).get('enabled', False) and audio_dsp.NUMPY_AVAILABLE
+
+    def _process_decoded_sound(self, sound, audio_file: Path):
+        """
+        對已解碼的音頻套用 DSP 處理鏈（等化、壓縮、響度標準化）
+        
+        首次處理時量測響度並將增益存入快取索引，之後直接使用
+        """
+        pcm = pygame.sndarray.array(sound)
+        rate = pygame.mixer.get_init()[0]
+        return pygame.sndarray.make_sound(self._process_pcm(pcm, rate, audio_file))
+    
+    def _process_pcm(self, pcm, rate: int, audio_file: Path, target_rate: Optional[int] = None):
+        """
+        對 PCM 陣列套用 DSP 處理鏈（獨立音頻程序模式在主程序解碼後呼叫）
+        
+        Args:
+            pcm: 整數 PCM 陣列
+            rate: 取樣率
+            audio_file: 來源文件（用於快取增益）
+            target_rate: 輸出取樣率（可選）
+        """
+        settings = AUDIO_CONFIG['dsp']
+        cached = (self.audio_index.get(audio_file) or {}).get('dsp')
+        gain_db = None
+        if cached and cached.get('settings') == audio_dsp.settings_key(settings):
+            gain_db = cached['gain_db']
+        
+        start_time = time.time()
+        processed, dsp_info = audio_dsp.process(pcm, rate, settings, gain_db=gain_db, target_rate=target_rate)
+        
+        if dsp_info:
+            self.audio_index.update(audio_file, dsp=dsp_info)
+            self.logger.info(f"🎚️ 響度 {dsp_info['loudness_lufs']} LUFS，增益 {dsp_info['gain_db']:+.1f} dB")
+        
+        self.logger.debug(f"DSP 處理完成 ({(time.time() - start_time) * 1000:.0f}ms): {audio_file.name}")
+        return processed
+
     def _enhance_audio_quality(self, audio_file: Path):
         """使用 sox 提高音頻質量"""
+        # 記憶體內 DSP 啟用時在播放前處理，不回寫 SD 卡上的文件
+        if self.output_engine and self._dsp_enabled():
+            return
+        
         try:
             # 檢查 sox 是否可用
-            result = subprocess.run(['sox', '--version'], 
-                                  capture_output=True, timeout=5)
-            if result.returncode != 0:
+            if not self.capabilities.has('sox'):
                 return
             
             # 創建臨時文件用於處理
@@ -1315,6 +1716,7 @@ class AudioManager:
             if result.returncode == 0 and temp_file.exists():
                 # 替換原文件
                 temp_file.replace(audio_file)
+                self.audio_index.invalidate(audio_file)
                 self.logger.debug("音質增強完成")
             else:
                 # 如果增強失敗，刪除臨時文件
@@ -1324,27 +1726,54 @@ class AudioManager:
         except Exception as e:
             self.logger.debug(f"音質增強失敗（非致命錯誤）: {e}")
     
+    def get_audio_health(self) -> Dict[str, Any]:
+        """
+        取得音頻健康統計（underrun 次數、啟動延遲、目前緩衝區與優先權）
+        
+        Returns:
+            Dict: 統計資料；沒有常駐輸出引擎時返回空字典
+        """
+        return self.output_engine.get_stats() if self.output_engine else {}
+    
+    def preload_audio_file(self, audio_file: Path) -> bool:
+        """預先解碼音頻到記憶體，縮短之後的播放啟動時間"""
+        if isinstance(audio_file, SegmentedAudio):
+            return all([self.preload_audio_file(segment) for segment in audio_file.segments])
+        return bool(self.output_engine and audio_file and self.output_engine.preload(audio_file))
+    
+    def _play_segmented_audio(self, audio: SegmentedAudio) -> bool:
+        """依序播放分段音頻，段落間插入設定的間隔"""
+        if self.output_engine and all(self.output_engine.load(segment) is not None for segment in audio.segments):
+            if self.output_engine.play_sequence(audio.segments, audio.gap):
+                self.logger.info(f"分段音頻播放完成（pygame）: {len(audio.segments)} 段")
+                return True
+            self.logger.warning("分段音頻播放被中斷或失敗")
+            return False
+        
+        # 輸出引擎無法使用時逐段播放
+        for index, segment in enumerate(audio.segments):
+            if index and audio.gap > 0:
+                time.sleep(audio.gap)
+            if not self._play_audio_file(segment):
+                return False
+        return True
+
     def _play_audio_file(self, audio_file: Path) -> bool:
         """播放音頻文件（支援 WAV 和 MP3）"""
         try:
-            if PYGAME_AVAILABLE and self.audio_initialized:
-                # 使用 pygame 播放
-                try:
-                    pygame.mixer.music.load(str(audio_file))
-                    pygame.mixer.music.play()
-                    
-                    # 等待播放完成
-                    while pygame.mixer.music.get_busy():
-                        time.sleep(0.1)
-                        
+            self.audio_store.touch(audio_file)
+            
+            if self.output_engine:
+                # 使用常駐輸出引擎播放（已解碼緩衝區，不重新開啟設備）
+                if self.output_engine.load(audio_file) is None:
+                    self.logger.warning(f"輸出引擎無法解碼 {audio_file.name}，改用替代播放器")
+                    return self._play_with_alternative_player(audio_file)
+                
+                if self.output_engine.play(audio_file):
                     self.logger.info(f"音頻播放完成（pygame）: {audio_file.suffix}")
                     return True
-                except pygame.error as e:
-                    self.logger.warning(f"pygame 播放失敗: {e}")
-                    # 如果是 MP3 播放失敗，嘗試其他播放器
-                    if audio_file.suffix.lower() == '.mp3':
-                        return self._play_with_alternative_player(audio_file)
-                    return False
+                self.logger.warning("音頻播放被中斷或失敗")
+                return False
             else:
                 # 使用替代播放器
                 return self._play_with_alternative_player(audio_file)
@@ -1357,7 +1786,7 @@ class AudioManager:
         """使用替代播放器播放音頻"""
         try:
             # 根據文件格式選擇播放器
-            if audio_file.suffix.lower() == '.mp3':
+            if audio_file.suffix.lower() == '.mp3' and self.capabilities.has('mpg123'):
                 # 嘗試 mpg123 播放 MP3
                 try:
                     result = subprocess.run(['mpg123', str(audio_file)], 
@@ -1368,6 +1797,7 @@ class AudioManager:
                 except FileNotFoundError:
                     pass
                 
+            if audio_file.suffix.lower() == '.mp3' and self.capabilities.has('ffplay'):
                 # 嘗試 ffplay 播放 MP3
                 try:
                     result = subprocess.run(['ffplay', '-nodisp', '-autoexit', str(audio_file)], 
@@ -1405,10 +1835,9 @@ class AudioManager:
         try:
             volume = max(0, min(100, volume))  # 限制範圍
             
-            # 嘗試不同的音量控制名稱
-            volume_controls = ['PCM', 'Master', 'Speaker', 'Headphone', 'HDMI']
-            
-            for control in volume_controls:
+            # 使用啟動時偵測到的音量控制名稱
+            control = self.capabilities.mixer_control
+            if control:
                 try:
                     # 使用 amixer 設置系統音量
                     result = subprocess.run([
@@ -1420,13 +1849,19 @@ class AudioManager:
                         self.logger.info(f"音量設置為: {volume}% (使用 {control} 控制)")
                         return True
                     else:
-                        self.logger.debug(f"嘗試 {control} 控制失敗: {result.stderr.decode().strip()}")
+                        self.logger.debug(f"{control} 控制失敗: {result.stderr.decode().strip()}")
                         
                 except Exception as e:
-                    self.logger.debug(f"嘗試 {control} 控制時發生錯誤: {e}")
-                    continue
+                    self.logger.debug(f"{control} 控制時發生錯誤: {e}")
+            
+            # 沒有系統音量控制時，改由輸出引擎調整聲道音量
+            if self.output_engine:
+                self.output_engine.set_volume(volume / 100)
+                self.current_volume = volume
+                self.logger.info(f"音量設置為: {volume}% (輸出引擎)")
+                return True
             
-            # 如果所有控制都失敗，記錄警告但不阻止程序運行
+            # 如果沒有可用控制，記錄警告但不阻止程序運行
             self.logger.warning("無法設置音量，但音頻播放可能仍然正常")
             self.current_volume = volume
             return True
@@ -1483,6 +1918,18 @@ class AudioManager:
             bool: 播放是否成功
         """
         try:
+            # 優先使用記憶體中預載的提示音（不產生子程序）
+            if self.output_engine:
+                earcon = f"beep_{frequency}_{int(duration * 1000)}"
+                for name, spec in AUDIO_CONFIG.get('earcons', {}).items():
+                    if tuple(spec) == (frequency, duration):
+                        earcon = name
+                        break
+                if not self.output_engine.has_earcon(earcon):
+                    self.output_engine.register_earcon(earcon, frequency, duration)
+                if self.output_engine.play_earcon(earcon):
+                    return True
+            
             # 首先嘗試使用 aplay 播放預設的提示音
             beep_file = Path(AUDIO_FILES.get('error', ''))
             if beep_file.exists():
@@ -1550,15 +1997,18 @@ class AudioManager:
             for audio_file in cache_files:
                 file_age = current_time - audio_file.stat().st_mtime
                 if file_age > AUDIO_FILES['cache_timeout']:
-                    audio_file.unlink()
+                    self.audio_store.discard(audio_file)
                     self.logger.debug(f"刪除過期快取文件: {audio_file}")
             
             # 限制快取文件數量
             if len(cache_files) > AUDIO_FILES['max_cache_size']:
                 for audio_file in cache_files[AUDIO_FILES['max_cache_size']:]:
                     if audio_file.exists():
-                        audio_file.unlink()
+                        self.audio_store.discard(audio_file)
                         self.logger.debug(f"刪除超量快取文件: {audio_file}")
+            
+            # 清理失去對應音頻的索引資料
+            self.audio_index.prune()
                         
         except Exception as e:
             self.logger.error(f"清理快取失敗: {e}")
@@ -1566,8 +2016,13 @@ class AudioManager:
     def cleanup(self):
         """清理資源"""
         try:
-            if PYGAME_AVAILABLE and self.audio_initialized:
-                pygame.mixer.quit()
+            if self.pregenerator:
+                self.pregenerator.stop()
+                self.pregenerator = None
+            
+            if self.output_engine:
+                self.output_engine.shutdown()
+                self.output_engine = None
             
             if self.tts_engine:
                 try:
@@ -1575,6 +2030,14 @@ class AudioManager:
                 except:
                     pass
             
+            if self.festival_server:
+                self.festival_server.stop()
+                self.festival_server = None
+            
+            # 將尚未寫入的音頻與延遲記錄寫完到持久層
+            self.audio_store.shutdown()
+            self.tts_scheduler.latency.flush()
+            
             self.logger.info("音頻管理器已清理")
             
         except Exception as e:
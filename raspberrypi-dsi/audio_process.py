@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 獨立音頻程序
+音頻輸出在獨立程序中執行，不與 Selenium 控制與 JSON 日誌共用 GIL
+主程序負責解碼與 DSP，PCM 經共享記憶體環形緩衝區傳送；播放、停止、音量與預載經由小型命令通道
+"""
+
+import time
+import wave
+import queue
+import logging
+import threading
+import multiprocessing
+from pathlib import Path
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import Optional, Callable, Dict, Any, List, Tuple, Union
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from audio_engine import PlaybackRequest
+
+logger = logging.getLogger(__name__)
+
+# 環形緩衝區標頭：寫入位置、讀取位置（皆為累計位元組數）
+_RING_HEADER = 16
+# 緩衝區滿或空時的等待間隔
+_RING_WAIT = 0.002
+# 子程序啟動與同步命令的等待時間（秒）
+_STARTUP_TIMEOUT = 15
+_REPLY_TIMEOUT = 5
+
+
+class PcmRingBuffer:
+    """單一生產者、單一消費者的共享記憶體 PCM 環形緩衝區"""
+
+    def __init__(self, size: int, name: Optional[str] = None):
+        self.size = size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size + _RING_HEADER)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # spawn 的子程序與主程序共用 resource_tracker，由主程序負責 unlink
+            self.owner = False
+        self.name = self.shm.name
+        self._indices = self.shm.buf[:_RING_HEADER].cast('Q')
+        self._data = self.shm.buf[_RING_HEADER:_RING_HEADER + size]
+        if self.owner:
+            self._indices[0] = 0
+            self._indices[1] = 0
+
+    def write(self, data: Union[bytes, memoryview], timeout: float = 10) -> bool:
+        """寫入資料，緩衝區滿時等待消費者讀取"""
+        view = memoryview(data).cast('B')
+        deadline = time.monotonic() + timeout
+        offset = 0
+        while offset < len(view):
+            write_pos, read_pos = self._indices[0], self._indices[1]
+            free = self.size - (write_pos - read_pos)
+            if free == 0:
+                if time.monotonic() > deadline:
+                    return False
+                time.sleep(_RING_WAIT)
+                continue
+            count = min(free, len(view) - offset)
+            start = write_pos % self.size
+            first = min(count, self.size - start)
+            self._data[start:start + first] = view[offset:offset + first]
+            if count > first:
+                self._data[:count - first] = view[offset + first:offset + count]
+            offset += count
+            self._indices[0] = write_pos + count
+        return True
+
+    def read(self, size: int, timeout: float = 10) -> Optional[bytes]:
+        """讀取指定位元組數，資料不足時等待生產者寫入"""
+        out = bytearray(size)
+        deadline = time.monotonic() + timeout
+        offset = 0
+        while offset < size:
+            write_pos, read_pos = self._indices[0], self._indices[1]
+            available = write_pos - read_pos
+            if available == 0:
+                if time.monotonic() > deadline:
+                    return None
+                time.sleep(_RING_WAIT)
+                continue
+            count = min(available, size - offset)
+            start = read_pos % self.size
+            first = min(count, self.size - start)
+            out[offset:offset + first] = self._data[start:start + first]
+            if count > first:
+                out[offset + first:offset + count] = self._data[:count - first]
+            offset += count
+            self._indices[1] = read_pos + count
+        return bytes(out)
+
+    def close(self):
+        self._indices.release()
+        self._data.release()
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# =============================================================================
+# 主程序端
+# =============================================================================
+
+class AudioProcessClient:
+    """音頻程序的主程序端代理（介面與 AudioOutputEngine 相同）"""
+
+    def __init__(self, sample_rate: int = 44100, channels: int = 2,
+                 buffer: int = 512, decoded_cache_size: int = 4,
+                 ring_bytes: int = 4 * 1024 * 1024,
+                 processor: Optional[Callable[..., 'np.ndarray']] = None,
+                 adaptive: Optional[Dict[str, Any]] = None,
+                 max_restarts: int = 3):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.buffer = buffer
+        self.decoded_cache_size = decoded_cache_size
+        self.ring_bytes = ring_bytes
+        # PCM 處理：processor(pcm, rate, audio_file, target_rate) -> 目標取樣率的 int16 PCM
+        self.processor = processor
+        self.adaptive = adaptive
+        self.max_restarts = max_restarts
+
+        self.initialized = False
+        self.volume = 1.0
+        self.mixer_format: Optional[Tuple[int, int, int]] = None
+        self.process: Optional[multiprocessing.Process] = None
+        self.ring: Optional[PcmRingBuffer] = None
+        self.restart_count = 0
+
+        self._context = multiprocessing.get_context('spawn')
+        self._commands = None
+        self._events = None
+        self._listener: Optional[threading.Thread] = None
+        self._ring_lock = threading.Lock()
+        self._request_lock = threading.Lock()
+        self._next_id = 0
+        self._requests: Dict[int, PlaybackRequest] = {}
+        self._replies: Dict[int, Tuple[threading.Event, List[Any]]] = {}
+        # 子程序中已就緒的音頻（路徑與修改時間 -> 鍵值）
+        self._loaded: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._earcons: set = set()
+        self._earcon_specs: Dict[str, Tuple[int, float, float]] = {}
+        self._shutting_down = False
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+
+    def start(self) -> bool:
+        """啟動音頻程序並等待輸出設備開啟"""
+        try:
+            self.ring = PcmRingBuffer(self.ring_bytes)
+            self._commands = self._context.Queue()
+            self._events = self._context.Queue()
+            self.process = self._context.Process(
+                target=_audio_process_main,
+                args=(self._commands, self._events, self.ring.name, self.ring_bytes, {
+                    'sample_rate': self.sample_rate,
+                    'channels': self.channels,
+                    'buffer': self.buffer,
+                    'decoded_cache_size': self.decoded_cache_size,
+                    'adaptive': self.adaptive,
+                }),
+                name='WakeUpMapAudio',
+                daemon=True
+            )
+            self.process.start()
+
+            kind, *payload = self._events.get(timeout=_STARTUP_TIMEOUT)
+            if kind != 'ready' or payload[0] is None:
+                logger.warning("音頻程序無法開啟輸出設備")
+                self._terminate()
+                return False
+
+            self.mixer_format = tuple(payload[0])
+            self.initialized = True
+            self._listener = threading.Thread(target=self._listen, args=(self._events, self.process),
+                                              name='AudioProcessEvents', daemon=True)
+            self._listener.start()
+            threading.Thread(target=self._watch, args=(self._events, self.process),
+                             name='AudioProcessWatch', daemon=True).start()
+            for name, spec in self._earcon_specs.items():
+                self._send('register_earcon', name, *spec)
+                self._earcons.add(name)
+            if self.volume != 1.0:
+                self._send('volume', self.volume)
+            logger.info(f"🔊 獨立音頻程序已啟動 (pid={self.process.pid}, {self.mixer_format[0]}Hz)")
+            return True
+
+        except Exception as e:
+            logger.warning(f"獨立音頻程序啟動失敗: {e}")
+            self._terminate()
+            return False
+
+    def shutdown(self):
+        """停止音頻程序並釋放共享記憶體"""
+        if not self.initialized and not self.process:
+            return
+        self._shutting_down = True
+        self.stop()
+        self._send('shutdown')
+        if self.process:
+            self.process.join(timeout=3)
+        self._terminate()
+        logger.info("獨立音頻程序已關閉")
+
+    def _terminate(self):
+        self.initialized = False
+        if self.process and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=2)
+        self.process = None
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+        self._loaded.clear()
+        self._earcons.clear()
+        self._fail_pending()
+
+    def _ensure_alive(self) -> bool:
+        """音頻程序意外結束時自動重啟"""
+        if self.initialized and self.process and self.process.is_alive():
+            return True
+        if self._shutting_down or self.restart_count >= self.max_restarts:
+            return False
+        self.restart_count += 1
+        logger.warning(f"🔄 重啟獨立音頻程序 ({self.restart_count}/{self.max_restarts})")
+        self._terminate()
+        return self.start()
+
+    # ------------------------------------------------------------------
+    # 命令通道
+    # ------------------------------------------------------------------
+
+    def _new_id(self) -> int:
+        with self._request_lock:
+            self._next_id += 1
+            return self._next_id
+
+    def _send(self, *command):
+        if self._commands is not None:
+            self._commands.put(command)
+
+    def _call(self, command: str, *args, timeout: float = _REPLY_TIMEOUT) -> Any:
+        """送出命令並等待子程序回覆"""
+        rid = self._new_id()
+        event, holder = threading.Event(), []
+        self._replies[rid] = (event, holder)
+        self._send(command, rid, *args)
+        event.wait(timeout)
+        self._replies.pop(rid, None)
+        return holder[0] if holder else None
+
+    @staticmethod
+    def _watch(events, process):
+        """等待子程序結束後通知事件接收執行緒（取代定時檢查 is_alive）"""
+        process.join()
+        try:
+            events.put(('exit',))
+        except (ValueError, OSError):
+            pass
+
+    def _listen(self, events, process):
+        """接收子程序事件：播放開始/結束與同步命令回覆（阻塞等待，閒置時不喚醒）"""
+        while True:
+            try:
+                kind, *payload = events.get()
+            except (EOFError, OSError):
+                return
+
+            if kind == 'exit':
+                if process is self.process and not self._shutting_down:
+                    logger.error("獨立音頻程序意外結束")
+                    self.initialized = False
+                    self._fail_pending()
+                return
+            elif kind == 'reply':
+                rid, value = payload
+                waiter = self._replies.get(rid)
+                if waiter:
+                    waiter[1].append(value)
+                    waiter[0].set()
+            elif kind == 'started':
+                request = self._requests.get(payload[0])
+                if request:
+                    request.start_latency = payload[1]
+                    request.started.set()
+            elif kind == 'done':
+                rid, success, underruns = payload
+                request = self._requests.pop(rid, None)
+                if request:
+                    request.underruns = underruns
+                    request._finish(success)
+
+    def _fail_pending(self):
+        requests, self._requests = self._requests, {}
+        for request in requests.values():
+            request._finish(False)
+
+    # ------------------------------------------------------------------
+    # 解碼與預載
+    # ------------------------------------------------------------------
+
+    def load(self, audio_file: Path) -> Optional[str]:
+        """
+        確保音頻已在音頻程序中就緒
+
+        16-bit WAV 在主程序解碼與處理後經環形緩衝區傳送；其他格式由音頻程序自行解碼
+
+        Returns:
+            str: 音頻程序中的鍵值，無法就緒時返回 None
+        """
+        if not self._ensure_alive():
+            return None
+        try:
+            key = (str(audio_file), audio_file.stat().st_mtime_ns)
+        except OSError:
+            return None
+        if key in self._loaded:
+            self._loaded.move_to_end(key)
+            return self._loaded[key]
+
+        clip_key = f"{audio_file.name}:{key[1]}"
+        pcm = self._decode_wav(audio_file) if NUMPY_AVAILABLE else None
+        if pcm is not None:
+            data = pcm.tobytes()
+            with self._ring_lock:
+                self._send('preload_pcm', clip_key, len(data))
+                if not self.ring.write(data):
+                    logger.warning(f"環形緩衝區寫入逾時: {audio_file.name}")
+                    return None
+        elif not self._call('preload_file', clip_key, str(audio_file)):
+            return None
+
+        self._loaded[key] = clip_key
+        while len(self._loaded) > self.decoded_cache_size:
+            self._loaded.popitem(last=False)
+        return clip_key
+
+    def _decode_wav(self, audio_file: Path) -> Optional['np.ndarray']:
+        """解碼 16-bit WAV 並轉為音頻程序的輸出格式"""
+        try:
+            with wave.open(str(audio_file), 'rb') as wf:
+                if wf.getsampwidth() != 2:
+                    return None
+                rate, channels = wf.getframerate(), wf.getnchannels()
+                pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype='<i2').reshape(-1, channels)
+        except (wave.Error, OSError, ValueError, EOFError):
+            return None
+
+        target_rate, _, target_channels = self.mixer_format
+        if self.processor:
+            try:
+                pcm = self.processor(pcm, rate, audio_file, target_rate)
+            except Exception as e:
+                logger.warning(f"音頻處理失敗，使用原始音頻: {e}")
+                pcm = _resample_int16(pcm, rate, target_rate)
+        else:
+            pcm = _resample_int16(pcm, rate, target_rate)
+
+        if pcm.ndim == 1:
+            pcm = pcm[:, np.newaxis]
+        if pcm.shape[1] != target_channels:
+            mono = pcm.mean(axis=1, keepdims=True).astype(np.int16)
+            pcm = np.repeat(mono, target_channels, axis=1)
+        return np.ascontiguousarray(pcm, dtype=np.int16)
+
+    def preload(self, audio_file: Path) -> bool:
+        """預先將音頻送到音頻程序"""
+        return self.initialized and self.load(audio_file) is not None
+
+    def register_earcon(self, name: str, frequency: int, duration: float, volume: float = 0.5):
+        """在音頻程序中產生提示音"""
+        self._earcon_specs[name] = (frequency, duration, volume)
+        if self.initialized:
+            self._send('register_earcon', name, frequency, duration, volume)
+            self._earcons.add(name)
+
+    def has_earcon(self, name: str) -> bool:
+        return name in self._earcons
+
+    # ------------------------------------------------------------------
+    # 播放
+    # ------------------------------------------------------------------
+
+    def enqueue(self, source: Union[Path, float],
+                on_complete: Optional[Callable[[bool], None]] = None) -> PlaybackRequest:
+        """
+        將音頻加入音頻程序的播放佇列，立即返回播放請求
+
+        Args:
+            source: 音頻文件，或靜音秒數
+        """
+        request = PlaybackRequest(source, on_complete)
+        clip_key = self.load(source) if isinstance(source, Path) else None
+        if not self.initialized or (isinstance(source, Path) and clip_key is None):
+            request._finish(False)
+            return request
+
+        rid = self._new_id()
+        self._requests[rid] = request
+        if clip_key:
+            self._send('play', rid, clip_key)
+        else:
+            self._send('silence', rid, float(source))
+        return request
+
+    def play(self, audio_file: Path, timeout: Optional[float] = None) -> bool:
+        """播放音頻並等待完成"""
+        return self.enqueue(audio_file).wait(timeout)
+
+    def play_sequence(self, audio_files: List[Path], gap: float = 0.0,
+                      timeout: Optional[float] = None) -> bool:
+        """依序播放多段音頻（段落間插入靜音）並等待全部完成"""
+        requests = []
+        for index, audio_file in enumerate(audio_files):
+            if index and gap > 0:
+                requests.append(self.enqueue(gap))
+            requests.append(self.enqueue(audio_file))
+        return all(request.wait(timeout) for request in requests)
+
+    def play_earcon(self, name: str) -> bool:
+        """在音頻程序的獨立聲道播放提示音"""
+        if not self.initialized or name not in self._earcons:
+            return False
+        self._send('earcon', name)
+        return True
+
+    def set_volume(self, volume: float):
+        """設定播放音量（0.0 - 1.0）"""
+        self.volume = max(0.0, min(1.0, volume))
+        self._send('volume', self.volume)
+
+    def stop(self):
+        """停止目前播放並清空佇列"""
+        self._send('stop')
+
+    def is_busy(self) -> bool:
+        return bool(self._requests)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得音頻程序的健康統計"""
+        if not self.initialized:
+            return {}
+        stats = self._call('stats') or {}
+        stats['process_restarts'] = self.restart_count
+        return stats
+
+
+def _resample_int16(pcm: 'np.ndarray', rate: int, target_rate: int) -> 'np.ndarray':
+    if rate == target_rate:
+        return pcm
+    import audio_dsp
+    return audio_dsp.to_int16(audio_dsp.resample(audio_dsp.to_float(pcm), rate, target_rate))
+
+
+# =============================================================================
+# 音頻程序端
+# =============================================================================
+
+def _audio_process_main(commands, events, ring_name: str, ring_size: int, options: Dict[str, Any]):
+    """音頻程序入口：開啟輸出設備，處理命令並回報播放事件"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - audio - %(levelname)s - %(message)s')
+    from audio_engine import AudioOutputEngine, PYGAME_AVAILABLE
+
+    engine = AudioOutputEngine(
+        sample_rate=options['sample_rate'],
+        channels=options['channels'],
+        buffer=options['buffer'],
+        decoded_cache_size=options['decoded_cache_size'],
+        adaptive=options['adaptive']
+    )
+    if not PYGAME_AVAILABLE or not engine.start():
+        events.put(('ready', None))
+        return
+
+    import pygame
+    ring = PcmRingBuffer(ring_size, name=ring_name)
+    events.put(('ready', pygame.mixer.get_init()))
+
+    clips: "OrderedDict[str, pygame.mixer.Sound]" = OrderedDict()
+    clips_lock = threading.Lock()
+    pcm_jobs: "queue.Queue[Optional[Tuple[str, int]]]" = queue.Queue()
+
+    def store(key: str, sound):
+        with clips_lock:
+            clips[key] = sound
+            # 保留比主程序多一些，避免主程序認為已就緒的音頻已被移除
+            while len(clips) > options['decoded_cache_size'] * 2:
+                clips.popitem(last=False)
+
+    def read_pcm():
+        """依序從環形緩衝區讀出主程序送來的 PCM（與命令處理分開，停止命令不需等待）"""
+        while True:
+            job = pcm_jobs.get()
+            if job is None:
+                break
+            key, size = job
+            data = ring.read(size)
+            if data is None:
+                logging.warning(f"環形緩衝區讀取逾時: {key}")
+                continue
+            store(key, pygame.mixer.Sound(buffer=data))
+
+    def play(rid: int, sound):
+        if sound is None:
+            events.put(('done', rid, False, 0))
+            return
+        # 引擎未啟動時 enqueue 會在返回前就呼叫完成回調，請求經由 holder 取得
+        holder = []
+
+        def on_complete(success: bool):
+            events.put(('done', rid, success, holder[0].underruns if holder else 0))
+
+        request = engine.enqueue(sound, on_complete)
+        holder.append(request)
+        if not request.done.is_set():
+            threading.Thread(target=report_start, args=(rid, request), daemon=True).start()
+
+    def report_start(rid: int, request):
+        # 播放開始或結束（包括被 stop 清除）時返回
+        request.started.wait()
+        if request.start_latency is not None:
+            events.put(('started', rid, request.start_latency))
+
+    reader = threading.Thread(target=read_pcm, name='AudioRingReader', daemon=True)
+    reader.start()
+
+    while True:
+        command, *args = commands.get()
+        try:
+            if command == 'shutdown':
+                break
+            elif command == 'preload_pcm':
+                pcm_jobs.put((args[0], args[1]))
+            elif command == 'preload_file':
+                rid, key, path = args
+                sound = engine.load(Path(path))
+                if sound is not None:
+                    store(key, sound)
+                events.put(('reply', rid, sound is not None))
+            elif command == 'play':
+                rid, key = args
+                # 等待環形緩衝區讀取完成
+                deadline = time.monotonic() + _REPLY_TIMEOUT
+                while key not in clips and time.monotonic() < deadline:
+                    time.sleep(_RING_WAIT)
+                with clips_lock:
+                    sound = clips.get(key)
+                play(rid, sound)
+            elif command == 'silence':
+                rid, seconds = args
+                play(rid, engine.silence(seconds))
+            elif command == 'earcon':
+                engine.play_earcon(args[0])
+            elif command == 'register_earcon':
+                engine.register_earcon(*args)
+            elif command == 'volume':
+                engine.set_volume(args[0])
+            elif command == 'stop':
+                engine.stop()
+            elif command == 'stats':
+                events.put(('reply', args[0], engine.get_stats()))
+        except Exception as e:
+            logging.error(f"音頻程序命令 {command} 失敗: {e}")
+
+    pcm_jobs.put(None)
+    engine.shutdown()
+    ring.close()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 分層音頻儲存
+RAM 層（tmpfs）存放生成與播放中的音頻；持久層以壓縮格式（FLAC/Opus）保存於快閃記憶體
+寫入持久層一律在背景執行緒進行（write-behind），播放與生成路徑不同步寫入快閃記憶體
+"""
+
+import os
+import time
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from collections import OrderedDict
+from typing import Optional, Callable, Dict, Set, Union
+
+logger = logging.getLogger(__name__)
+
+# 持久層的壓縮參數（ffmpeg）
+CODEC_ARGS = {
+    'flac': ['-c:a', 'flac', '-compression_level', '8'],
+    'opus': ['-c:a', 'libopus', '-b:a', '48k'],
+}
+
+# 已是壓縮格式的音頻直接複製
+COMPRESSED_SUFFIXES = {'.mp3', '.flac', '.opus'}
+
+
+class TieredAudioStore:
+    """RAM 層 + 壓縮持久層的音頻儲存"""
+
+    def __init__(self, ram_dir: Path, persistent_dir: Path, ram_max_bytes: int,
+                 ram_min_age: float = 60, persistent_max_files: int = 200, codec: str = 'flac',
+                 on_evict: Optional[Callable[[Path], None]] = None):
+        self.ram_dir = self._usable_ram_dir(Path(ram_dir))
+        self.persistent_dir = Path(persistent_dir)
+        self.ram_max_bytes = ram_max_bytes
+        self.ram_min_age = ram_min_age
+        self.persistent_max_files = persistent_max_files
+        self.codec = codec if codec in CODEC_ARGS else 'flac'
+        self.on_evict = on_evict
+
+        # RAM 層使用順序（檔名 -> 大小），最近使用的在最後
+        self._ram: "OrderedDict[str, int]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        # 已排入背景寫入、尚未寫完的音頻（寫完前不移出 RAM 層）
+        self._pending: Set[str] = set()
+        # 持久層內容（原始檔名 -> 壓縮檔名），啟動時列出一次
+        self._persisted: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # 待寫入持久層的音頻，或其他延後寫入的工作（可呼叫物件）
+        self._queue: "queue.Queue[Union[Path, Callable[[], None], None]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+        self.ram_dir.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def _usable_ram_dir(ram_dir: Path) -> Path:
+        """RAM 層所在的 tmpfs 不存在時（非 Linux 環境）改用系統暫存目錄"""
+        if ram_dir.parent.is_dir():
+            return ram_dir
+        fallback = Path(tempfile.gettempdir()) / ram_dir.name
+        logger.warning(f"{ram_dir.parent} 不存在，RAM 層改用 {fallback}")
+        return fallback
+
+    def _scan(self):
+        """列出兩層現有內容（只在啟動時做一次）"""
+        files = sorted((f for f in self.ram_dir.iterdir() if f.is_file() and self._is_audio(f)),
+                       key=lambda f: f.stat().st_mtime)
+        for f in files:
+            self._ram[f.name] = f.stat().st_size
+            self._last_used[f.name] = f.stat().st_mtime
+
+        try:
+            self.persistent_dir.mkdir(parents=True, exist_ok=True)
+            for f in self.persistent_dir.iterdir():
+                if f.is_file() and '.tmp' not in f.name:
+                    self._persisted[self._original_name(f)] = f.name
+        except OSError as e:
+            logger.warning(f"持久音頻快取無法使用: {e}")
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """啟動背景寫入執行緒"""
+        if self._writer and self._writer.is_alive():
+            return
+        self._writer = threading.Thread(target=self._run_writer, name='AudioStoreWriter', daemon=True)
+        self._writer.start()
+        logger.info(f"💾 分層音頻儲存: RAM 層 {self.ram_dir} ({self.ram_max_bytes // (1024 * 1024)}MB)，"
+                    f"持久層 {self.persistent_dir} ({self.codec})")
+
+    def shutdown(self, timeout: float = 10):
+        """寫完佇列中的音頻後停止背景執行緒"""
+        if self._writer:
+            self._queue.put(None)
+            self._writer.join(timeout=timeout)
+            self._writer = None
+
+    # ------------------------------------------------------------------
+    # RAM 層
+    # ------------------------------------------------------------------
+
+    def commit(self, audio_file: Path, persist: bool = True):
+        """
+        登記新生成的音頻：計入 RAM 層容量，並排入背景壓縮寫入持久層
+
+        Args:
+            audio_file: RAM 層中的音頻文件
+            persist: 是否寫入持久層（預先生成、可能不會使用的音頻只留在 RAM 層）
+        """
+        try:
+            size = audio_file.stat().st_size
+        except OSError:
+            return
+        with self._lock:
+            self._ram[audio_file.name] = size
+            self._ram.move_to_end(audio_file.name)
+            self._last_used[audio_file.name] = time.time()
+            queue_write = (persist and audio_file.name not in self._persisted
+                           and audio_file.name not in self._pending)
+            if queue_write:
+                self._pending.add(audio_file.name)
+        if queue_write:
+            self._queue.put(audio_file)
+        self._evict()
+
+    def touch(self, audio_file: Path):
+        """標記音頻最近被使用（LRU）"""
+        with self._lock:
+            if audio_file.name in self._ram:
+                self._ram.move_to_end(audio_file.name)
+                self._last_used[audio_file.name] = time.time()
+
+    def discard(self, audio_file: Path):
+        """刪除兩層中的音頻並移除記錄（丟棄未使用或過期的音頻）"""
+        with self._lock:
+            self._ram.pop(audio_file.name, None)
+            self._last_used.pop(audio_file.name, None)
+            stored_name = self._persisted.pop(audio_file.name, None)
+        audio_file.unlink(missing_ok=True)
+        if stored_name:
+            (self.persistent_dir / stored_name).unlink(missing_ok=True)
+
+    def restore(self, audio_file: Path) -> Optional[Path]:
+        """
+        RAM 層沒有時，從持久層解壓縮回 RAM 層（快取未命中時的路徑）
+
+        Returns:
+            Path: 還原後的文件，持久層沒有時返回 None
+        """
+        with self._lock:
+            stored_name = self._persisted.get(audio_file.name)
+        if not stored_name:
+            return None
+
+        stored = self.persistent_dir / stored_name
+        temp_file = audio_file.with_name(f".{audio_file.name}.restore{audio_file.suffix}")
+        try:
+            if stored.suffix == audio_file.suffix:
+                shutil.copyfile(stored, temp_file)
+            elif not self._transcode(stored, temp_file, []):
+                return None
+            temp_file.replace(audio_file)
+        except OSError as e:
+            logger.debug(f"從持久層還原音頻失敗 {audio_file.name}: {e}")
+            temp_file.unlink(missing_ok=True)
+            return None
+
+        logger.info(f"💾 從持久層還原音頻: {audio_file.name}")
+        with self._lock:
+            self._ram[audio_file.name] = audio_file.stat().st_size
+            self._last_used[audio_file.name] = time.time()
+        self._evict()
+        return audio_file
+
+    def defer(self, write: Callable[[], None]):
+        """在背景寫入執行緒執行其他寫入 SD 卡的工作（例如延遲記錄），不佔用呼叫端執行緒"""
+        self._queue.put(write)
+
+    def _evict(self):
+        """超過 RAM 層容量時移除最久未使用的音頻（最近使用的目前/下一段不移除）"""
+        now = time.time()
+        evicted = []
+        with self._lock:
+            total = sum(self._ram.values())
+            for name in list(self._ram):
+                if total <= self.ram_max_bytes:
+                    break
+                if name in self._pending or now - self._last_used.get(name, 0) < self.ram_min_age:
+                    continue
+                path = self.ram_dir / name
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue
+                total -= self._ram.pop(name)
+                self._last_used.pop(name, None)
+                evicted.append(path)
+
+        for path in evicted:
+            logger.debug(f"RAM 層移除音頻: {path.name}")
+            if self.on_evict:
+                self.on_evict(path)
+
+    # ------------------------------------------------------------------
+    # 持久層（背景寫入）
+    # ------------------------------------------------------------------
+
+    def _run_writer(self):
+        while True:
+            audio_file = self._queue.get()
+            if audio_file is None:
+                break
+            if callable(audio_file):
+                try:
+                    audio_file()
+                except Exception as e:
+                    logger.warning(f"背景寫入失敗: {e}")
+                continue
+            try:
+                self._persist(audio_file)
+            except Exception as e:
+                logger.warning(f"寫入持久音頻快取失敗 {audio_file.name}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(audio_file.name)
+            self._evict()
+
+    def _persist(self, audio_file: Path):
+        if not audio_file.exists():
+            return
+        with self._lock:
+            if audio_file.name in self._persisted:
+                return
+
+        stored = None
+        if audio_file.suffix.lower() not in COMPRESSED_SUFFIXES:
+            compressed = self.persistent_dir / f"{audio_file.name}.{self.codec}"
+            temp_file = compressed.with_name(f"{compressed.stem}.tmp{compressed.suffix}")
+            if self._transcode(audio_file, temp_file, CODEC_ARGS[self.codec]):
+                stored = compressed
+        if stored is None:
+            # 已壓縮或沒有可用的編碼器時，原樣保存
+            stored = self.persistent_dir / audio_file.name
+            temp_file = stored.with_name(stored.name + '.tmp')
+            shutil.copyfile(audio_file, temp_file)
+        temp_file.replace(stored)
+
+        with self._lock:
+            self._persisted[audio_file.name] = stored.name
+        logger.debug(f"💾 已壓縮保存: {stored.name} ({stored.stat().st_size} bytes)")
+        self._prune_persistent()
+
+    def _prune_persistent(self):
+        """持久層超過數量上限時刪除最舊的音頻"""
+        with self._lock:
+            if len(self._persisted) <= self.persistent_max_files:
+                return
+            entries = sorted(self._persisted.items(),
+                             key=lambda item: self._mtime(self.persistent_dir / item[1]))
+            excess = entries[:len(entries) - self.persistent_max_files]
+            for original, stored in excess:
+                del self._persisted[original]
+        for _, stored in excess:
+            (self.persistent_dir / stored).unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------
+    # 內部工具
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _transcode(source: Path, target: Path, codec_args) -> bool:
+        """以 ffmpeg 轉換格式（壓縮或還原為 WAV）；FLAC 可改用 sox"""
+        commands = [['ffmpeg', '-v', 'error', '-y', '-i', str(source)] + codec_args + [str(target)]]
+        if 'libopus' not in codec_args and source.suffix != '.opus':
+            commands.append(['sox', str(source), str(target)])
+
+        for cmd in commands:
+            try:
+                result = subprocess.run(cmd, capture_output=True, timeout=60)
+                if result.returncode == 0 and target.exists():
+                    return True
+                logger.debug(f"{cmd[0]} 轉換失敗: {result.stderr[-200:]}")
+            except (OSError, subprocess.TimeoutExpired) as e:
+                logger.debug(f"{cmd[0]} 無法使用: {e}")
+            target.unlink(missing_ok=True)
+        return False
+
+    @staticmethod
+    def _original_name(stored: Path) -> str:
+        """壓縮檔名還原為原始檔名（x.wav.flac -> x.wav）"""
+        if stored.suffix in ('.flac', '.opus') and Path(stored.stem).suffix:
+            return stored.stem
+        return stored.name
+
+    @staticmethod
+    def _is_audio(path: Path) -> bool:
+        return path.suffix.lower() in ('.wav', '.mp3') and not path.name.startswith('.')
+
+    @staticmethod
+    def _mtime(path: Path) -> float:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return 0.0
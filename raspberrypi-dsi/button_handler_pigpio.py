@@ -292,8 +292,8 @@ if __name__ == "__main__":
         print("按鈕測試開始，按 Ctrl+C 結束...")
         print("請試試短按和長按按鈕...")
         
-        while True:
-            time.sleep(0.1)
+        # 阻塞等待信號，按鈕事件由 pigpio 回調處理
+        signal.pause()
             
     except Exception as e:
         print(f"錯誤: {e}")
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 系統能力登錄
+啟動時一次性偵測音頻工具、Festival 聲音與可用的音量控制，結果持久化並從記憶體回答查詢
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import subprocess
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# 要偵測的外部工具與其版本參數
+TOOL_VERSION_ARGS = {
+    'aplay': ['--version'],
+    'amixer': ['--version'],
+    'ffmpeg': ['-version'],
+    'ffplay': ['-version'],
+    'sox': ['--version'],
+    'mpg123': ['--version'],
+    'festival': ['--version'],
+    'espeak': ['--version'],
+}
+
+# 依優先順序嘗試的 ALSA 音量控制名稱
+MIXER_CONTROLS = ['PCM', 'Master', 'Speaker', 'Headphone', 'HDMI']
+
+FESTIVAL_VOICE_DIRS = [
+    '/usr/share/festival/voices',
+    '/usr/lib/festival/voices',
+    '/usr/local/share/festival/voices',
+]
+
+ALSA_CARDS_FILE = '/proc/asound/cards'
+
+# 持久化格式版本，偵測邏輯變更時遞增
+REGISTRY_FORMAT = 1
+
+
+class CapabilityRegistry:
+    """系統能力登錄（一次偵測，之後只查記憶體）"""
+
+    def __init__(self, cache_file: Path):
+        self.cache_file = Path(cache_file)
+        self.capabilities: Dict[str, Any] = {}
+
+    def load_or_probe(self) -> Dict[str, Any]:
+        """
+        載入持久化結果；若工具或硬體已變更則重新偵測
+
+        Returns:
+            Dict: 偵測結果
+        """
+        fingerprint = self._fingerprint()
+
+        cached = self._load_cache()
+        if cached and cached.get('fingerprint') == fingerprint:
+            self.capabilities = cached
+            logger.info("🧰 使用已快取的系統能力偵測結果")
+            return self.capabilities
+
+        self.capabilities = self._probe()
+        self.capabilities['fingerprint'] = fingerprint
+        self._save_cache()
+        return self.capabilities
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+
+    def has(self, tool: str) -> bool:
+        """工具是否可用"""
+        return tool in self.capabilities.get('tools', {})
+
+    def path(self, tool: str) -> Optional[str]:
+        """工具的執行檔路徑"""
+        info = self.capabilities.get('tools', {}).get(tool)
+        return info['path'] if info else None
+
+    def version(self, tool: str) -> str:
+        """工具的版本字串"""
+        info = self.capabilities.get('tools', {}).get(tool)
+        return info['version'] if info else ''
+
+    @property
+    def alsa_devices(self) -> bool:
+        """是否有 ALSA 播放設備"""
+        return self.capabilities.get('alsa_devices', False)
+
+    @property
+    def mixer_control(self) -> Optional[str]:
+        """可用的音量控制名稱"""
+        return self.capabilities.get('mixer_control')
+
+    @property
+    def festival_voices(self) -> List[str]:
+        """已安裝的 Festival 聲音"""
+        return self.capabilities.get('festival_voices', [])
+
+    def has_festival_voice(self, voice: str) -> bool:
+        """指定的 Festival 聲音是否已安裝"""
+        return voice in self.festival_voices
+
+    def can_play_externally(self, suffix: str) -> bool:
+        """是否有可播放此格式的外部播放器"""
+        if suffix.lower() == '.mp3':
+            return self.has('mpg123') or self.has('ffplay')
+        return self.has('aplay') or self.has('ffplay')
+
+    # ------------------------------------------------------------------
+    # 偵測
+    # ------------------------------------------------------------------
+
+    def _probe(self) -> Dict[str, Any]:
+        """執行所有偵測（每個工具最多一個子程序）"""
+        logger.info("🧰 偵測系統音頻能力...")
+        tools = {}
+        for tool, args in TOOL_VERSION_ARGS.items():
+            tool_path = shutil.which(tool)
+            if not tool_path:
+                continue
+            tools[tool] = {'path': tool_path, 'version': self._read_version(tool_path, args)}
+
+        capabilities = {
+            'format': REGISTRY_FORMAT,
+            'tools': tools,
+            'alsa_devices': self._probe_alsa_devices(tools),
+            'mixer_control': self._probe_mixer_control(tools),
+            'festival_voices': self._scan_festival_voices(),
+        }
+
+        available = ', '.join(sorted(tools)) or '無'
+        logger.info(f"🧰 可用工具: {available}")
+        logger.info(f"🧰 音量控制: {capabilities['mixer_control'] or '無'}，"
+                    f"Festival 聲音: {len(capabilities['festival_voices'])} 個")
+        return capabilities
+
+    @staticmethod
+    def _read_version(tool_path: str, args: List[str]) -> str:
+        try:
+            result = subprocess.run([tool_path] + args, capture_output=True, text=True, timeout=5)
+            output = (result.stdout or result.stderr).strip()
+            return output.splitlines()[0] if output else ''
+        except Exception:
+            return ''
+
+    @staticmethod
+    def _probe_alsa_devices(tools: Dict[str, Any]) -> bool:
+        if 'aplay' not in tools:
+            return False
+        try:
+            result = subprocess.run([tools['aplay']['path'], '-l'], capture_output=True, text=True, timeout=5)
+            return result.returncode == 0 and 'card' in result.stdout
+        except Exception:
+            return False
+
+    @staticmethod
+    def _probe_mixer_control(tools: Dict[str, Any]) -> Optional[str]:
+        if 'amixer' not in tools:
+            return None
+        try:
+            result = subprocess.run([tools['amixer']['path'], 'scontrols'],
+                                    capture_output=True, text=True, timeout=5)
+            if result.returncode != 0:
+                return None
+            # 輸出格式：Simple mixer control 'PCM',0
+            available = {line.split("'")[1] for line in result.stdout.splitlines() if "'" in line}
+            for control in MIXER_CONTROLS:
+                if control in available:
+                    return control
+        except Exception:
+            pass
+        return None
+
+    @staticmethod
+    def _scan_festival_voices() -> List[str]:
+        """掃描 Festival 聲音目錄（<voices>/<語言>/<聲音>）"""
+        voices = []
+        for voice_dir in FESTIVAL_VOICE_DIRS:
+            root = Path(voice_dir)
+            if not root.is_dir():
+                continue
+            for language_dir in root.iterdir():
+                if language_dir.is_dir():
+                    voices.extend(v.name for v in language_dir.iterdir() if v.is_dir())
+        return sorted(set(voices))
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _fingerprint(self) -> str:
+        """以執行檔與設備的檔案資訊作為指紋（只做 stat，不啟動子程序）"""
+        parts = [f"format={REGISTRY_FORMAT}"]
+        for tool in TOOL_VERSION_ARGS:
+            tool_path = shutil.which(tool)
+            if tool_path:
+                st = os.stat(tool_path)
+                parts.append(f"{tool}={tool_path}:{st.st_size}:{int(st.st_mtime)}")
+        for voice_dir in FESTIVAL_VOICE_DIRS:
+            if os.path.isdir(voice_dir):
+                parts.append(f"{voice_dir}:{int(os.stat(voice_dir).st_mtime)}")
+        try:
+            parts.append(Path(ALSA_CARDS_FILE).read_text())
+        except OSError:
+            pass
+        return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+    def _load_cache(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cache(self):
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.cache_file.with_suffix('.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.capabilities, f, ensure_ascii=False, indent=2)
+            temp_file.replace(self.cache_file)
+        except OSError as e:
+            logger.warning(f"無法保存系統能力偵測結果: {e}")
@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - DevTools 協定瀏覽器後端
+直接以持久的 WebSocket 連線控制 Chrome，不經過 chromedriver 行程與 HTTP 轉送
+提供 WebControllerDSI 用到的 WebDriver 介面子集（get, execute_script, find_element ...）
+"""
+
+import os
+import json
+import time
+import signal
+import socket
+import logging
+import threading
+import subprocess
+import urllib.request
+from urllib.parse import urlparse
+from typing import Optional, Callable, Dict, Any, List
+
+from ws_frames import OP_TEXT, FrameReader, client_handshake, encode_frame
+
+# 使用 selenium 的例外類型（已安裝時），讓 WebDriverWait 與既有的 except 區塊照常運作
+try:
+    from selenium.common.exceptions import (
+        WebDriverException, TimeoutException, NoSuchElementException, JavascriptException
+    )
+except ImportError:
+    class WebDriverException(Exception):
+        pass
+
+    class TimeoutException(WebDriverException):
+        pass
+
+    class NoSuchElementException(WebDriverException):
+        pass
+
+    class JavascriptException(WebDriverException):
+        pass
+
+logger = logging.getLogger(__name__)
+
+# 定位方式（與 selenium By 常數的字串值相同）
+_LOCATORS = {
+    'id': "document.getElementById({0})",
+    'css selector': "document.querySelector({0})",
+    'name': "document.querySelector('[name=\"' + {0} + '\"]')",
+    'class name': "document.getElementsByClassName({0})[0]",
+    'tag name': "document.getElementsByTagName({0})[0]",
+    'xpath': "document.evaluate({0}, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue",
+}
+
+
+def get_chrome_binary_path() -> Optional[str]:
+    """自動偵測 Chrome / Chromium 執行檔路徑"""
+    possible_paths = [
+        "/usr/bin/chromium-browser",
+        "/usr/bin/chromium",
+        "/usr/bin/google-chrome",
+        "/snap/bin/chromium",
+        "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    ]
+
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+
+    for name in ("chromium-browser", "chromium", "google-chrome"):
+        result = subprocess.run(['which', name], capture_output=True, text=True)
+        if result.returncode == 0:
+            return result.stdout.strip()
+    return None
+
+
+class CDPConnection:
+    """DevTools 協定連線：依 id 配對回應，並分派事件"""
+
+    def __init__(self, ws_url: str, connect_timeout: float = 10):
+        parsed = urlparse(ws_url)
+        self.sock = socket.create_connection((parsed.hostname, parsed.port or 80), timeout=connect_timeout)
+        if not client_handshake(self.sock, parsed.netloc, parsed.path or '/'):
+            self.sock.close()
+            raise WebDriverException(f"DevTools WebSocket 握手失敗: {ws_url}")
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self._next_id = 0
+        self._id_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._listeners: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self.closed = False
+
+        threading.Thread(target=self._read_loop, name='CDPReader', daemon=True).start()
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: float = 30) -> Dict[str, Any]:
+        """
+        呼叫 DevTools 方法並等待回應
+
+        Args:
+            method: 方法名稱（如 Runtime.evaluate）
+            params: 參數
+            timeout: 等待秒數
+
+        Returns:
+            Dict: result 欄位
+        """
+        if self.closed:
+            raise WebDriverException("DevTools 連線已關閉")
+
+        with self._id_lock:
+            self._next_id += 1
+            message_id = self._next_id
+        waiter = {'event': threading.Event(), 'response': None}
+        self._pending[message_id] = waiter
+
+        payload = json.dumps({'id': message_id, 'method': method, 'params': params or {}})
+        try:
+            with self._send_lock:
+                self.sock.sendall(encode_frame(OP_TEXT, payload.encode('utf-8'), mask=True))
+        except OSError as e:
+            self._pending.pop(message_id, None)
+            raise WebDriverException(f"DevTools 送出失敗: {e}")
+
+        if not waiter['event'].wait(timeout):
+            self._pending.pop(message_id, None)
+            raise TimeoutException(f"DevTools {method} 在 {timeout} 秒內未回應")
+
+        response = waiter['response']
+        if response is None:
+            raise WebDriverException("DevTools 連線已關閉")
+        if 'error' in response:
+            raise WebDriverException(f"DevTools {method} 失敗: {response['error'].get('message')}")
+        return response.get('result', {})
+
+    def on(self, event: str, handler: Callable[[Dict[str, Any]], None]):
+        """註冊事件處理函數（在接收執行緒中呼叫）"""
+        self._listeners.setdefault(event, []).append(handler)
+
+    def off(self, event: str, handler: Callable[[Dict[str, Any]], None]):
+        """移除事件處理函數"""
+        if handler in self._listeners.get(event, []):
+            self._listeners[event].remove(handler)
+
+    def close(self):
+        self.closed = True
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def _read_loop(self):
+        reader = FrameReader(self.sock, masked_replies=True)
+        try:
+            while True:
+                data = reader.read_message()
+                if data is None:
+                    break
+                message = json.loads(data.decode('utf-8'))
+                if 'id' in message:
+                    waiter = self._pending.pop(message['id'], None)
+                    if waiter:
+                        waiter['response'] = message
+                        waiter['event'].set()
+                else:
+                    for handler in list(self._listeners.get(message.get('method'), [])):
+                        try:
+                            handler(message.get('params', {}))
+                        except Exception as e:
+                            logger.debug(f"DevTools 事件處理失敗 {message.get('method')}: {e}")
+        except (OSError, ValueError):
+            pass
+
+        self.closed = True
+        for waiter in list(self._pending.values()):
+            waiter['event'].set()
+        self._pending.clear()
+
+
+class CDPElement:
+    """頁面元素（持有 Runtime 物件參照）"""
+
+    def __init__(self, driver: 'CDPDriver', object_id: str):
+        self._driver = driver
+        self._object_id = object_id
+
+    def _call(self, function: str, *args):
+        return self._driver._call_function_on(self._object_id, function, *args)
+
+    @property
+    def text(self) -> str:
+        return self._call("function() { return this.innerText; }") or ''
+
+    def get_attribute(self, name: str):
+        return self._call("function(name) { return this.getAttribute(name); }", name)
+
+    def is_displayed(self) -> bool:
+        return bool(self._call("""function() {
+            const style = window.getComputedStyle(this);
+            return style.visibility !== 'hidden' && style.display !== 'none' && this.getClientRects().length > 0;
+        }"""))
+
+    def is_enabled(self) -> bool:
+        return not self._call("function() { return !!this.disabled; }")
+
+    def click(self):
+        """以滑鼠事件點擊元素中心（與 chromedriver 相同，產生可信任的使用者事件）"""
+        rect = self._call("""function() {
+            this.scrollIntoView({block: 'center', inline: 'center'});
+            const r = this.getBoundingClientRect();
+            return {x: r.left + r.width / 2, y: r.top + r.height / 2};
+        }""")
+        for event_type in ('mouseMoved', 'mousePressed', 'mouseReleased'):
+            self._driver.cdp.call('Input.dispatchMouseEvent', {
+                'type': event_type, 'x': rect['x'], 'y': rect['y'],
+                'button': 'left', 'clickCount': 1
+            })
+
+
+class _DetachedProcess:
+    """前一次執行啟動的 Chrome 行程（不是本行程的子行程，以 pid 控制；介面同 subprocess.Popen 子集）"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, 0)
+                # 已結束但尚未被回收的行程（zombie）也視為已結束
+                with open(f'/proc/{self.pid}/stat', 'r') as f:
+                    if f.read().rsplit(')', 1)[-1].split()[0] == 'Z':
+                        self.returncode = 0
+            except ProcessLookupError:
+                self.returncode = 0
+            except (PermissionError, OSError, IndexError):
+                pass
+        return self.returncode
+
+    def _signal(self, sig: int):
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self):
+        self._signal(signal.SIGTERM)
+
+    def kill(self):
+        self._signal(signal.SIGKILL)
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        deadline = None if timeout is None else time.time() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.time() > deadline:
+                raise subprocess.TimeoutExpired(str(self.pid), timeout)
+            time.sleep(0.1)
+        return self.returncode
+
+
+def _read_chrome_pid(pid_file: Optional[str], port: int) -> Optional[int]:
+    """讀取前一次啟動的 Chrome pid（確認行程仍存在且使用同一個偵錯埠）"""
+    if not pid_file:
+        return None
+    try:
+        with open(pid_file, 'r') as f:
+            pid = int(f.read().strip())
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            cmdline = f.read().split(b'\0')
+    except (OSError, ValueError):
+        return None
+    return pid if f'--remote-debugging-port={port}'.encode() in cmdline else None
+
+
+class CDPDriver:
+    """以 DevTools 協定直接控制的 Chrome（WebDriver 介面子集）"""
+
+    def __init__(self, arguments: List[str], binary: Optional[str] = None, port: int = 9222,
+                 startup_timeout: float = 20, pid_file: Optional[str] = None):
+        """
+        啟動 Chrome 並連上頁面
+
+        Args:
+            arguments: Chrome 命令列參數（與 chromedriver 使用的選項相同）
+            binary: Chrome 執行檔路徑，None 時自動偵測
+            port: 遠端偵錯埠
+            startup_timeout: 等待 DevTools 端點出現的秒數
+            pid_file: 記錄 Chrome pid 的檔案（Python 端重啟時用來重新連上或結束殘留的 Chrome）
+        """
+        self._init_state(port)
+
+        binary = binary or get_chrome_binary_path()
+        if not binary:
+            raise WebDriverException("未找到 Chrome / Chromium 執行檔")
+
+        # 殘留的 Chrome 會佔用設定檔，新啟動的 Chrome 只會在舊行程開新視窗
+        stale_pid = _read_chrome_pid(pid_file, port)
+        if stale_pid:
+            logger.info(f"結束無回應的殘留 Chrome (pid {stale_pid})")
+            stale = _DetachedProcess(stale_pid)
+            stale.terminate()
+            try:
+                stale.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                stale.kill()
+
+        # 用戶端握手不送 Origin 標頭，Chrome 會接受；不加 --remote-allow-origins，網頁無法連上 DevTools
+        command = [binary, f'--remote-debugging-port={port}'] + list(arguments) + ['about:blank']
+        # 獨立的 session：Python 端結束或收到終端機信號時 Chrome 不受影響，可被下一次執行重新連上
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                        start_new_session=True)
+        logger.info(f"Chrome 已啟動 (pid {self.process.pid})，DevTools 埠 {port}")
+        if pid_file:
+            try:
+                with open(pid_file, 'w') as f:
+                    f.write(str(self.process.pid))
+            except OSError as e:
+                logger.debug(f"寫入 Chrome pid 檔失敗: {e}")
+
+        try:
+            self._attach(self._wait_for_page_target(startup_timeout))
+        except Exception:
+            self.quit()
+            raise
+
+    @classmethod
+    def reattach(cls, port: int = 9222, pid_file: Optional[str] = None) -> Optional['CDPDriver']:
+        """
+        連上前一次執行留下、仍在運行的 Chrome（Python 端重啟時不必重新啟動瀏覽器與載入頁面）
+
+        Args:
+            port: 遠端偵錯埠
+            pid_file: Chrome pid 檔（取得行程以便監控記憶體與結束）
+
+        Returns:
+            CDPDriver: 已連上前景頁面（reattached 為 True）；沒有可用的 Chrome 時返回 None
+        """
+        driver = cls.__new__(cls)
+        driver._init_state(port)
+        try:
+            targets = [target for target in driver._devtools_http('list')
+                       if target.get('type') == 'page' and target.get('webSocketDebuggerUrl')]
+        except (OSError, ValueError, TypeError):
+            return None
+        if not targets:
+            return None
+
+        # 清單依最近使用排序：第一個是顯示中的頁面，其餘（前一次的預熱備用頁）關閉
+        for target in targets[1:]:
+            try:
+                driver._devtools_http(f"close/{target['id']}")
+            except OSError:
+                pass
+
+        try:
+            driver._attach(targets[0])
+            driver.cdp.call('Runtime.evaluate', {'expression': '1', 'returnByValue': True}, timeout=3)
+        except Exception as e:
+            logger.info(f"執行中的 Chrome 無回應，無法重新連上: {e}")
+            if driver.cdp:
+                driver.cdp.close()
+            return None
+
+        pid = _read_chrome_pid(pid_file, port)
+        driver.process = _DetachedProcess(pid) if pid else None
+        driver.reattached = True
+        logger.info(f"已重新連上執行中的 Chrome (pid {pid or '未知'})，DevTools 埠 {port}")
+        return driver
+
+    def _init_state(self, port: int):
+        self.port = port
+        self.script_timeout = 30
+        self.page_load_timeout = 60
+        self.process = None
+        self.target_id = None
+        self.cdp = None
+        self.reattached = False
+
+    def _attach(self, target: Dict[str, Any]):
+        self.target_id = target.get('id')
+        self.cdp = CDPConnection(target['webSocketDebuggerUrl'])
+        self.cdp.call('Page.enable')
+
+    def _devtools_http(self, path: str, method: str = 'GET'):
+        request = urllib.request.Request(f'http://127.0.0.1:{self.port}/json/{path}', method=method)
+        with urllib.request.urlopen(request, timeout=5) as response:
+            body = response.read().decode('utf-8')
+        try:
+            return json.loads(body)
+        except ValueError:
+            return body
+
+    def _wait_for_page_target(self, timeout: float) -> Dict[str, Any]:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise WebDriverException(f"Chrome 啟動後立即結束 (exit {self.process.returncode})")
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{self.port}/json/list', timeout=2) as response:
+                    targets = json.loads(response.read().decode('utf-8'))
+                for target in targets:
+                    if target.get('type') == 'page' and target.get('webSocketDebuggerUrl'):
+                        return target
+            except (OSError, ValueError):
+                pass
+            time.sleep(0.1)
+        raise TimeoutException(f"{timeout} 秒內未找到 Chrome 頁面 (DevTools 埠 {self.port})")
+
+    # ------------------------------------------------------------------
+    # 導覽
+    # ------------------------------------------------------------------
+
+    def get(self, url: str):
+        """載入網址並等待 load 事件"""
+        self._navigate('Page.navigate', {'url': url})
+
+    def refresh(self):
+        """重新載入頁面並等待 load 事件"""
+        self._navigate('Page.reload', {})
+
+    def _navigate(self, method: str, params: Dict[str, Any]):
+        loaded = threading.Event()
+        handler = lambda _: loaded.set()
+        self.cdp.on('Page.loadEventFired', handler)
+        try:
+            result = self.cdp.call(method, params)
+            if result.get('errorText'):
+                raise WebDriverException(f"載入失敗: {result['errorText']}")
+            if not loaded.wait(self.page_load_timeout):
+                raise TimeoutException(f"頁面在 {self.page_load_timeout} 秒內未載入完成")
+        finally:
+            self.cdp.off('Page.loadEventFired', handler)
+
+    def set_script_timeout(self, timeout: float):
+        self.script_timeout = timeout
+
+    def set_page_load_timeout(self, timeout: float):
+        self.page_load_timeout = timeout
+
+    @property
+    def title(self) -> str:
+        return self.execute_script("return document.title;")
+
+    @property
+    def current_url(self) -> str:
+        return self.execute_script("return location.href;")
+
+    # ------------------------------------------------------------------
+    # 腳本
+    # ------------------------------------------------------------------
+
+    def execute_script(self, script: str, *args):
+        """執行腳本（與 WebDriver 相同：腳本為函數本體，參數以 arguments 取得）"""
+        expression = f"(function() {{\n{script}\n}}).apply(window, {json.dumps(list(args))})"
+        return self._evaluate(expression, await_promise=False, timeout=self.script_timeout)
+
+    def execute_async_script(self, script: str, *args):
+        """執行非同步腳本（最後一個參數為完成回呼）"""
+        expression = (
+            "new Promise(function(done) {"
+            f"(function() {{\n{script}\n}}).apply(window, {json.dumps(list(args))}.concat([done]));"
+            "})"
+        )
+        return self._evaluate(expression, await_promise=True, timeout=self.script_timeout)
+
+    def execute_cdp_cmd(self, cmd: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """直接送出 DevTools 協定指令（與 Selenium Chrome 驅動程式相同介面）"""
+        return self.cdp.call(cmd, params or {})
+
+    def _evaluate(self, expression: str, await_promise: bool, timeout: float):
+        result = self.cdp.call('Runtime.evaluate', {
+            'expression': expression,
+            'returnByValue': True,
+            'awaitPromise': await_promise,
+        }, timeout=timeout)
+        return self._unwrap(result)
+
+    def _call_function_on(self, object_id: str, function: str, *args):
+        result = self.cdp.call('Runtime.callFunctionOn', {
+            'objectId': object_id,
+            'functionDeclaration': function,
+            'arguments': [{'value': arg} for arg in args],
+            'returnByValue': True,
+        }, timeout=self.script_timeout)
+        return self._unwrap(result)
+
+    @staticmethod
+    def _unwrap(result: Dict[str, Any]):
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            description = details.get('exception', {}).get('description') or details.get('text')
+            raise JavascriptException(f"JavaScript 錯誤: {description}")
+        return result.get('result', {}).get('value')
+
+    # ------------------------------------------------------------------
+    # 元素
+    # ------------------------------------------------------------------
+
+    def find_element(self, by: str, value: str) -> CDPElement:
+        """尋找元素（支援 id, css selector, name, class name, tag name, xpath）"""
+        if by not in _LOCATORS:
+            raise WebDriverException(f"不支援的定位方式: {by}")
+
+        result = self.cdp.call('Runtime.evaluate', {
+            'expression': _LOCATORS[by].format(json.dumps(value)),
+        }, timeout=self.script_timeout)
+        if 'exceptionDetails' in result:
+            self._unwrap(result)
+        remote = result.get('result', {})
+        if not remote.get('objectId') or remote.get('subtype') == 'null':
+            raise NoSuchElementException(f"找不到元素: {by}={value}")
+        return CDPElement(self, remote['objectId'])
+
+    # ------------------------------------------------------------------
+    # 分頁（同一個 Chrome 中的其他頁面，用於預熱備用頁）
+    # ------------------------------------------------------------------
+
+    def open_page(self, url: str) -> 'CDPDriver':
+        """
+        在背景分頁開啟網址並等待載入完成
+
+        Returns:
+            CDPDriver: 控制新分頁的 driver（不擁有 Chrome 行程）
+        """
+        target = self._devtools_http('new?about:blank', method='PUT')
+        page = CDPDriver.__new__(CDPDriver)
+        page._init_state(self.port)
+        page.script_timeout = self.script_timeout
+        page.page_load_timeout = self.page_load_timeout
+        try:
+            page._attach(target)
+            page.get(url)
+        except Exception:
+            page.close_page()
+            raise
+        return page
+
+    def activate(self):
+        """將此分頁切換到前景"""
+        self._devtools_http(f'activate/{self.target_id}')
+
+    def close_page(self):
+        """關閉此分頁（不結束 Chrome）"""
+        if self.cdp:
+            self.cdp.close()
+        if self.target_id:
+            try:
+                self._devtools_http(f'close/{self.target_id}')
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # 關閉
+    # ------------------------------------------------------------------
+
+    def detach(self):
+        """中斷控制連線但讓 Chrome 繼續運行（下次啟動時以 reattach 重新連上）"""
+        if self.cdp:
+            self.cdp.close()
+        self.process = None
+
+    def quit(self):
+        """關閉 Chrome"""
+        cdp = self.cdp
+        if cdp and not cdp.closed:
+            try:
+                cdp.call('Browser.close', timeout=3)
+            except WebDriverException:
+                pass
+            cdp.close()
+
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
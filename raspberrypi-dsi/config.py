@@ -24,6 +24,7 @@ BUTTON_CONFIG = {
     'bounce_time': 500,  # 按鈕防彈跳時間（毫秒）- 增加到 500ms
     'long_press_time': 2.0,  # 長按時間（秒）
     'min_press_interval': 1.0,  # 最小按壓間隔（秒）- 防止快速重複觸發
+    'startup_wait': 90,  # 開機期間按下按鈕時，等待網頁就緒的最長時間（秒）
 }
 
 # LED指示燈配置（可選）
@@ -44,6 +45,51 @@ AUDIO_CONFIG = {
     'volume': 80,  # 預設音量 (0-100)
     'sample_rate': 44100,  # 採樣率
     'channels': 2,  # 聲道數 (1=單聲道, 2=立體聲)
+    'mixer_buffer': 512,  # pygame mixer 初始緩衝區大小（樣本數）
+    # 依播放期間偵測到的 underrun 自動調整緩衝區與音頻執行緒優先權
+    'adaptive_buffer': {
+        'enabled': True,
+        'min_buffer': 256,
+        'max_buffer': 4096,
+        'stall_factor': 1.0,  # 排程停頓超過幾個緩衝區週期視為 underrun
+        'clean_clips_to_shrink': 5,  # 連續幾段無 underrun 後縮小緩衝區
+        'min_nice': -10,  # 優先權上限（nice 值下限，需要 CAP_SYS_NICE）
+        'health_file': '/dev/shm/wakeupmap_audio_health.json',  # 音頻健康統計
+    },
+    'decoded_cache_size': 4,  # 記憶體中保留的已解碼音頻數量
+    # 獨立音頻程序：輸出不受 Selenium 與日誌佔用 GIL 影響（PCM 經共享記憶體環形緩衝區傳送）
+    'audio_process': {
+        'enabled': False,
+        'ring_mb': 4,  # 環形緩衝區大小
+        'max_restarts': 3,  # 音頻程序意外結束時的自動重啟次數
+    },
+    'capability_cache_file': '/var/tmp/wakeupmap_capabilities.json',  # 系統能力偵測結果（重開機後保留）
+    # 分層音頻儲存：RAM 層為 TTS_CONFIG['cache_dir']，持久層以壓縮格式背景寫入
+    'storage': {
+        'ram_max_mb': 64,  # RAM 層容量上限
+        'ram_min_age': 60,  # 最近此秒數內使用的音頻（目前/下一段）不會被移出 RAM 層
+        'persistent_dir': '/var/cache/wakeupmap/audio',
+        'persistent_codec': 'flac',  # 'flac'（無損）或 'opus'（需 libopus）
+        'persistent_max_files': 200,
+    },
+    # 記憶體內音頻處理（需要 numpy；不回寫文件，增益資訊存於快取 metadata）
+    'dsp': {
+        'enabled': True,
+        'target_lufs': -16.0,  # 響度標準化目標
+        'peak_dbfs': -1.0,  # 峰值上限
+        'max_gain_db': 20.0,  # 最大提升增益
+        'eq_freq': 1000,  # 中頻增強
+        'eq_gain_db': 2.0,
+        'eq_q': 0.5,
+        'compressor_threshold_db': -20.0,
+        'compressor_ratio': 3.0,
+    },
+    # 預載到記憶體的提示音：名稱 -> (頻率 Hz, 持續秒數)
+    'earcons': {
+        'success': (880, 0.1),
+        'error': (440, 0.2),
+        'click': (800, 0.1),
+    },
 }
 
 # GF1002 喇叭配置
@@ -62,7 +108,7 @@ TTS_CONFIG = {
     'voice_id': 'female',  # 女性聲音
     'voice_name': 'kal_diphone',  # Festival 聲音名稱
     'cache_enabled': True,  # 啟用音頻快取
-    'cache_dir': '/tmp/wakeupmap_audio_cache',
+    'cache_dir': '/dev/shm/wakeupmap_audio_cache',  # RAM 層（tmpfs），避免寫入 SD 卡
     # Festival 特定配置
     'festival_voice': 'kal_diphone',  # 修復：移除 voice_ 前綴
     'festival_female_voices': [
@@ -70,9 +116,21 @@ TTS_CONFIG = {
         'cmu_us_slt_arctic_hts',  # 高質量女性聲音（如果可用）
         'nitech_us_slt_arctic_hts'  # 備用女性聲音
     ],
+    # Festival 常駐伺服器（聲音只載入一次，重用於所有合成）
+    'festival_server_enabled': True,
+    'festival_server_port': 1314,
+    'festival_server_timeout': 30,  # 啟動與單次合成逾時（秒）
+    'festival_server_max_restarts': 3,  # 連續失敗時的最大自動重啟次數
+    'festival_server_health_interval': 60,  # 閒置超過此秒數後，合成前先做健康檢查
     # OpenAI TTS 配置
     'openai_api_key': '',  # 需要設定 OpenAI API 金鑰
     'openai_model': 'tts-1-hd',  # 'tts-1' 或 'tts-1-hd' (高品質)
+    'openai_models': ['tts-1-hd', 'tts-1'],  # 依品質排序，依延遲記錄選擇能在期限內完成的模型
+    'synthesis_deadline': 6.0,  # 按下按鈕後語音合成的期限（秒），預測逾時時同時啟動本地引擎
+    'synthesis_timeout': 60,  # 競速的最長等待時間（秒）
+    'story_language': 'zh',  # 故事片段的語言（問候語與故事分段快取）
+    'segment_gap': 0.4,  # 播放時問候語與故事之間的間隔（秒）
+    'stream_story': True,  # 串流接收故事，生成期間即開始合成問候語與第一句
     'openai_voice': 'nova',  # 'alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer'
     'openai_speed': 1.0,  # 0.25 到 4.0
     
@@ -81,7 +139,7 @@ TTS_CONFIG = {
     
     # 音質增強設定
     'audio_quality': 'high',
-    'enable_audio_enhancement': False,  # 暫時關閉音質增強以避免格式問題
+    'enable_audio_enhancement': False,  # sox 回寫式音質增強（已由 AUDIO_CONFIG['dsp'] 記憶體處理取代）
     'sample_rate_override': 22050,  # 提高採樣率
 }
 
@@ -126,9 +184,45 @@ API_ENDPOINTS = {
     'find_city': 'https://subjective-clock.vercel.app/api/find-city-geonames',
     'translate': 'https://subjective-clock.vercel.app/api/translate-location',
     'generate_story': 'https://subjective-clock.vercel.app/api/generatePiStory',  # 使用 Pi 專用的故事生成 API
+    'generate_story_stream': 'https://subjective-clock.vercel.app/api/generatePiStoryStream',  # 串流版本（SSE）
     'save_record': 'https://subjective-clock.vercel.app/api/save-record'
 }
 
+# 故事與語音預先生成（閒置時為下一分鐘的候選城市預先準備）
+PREGENERATION_CONFIG = {
+    'enabled': True,
+    'candidates': 3,  # 每分鐘預先準備的候選城市數量
+    'lead_seconds': 40,  # 預先準備幾秒後所在分鐘的城市
+    'idle_delay': 30,  # 最後一次互動後需閒置的秒數
+    'check_interval': 5,  # 播放中（無法預先生成）時的重新檢查間隔（秒）；閒置時依分鐘邊界喚醒
+    'max_age': 300,  # 未使用結果的保留時間（秒），逾時刪除
+    'daily_budget_usd': 1.0,  # 每日 API 花費上限（估算）
+    'story_cost_usd': 0.002,  # 每次故事生成的估算花費
+    'tts_cost_per_char_usd': 0.00003,  # OpenAI tts-1-hd：每百萬字元 30 美元
+    'state_file': '/var/tmp/wakeupmap_pregeneration.json',  # 當日花費（重開機後保留）
+}
+
+# 背景工作池（甦醒流程各階段、計時器與前端日誌監控）
+TASK_POOL_CONFIG = {
+    'max_workers': 4,  # 同時執行的工作數上限
+    'history_size': 50,  # 工作表保留的已結束工作數量
+    'status_file': '/dev/shm/wakeupmap_tasks.json',  # 工作表（位於 RAM，不寫入 SD 卡）
+}
+
+# 閒置喚醒統計（確認閒置時沒有輪詢迴圈喚醒 CPU）
+IDLE_METRICS_CONFIG = {
+    'enabled': True,
+    'interval': 300,  # 取樣間隔（秒），只在閒置期間記錄
+    'status_file': '/dev/shm/wakeupmap_idle.json',  # 最新統計（位於 RAM，不寫入 SD 卡）
+}
+
+# 甦醒流程
+WAKE_CYCLE_CONFIG = {
+    'device_city': True,  # 由裝置決定城市：故事與語音準備和網頁定位動畫同時進行（失敗時改由網頁尋找）
+    'find_city_timeout': 2,  # 裝置端詢問城市 API 的逾時（秒），逾時改由網頁尋找
+    'reveal_timeout': 30,  # 音頻就緒後等待網頁顯示城市的最長時間（秒）
+}
+
 # 使用者設定
 USER_CONFIG = {
     'display_name': 'future',
@@ -173,6 +267,74 @@ SCREENSAVER_CONFIG = {
     'dim_brightness': 20, # 螢幕保護時的亮度百分比
 }
 
+# 瀏覽器控制配置
+BROWSER_CONFIG = {
+    'backend': 'cdp',          # 'cdp'：以 DevTools 協定直接控制 Chrome（不需 chromedriver）；'selenium'：透過 chromedriver
+    'chrome_binary': None,     # Chrome 執行檔路徑，None 時自動偵測
+    'debugging_port': 9222,    # DevTools 遠端偵錯埠
+    'reattach': True,          # Python 端重啟時重新連上仍在運行的 Chrome 與頁面（僅 DevTools 協定後端）
+    'keep_alive_on_exit': True,  # 程式結束時保留 Chrome（完全停止請用 stop-wakeup-map.sh）
+    'pid_file': '/dev/shm/wakeupmap_chrome.pid',  # Chrome pid（位於 RAM，重開機後自然清除）
+    'warm_standby': True,      # 背景保留一個已就緒的備用頁，長按無法軟重置時直接切換（僅 DevTools 協定後端）
+    'profile_dir': '/var/cache/wakeupmap/chrome-profile',  # 持久化的瀏覽器設定檔（重開機後保留 HTTP 快取）
+    'disk_cache_mb': 150,      # HTTP 快取上限
+    'profile_max_mb': 400,     # 設定檔總大小上限，超過時啟動前清除快取目錄
+    'js_heap_mb': 256,         # 網頁 V8 堆積上限（MB）
+}
+
+# 瀏覽器記憶體管理（需要 psutil）
+MEMORY_GOVERNOR_CONFIG = {
+    'enabled': True,
+    'interval': 30,             # 取樣間隔（秒）
+    'idle_delay': 180,          # 按鈕操作後多久視為閒置（秒，涵蓋故事播放）
+    'chrome_gc_mb': 350,        # Chrome 總 USS 超過時要求回收記憶體
+    'chrome_restart_mb': 600,   # Chrome 總 USS 超過時切換到新頁面（軟重啟）
+    'swap_in_limit_kbps': 256,  # swap 換入速率（KB/s）超過時視為記憶體吃緊
+    'min_available_mb': 150,    # 可用記憶體低於時視為記憶體吃緊
+    'psi_some_avg10': 10.0,     # /proc/pressure/memory some avg10 超過時視為記憶體吃緊
+    'gc_cooldown': 300,         # 回收最短間隔（秒）
+    'restart_cooldown': 1800,   # 軟重啟最短間隔（秒）
+    'history_file': '/dev/shm/wakeupmap_memory.json',
+    'history_size': 240,        # 保留的取樣數（預設約 2 小時）
+    'log_interval': 600,        # 記憶體摘要日誌間隔（秒）
+}
+
+# 本機網頁資源伺服器（版本化資源包，開機不需等待外網）
+ASSET_SERVER_CONFIG = {
+    'enabled': True,
+    'host': '127.0.0.1',
+    'port': 8766,
+    'bundle_dir': '/var/cache/wakeupmap/web',
+    'origin': 'https://subjective-clock.vercel.app',  # 更新檢查與 /api 轉送
+    'update_interval': 6 * 3600,  # 背景更新檢查間隔（秒）
+    'files': [
+        'pi.html', 'pi-modular.html', 'pi-script.js', 'pi-script-refactored.js', 'pi-style.css',
+        'components/component-loader.js', 'components/waiting-state.html',
+        'components/loading-state.html', 'components/result-state.html',
+        'favicon.ico', 'favicon.svg', 'favicon-16x16.png', 'favicon-32x32.png', 'apple-touch-icon.png',
+    ],
+}
+
+# 地圖圖磚快取（經本機資源伺服器 /tiles/ 提供，離線時從快取顯示）
+TILE_CACHE_CONFIG = {
+    'enabled': True,
+    'cache_dir': '/var/cache/wakeupmap/tiles',
+    'max_mb': 200,
+    'upstream': 'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',
+    'subdomains': 'abc',
+    'user_agent': 'WakeUpMap-Pi/1.0 (+https://subjective-clock.vercel.app)',
+    'world_zoom': 2,            # 預先下載完整世界的最大縮放層級
+    'prefetch_zooms': [3],      # 網頁結果地圖使用的縮放層級，預先下載預測城市周圍
+    'prefetch_radius': 2,
+}
+
+# 網頁事件匯流排（本機 WebSocket，取代日誌輪詢與逐次 execute_script）
+EVENT_BUS_CONFIG = {
+    'enabled': True,
+    'host': '127.0.0.1',
+    'port': 8765,
+}
+
 # =============================================================================
 # 多語言早安問候語
 # =============================================================================
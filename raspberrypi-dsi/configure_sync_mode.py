@@ -16,9 +16,9 @@ def check_current_sync_mode():
         with open(main_file, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        if 'synchronized_loading_and_play' in content and 'threading.Thread(target=synchronized_loading_and_play' in content:
+        if 'synchronized_loading_and_play' in content and "self.tasks.submit('extract-city', synchronized_loading_and_play" in content:
             current_mode = 'sync_loading'
-        elif '_extract_city_data_and_play_greeting' in content and 'threading.Thread(target=extract_and_play' in content:
+        elif '_extract_city_data_and_play_greeting' in content and "self.tasks.submit('extract-city', extract_and_play" in content:
             current_mode = 'fast_feedback'
         else:
             current_mode = 'unknown'
@@ -52,15 +52,15 @@ def switch_to_sync_loading():
             content = f.read()
         
         # 檢查是否已經是同步模式
-        if 'synchronized_loading_and_play' in content and 'threading.Thread(target=synchronized_loading_and_play' in content:
+        if 'synchronized_loading_and_play' in content and "self.tasks.submit('extract-city', synchronized_loading_and_play" in content:
             print("✅ 已經是 Loading 同步模式，無需更改")
             return True
         
         # 替換為同步模式的調用
-        if 'threading.Thread(target=extract_and_play, daemon=True).start()' in content:
+        if "self.tasks.submit('extract-city', extract_and_play, group='wake')" in content:
             new_content = content.replace(
-                'threading.Thread(target=extract_and_play, daemon=True).start()',
-                'threading.Thread(target=synchronized_loading_and_play, daemon=True).start()'
+                "self.tasks.submit('extract-city', extract_and_play, group='wake')",
+                "self.tasks.submit('extract-city', synchronized_loading_and_play, group='wake')"
             )
             
             with open(main_file, 'w', encoding='utf-8') as f:
@@ -85,15 +85,15 @@ def switch_to_fast_feedback():
             content = f.read()
         
         # 檢查是否已經是快速回饋模式
-        if 'extract_and_play' in content and 'threading.Thread(target=extract_and_play' in content:
+        if 'extract_and_play' in content and "self.tasks.submit('extract-city', extract_and_play" in content:
             print("✅ 已經是快速回饋模式，無需更改")
             return True
         
         # 替換為快速回饋模式的調用
-        if 'threading.Thread(target=synchronized_loading_and_play, daemon=True).start()' in content:
+        if "self.tasks.submit('extract-city', synchronized_loading_and_play, group='wake')" in content:
             new_content = content.replace(
-                'threading.Thread(target=synchronized_loading_and_play, daemon=True).start()',
-                'threading.Thread(target=extract_and_play, daemon=True).start()'
+                "self.tasks.submit('extract-city', synchronized_loading_and_play, group='wake')",
+                "self.tasks.submit('extract-city', extract_and_play, group='wake')"
             )
             
             with open(main_file, 'w', encoding='utf-8') as f:
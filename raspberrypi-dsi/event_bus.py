@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - Python 與 kiosk 網頁之間的事件匯流排
+裝置端提供本機 WebSocket（只用標準函式庫），網頁以 window.piBus 連線
+兩個方向都以批次、依序的 JSON 訊息傳送：網頁送出日誌與狀態轉換，Python 送出事件指令
+"""
+
+import json
+import socket
+import logging
+import threading
+from collections import deque
+from typing import Optional, Callable, Dict, Any, List
+
+from ws_frames import OP_TEXT, FrameReader, accept_key, encode_frame, read_http_head
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """本機 WebSocket 事件匯流排（同一時間只服務一個網頁連線，重新載入時由新連線取代）"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, max_pending: int = 500):
+        self.host = host
+        self.port = port
+        self.max_pending = max_pending
+
+        self._server: Optional[socket.socket] = None
+        self._client: Optional[socket.socket] = None
+        self._client_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self._outbox: "deque[Dict[str, Any]]" = deque(maxlen=max_pending)
+        self._outbox_ready = threading.Condition()
+        self._seq = 0
+        self._last_received_seq = 0
+        self._running = False
+        self._connected = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+
+    def start(self) -> bool:
+        """開始接受網頁連線"""
+        try:
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            server.bind((self.host, self.port))
+            server.listen(2)
+        except OSError as e:
+            logger.warning(f"事件匯流排無法啟動 ({self.url}): {e}")
+            return False
+
+        self._server = server
+        self._running = True
+        threading.Thread(target=self._accept_loop, name='EventBusAccept', daemon=True).start()
+        threading.Thread(target=self._writer_loop, name='EventBusWriter', daemon=True).start()
+        logger.info(f"🔌 事件匯流排已啟動: {self.url}")
+        return True
+
+    def stop(self):
+        """關閉連線與伺服器"""
+        self._running = False
+        with self._outbox_ready:
+            self._outbox_ready.notify_all()
+        self._drop_client()
+        if self._server:
+            try:
+                self._server.close()
+            except OSError:
+                pass
+            self._server = None
+
+    def wait_connected(self, timeout: float) -> bool:
+        """等待網頁連線"""
+        return self._connected.wait(timeout)
+
+    # ------------------------------------------------------------------
+    # 訊息
+    # ------------------------------------------------------------------
+
+    def on(self, message_type: str, handler: Callable[[Dict[str, Any]], None]):
+        """
+        註冊網頁訊息處理函數（在接收執行緒中依序呼叫，應快速返回）
+
+        Args:
+            message_type: 訊息類型（log, state, signal ...）
+            handler: 處理函數，參數為訊息字典
+        """
+        self._handlers.setdefault(message_type, []).append(handler)
+
+    def send(self, name: str, detail: Any = None, assign: Optional[str] = None) -> bool:
+        """
+        送出事件到網頁（網頁端以 CustomEvent(name) 分派）
+
+        同一時間排入的訊息會合併成一個批次，依序送出
+
+        Args:
+            name: 事件名稱
+            detail: 事件內容
+            assign: 同時設定的 window 全域變數名稱（可選）
+
+        Returns:
+            bool: 網頁已連線時返回 True；未連線時不排入，由呼叫端改用其他方式
+        """
+        if not self.connected:
+            return False
+        message = {'type': 'event', 'name': name, 'detail': detail}
+        if assign:
+            message['assign'] = assign
+        with self._outbox_ready:
+            self._outbox.append(message)
+            self._outbox_ready.notify()
+        return True
+
+    def _writer_loop(self):
+        while self._running:
+            with self._outbox_ready:
+                while self._running and not self._outbox:
+                    self._outbox_ready.wait()
+                messages = list(self._outbox)
+                self._outbox.clear()
+            if not messages:
+                continue
+
+            self._seq += 1
+            payload = json.dumps({'seq': self._seq, 'messages': messages}, ensure_ascii=False)
+            if not self._send_frame(OP_TEXT, payload.encode('utf-8')):
+                logger.debug(f"事件匯流排送出失敗，丟棄 {len(messages)} 則訊息")
+
+    def _dispatch(self, batch: Dict[str, Any]):
+        seq = batch.get('seq', 0)
+        messages = batch.get('messages', [])
+        if seq and self._last_received_seq and seq != self._last_received_seq + 1:
+            logger.debug(f"事件匯流排批次不連續: {self._last_received_seq} -> {seq}")
+        self._last_received_seq = seq or self._last_received_seq
+
+        for message in messages:
+            for handler in self._handlers.get(message.get('type'), []):
+                try:
+                    handler(message)
+                except Exception as e:
+                    logger.warning(f"事件匯流排處理 {message.get('type')} 失敗: {e}")
+
+    # ------------------------------------------------------------------
+    # WebSocket 連線
+    # ------------------------------------------------------------------
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, address = self._server.accept()
+            except OSError:
+                break
+            try:
+                client.settimeout(5)
+                if not self._handshake(client):
+                    client.close()
+                    continue
+                client.settimeout(None)
+            except OSError:
+                client.close()
+                continue
+
+            # 網頁重新載入後的新連線取代舊連線
+            self._drop_client()
+            with self._client_lock:
+                self._client = client
+                self._last_received_seq = 0
+            self._connected.set()
+            logger.info(f"🔌 網頁已連上事件匯流排 ({address[0]}:{address[1]})")
+            threading.Thread(target=self._read_loop, args=(client,), name='EventBusReader', daemon=True).start()
+
+    @staticmethod
+    def _handshake(client: socket.socket) -> bool:
+        head = read_http_head(client)
+        if head is None:
+            return False
+
+        _, headers = head
+        key = headers.get('sec-websocket-key')
+        if not key or 'websocket' not in headers.get('upgrade', '').lower():
+            client.sendall(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            return False
+
+        client.sendall((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n'
+        ).encode())
+        return True
+
+    def _read_loop(self, client: socket.socket):
+        reader = FrameReader(client)
+        try:
+            while self._running:
+                data = reader.read_message()
+                if data is None:
+                    break
+                try:
+                    batch = json.loads(data.decode('utf-8'))
+                except ValueError:
+                    logger.debug("事件匯流排收到無法解析的訊息")
+                    continue
+                self._dispatch(batch)
+        except OSError:
+            pass
+
+        with self._client_lock:
+            if self._client is client:
+                self._client = None
+                self._connected.clear()
+                logger.info("🔌 網頁已中斷事件匯流排連線")
+        try:
+            client.close()
+        except OSError:
+            pass
+
+    def _send_frame(self, opcode: int, payload: bytes, client: Optional[socket.socket] = None) -> bool:
+        client = client or self._client
+        if client is None:
+            return False
+        try:
+            with self._send_lock:
+                client.sendall(encode_frame(opcode, payload))
+            return True
+        except OSError:
+            return False
+
+    def _drop_client(self):
+        with self._client_lock:
+            client, self._client = self._client, None
+            self._connected.clear()
+        if client:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+                client.close()
+            except OSError:
+                pass
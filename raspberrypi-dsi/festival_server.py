@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - Festival 常駐伺服器模組
+以 `festival --server` 常駐執行，聲音只載入一次，所有合成請求重用同一個伺服器
+"""
+
+import io
+import time
+import wave
+import socket
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from typing import Optional, List
+
+logger = logging.getLogger(__name__)
+
+# Festival 伺服器協定：每個回應以 3 字元標記開頭，資料區塊以固定鍵值結尾
+_REPLY_WAVE = b'WV\n'
+_REPLY_LISP = b'LP\n'
+_REPLY_OK = b'OK\n'
+_REPLY_ERROR = b'ER\n'
+_DATA_TERMINATOR = b'ft_StUfF_key'
+
+
+class FestivalServerError(Exception):
+    """Festival 伺服器通訊錯誤"""
+
+
+class FestivalServer:
+    """常駐 Festival 伺服器（聲音預載、健康檢查、自動重啟）"""
+
+    def __init__(self, voices: List[str], work_dir: Path, port: int = 1314,
+                 host: str = 'localhost', timeout: float = 30,
+                 max_restarts: int = 3, health_interval: float = 60):
+        self.voices = list(voices)
+        self.work_dir = Path(work_dir)
+        self.port = port
+        self.host = host
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self.health_interval = health_interval
+
+        self.process: Optional[subprocess.Popen] = None
+        self.voice: Optional[str] = None
+        self.restart_count = 0
+        self.last_ok_time = 0.0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+
+    def start(self) -> bool:
+        """啟動 Festival 伺服器並預載聲音"""
+        with self._lock:
+            return self._start_locked()
+
+    def _start_locked(self) -> bool:
+        self._stop_locked()
+        try:
+            self.work_dir.mkdir(parents=True, exist_ok=True)
+            init_script = self.work_dir / 'festival_server_init.scm'
+            init_script.write_text(self._build_init_script(), encoding='utf-8')
+
+            self.process = subprocess.Popen(
+                ['festival', '--server', str(init_script)],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+
+            # 等待伺服器開始接受連線（聲音載入與暖機在此期間完成）
+            deadline = time.time() + self.timeout
+            while time.time() < deadline:
+                if self.process.poll() is not None:
+                    logger.error(f"Festival 伺服器啟動後立即結束 (code={self.process.returncode})")
+                    self.process = None
+                    return False
+                try:
+                    self._run_commands(['t'], timeout=2)
+                    break
+                except (OSError, FestivalServerError):
+                    time.sleep(0.2)
+            else:
+                logger.error("Festival 伺服器啟動逾時")
+                self._stop_locked()
+                return False
+
+            self.voice = self._detect_selected_voice()
+            self.last_ok_time = time.time()
+            logger.info(f"✅ Festival 伺服器已啟動 (port={self.port}, 聲音={self.voice or '預設'})")
+            return True
+
+        except FileNotFoundError:
+            logger.warning("找不到 festival 執行檔，無法啟動 Festival 伺服器")
+            self.process = None
+            return False
+        except Exception as e:
+            logger.error(f"Festival 伺服器啟動失敗: {e}")
+            self._stop_locked()
+            return False
+
+    def stop(self):
+        """停止 Festival 伺服器"""
+        with self._lock:
+            self._stop_locked()
+
+    def _stop_locked(self):
+        if self.process:
+            try:
+                self.process.terminate()
+                self.process.wait(timeout=5)
+            except Exception:
+                try:
+                    self.process.kill()
+                except Exception:
+                    pass
+            self.process = None
+
+    def is_running(self) -> bool:
+        """伺服器程序是否仍在執行"""
+        return self.process is not None and self.process.poll() is None
+
+    def check_health(self) -> bool:
+        """健康檢查：程序存活且能在時限內回應"""
+        if not self.is_running():
+            return False
+        try:
+            self._run_commands(['t'], timeout=5)
+            self.last_ok_time = time.time()
+            return True
+        except (OSError, FestivalServerError) as e:
+            logger.warning(f"Festival 伺服器健康檢查失敗: {e}")
+            return False
+
+    def _ensure_healthy_locked(self) -> bool:
+        """確保伺服器可用，必要時自動重啟"""
+        if self.is_running() and time.time() - self.last_ok_time < self.health_interval:
+            return True
+        if self.check_health():
+            return True
+
+        while self.restart_count < self.max_restarts:
+            self.restart_count += 1
+            logger.warning(f"🔄 重啟 Festival 伺服器 ({self.restart_count}/{self.max_restarts})")
+            if self._start_locked():
+                return True
+        logger.error("Festival 伺服器重啟次數已達上限")
+        return False
+
+    # ------------------------------------------------------------------
+    # 合成
+    # ------------------------------------------------------------------
+
+    def synthesize(self, text: str, audio_file: Path, duration_stretch: float = 1.0) -> Optional[Path]:
+        """
+        透過常駐伺服器合成語音並直接寫出 WAV 文件
+
+        Args:
+            text: 要合成的文字
+            audio_file: 輸出 WAV 文件路徑
+            duration_stretch: 語速拉伸倍率（>1 較慢）
+
+        Returns:
+            Path: 成功時返回輸出文件路徑，失敗時返回 None
+        """
+        with self._lock:
+            if not self._ensure_healthy_locked():
+                return None
+            try:
+                waves = self._run_commands([
+                    f"(Parameter.set 'Duration_Stretch {duration_stretch})",
+                    "(Parameter.set 'Wavefiletype 'riff)",
+                    "(tts_return_to_client)",
+                    f'(tts_textall "{self._escape(text)}" "fundamental")'
+                ], timeout=self.timeout)
+                self.last_ok_time = time.time()
+                self.restart_count = 0
+            except (OSError, FestivalServerError) as e:
+                logger.error(f"Festival 伺服器合成失敗: {e}")
+                return None
+
+        if not waves:
+            logger.error("Festival 伺服器未返回音頻")
+            return None
+
+        if self._write_waves(waves, audio_file):
+            return audio_file
+        return None
+
+    # ------------------------------------------------------------------
+    # 內部工具
+    # ------------------------------------------------------------------
+
+    def _build_init_script(self) -> str:
+        """產生伺服器啟動腳本：依序選擇第一個可用聲音並暖機"""
+        candidates = ' '.join(f'"{v}"' for v in self.voices)
+        return f"""
+(set! server_port {self.port})
+(define (wakeupmap_select_voice voices)
+  (cond
+   ((null voices) nil)
+   ((member_string (car voices) (voice.list))
+    (voice.select (intern (car voices)))
+    (car voices))
+   (t (wakeupmap_select_voice (cdr voices)))))
+(wakeupmap_select_voice '({candidates}))
+(utt.synth (Utterance Text "ready"))
+"""
+
+    def _detect_selected_voice(self) -> Optional[str]:
+        """詢問伺服器目前選用的聲音（只比對名稱，不會重新載入聲音）"""
+        for voice in self.voices:
+            try:
+                self._run_commands(
+                    [f'(if (not (equal? current-voice \'{voice})) (error "voice mismatch"))'],
+                    timeout=5
+                )
+                return voice
+            except FestivalServerError:
+                continue
+            except OSError:
+                break
+        return None
+
+    @staticmethod
+    def _escape(text: str) -> str:
+        """轉義 Scheme 字串"""
+        return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+    def _run_commands(self, commands: List[str], timeout: float) -> List[bytes]:
+        """在單一連線中依序執行指令，返回所有 WV 音頻區塊"""
+        waves = []
+        with socket.create_connection((self.host, self.port), timeout=timeout) as sock:
+            reader = _ReplyReader(sock)
+            for command in commands:
+                sock.sendall(command.encode('utf-8') + b'\n')
+                while True:
+                    key = reader.read_exact(3)
+                    if key == _REPLY_OK:
+                        break
+                    if key == _REPLY_ERROR:
+                        raise FestivalServerError(f"指令執行失敗: {command[:60]}")
+                    if key in (_REPLY_WAVE, _REPLY_LISP):
+                        data = reader.read_until(_DATA_TERMINATOR)
+                        if key == _REPLY_WAVE:
+                            waves.append(data)
+                    else:
+                        raise FestivalServerError(f"未知的伺服器回應: {key!r}")
+        return waves
+
+    def _write_waves(self, waves: List[bytes], audio_file: Path) -> bool:
+        """將伺服器返回的一個或多個 RIFF 區塊合併為單一 WAV 文件"""
+        try:
+            params = None
+            frames = []
+            for blob in waves:
+                with wave.open(io.BytesIO(blob), 'rb') as wf:
+                    if params is None:
+                        params = wf.getparams()
+                    frames.append(wf.readframes(wf.getnframes()))
+
+            with wave.open(str(audio_file), 'wb') as out:
+                out.setnchannels(params.nchannels)
+                out.setsampwidth(params.sampwidth)
+                out.setframerate(params.framerate)
+                out.writeframes(b''.join(frames))
+            return True
+        except Exception as e:
+            logger.error(f"寫入 Festival 音頻失敗: {e}")
+            return False
+
+
+class _ReplyReader:
+    """帶緩衝的 socket 讀取器"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def _fill(self):
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            raise FestivalServerError("伺服器連線中斷")
+        self.buffer.extend(chunk)
+
+    def read_exact(self, size: int) -> bytes:
+        while len(self.buffer) < size:
+            self._fill()
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read_until(self, terminator: bytes) -> bytes:
+        start = 0
+        while True:
+            index = self.buffer.find(terminator, start)
+            if index >= 0:
+                data = bytes(self.buffer[:index])
+                del self.buffer[:index + len(terminator)]
+                return data
+            start = max(0, len(self.buffer) - len(terminator) + 1)
+            self._fill()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 閒置喚醒統計
+從 /proc 讀取本程式所有執行緒的內容切換次數與 CPU 時間，計算閒置時每秒喚醒次數
+用來確認背景等待都改為事件或回調後，閒置時 CPU 不再被輪詢迴圈喚醒
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+def read_process_counters(pid: str = 'self') -> Optional[Dict[str, float]]:
+    """
+    讀取程序的內容切換次數與 CPU 時間（Linux /proc）
+
+    Args:
+        pid: 程序 ID，預設為本程序
+
+    Returns:
+        Dict: {'switches', 'cpu_seconds', 'threads'}，不支援 /proc 時返回 None
+    """
+    task_dir = f'/proc/{pid}/task'
+    try:
+        tids = os.listdir(task_dir)
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            # comm 可能包含空白，從最後一個括號之後切欄位
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+
+    switches = 0
+    for tid in tids:
+        try:
+            with open(f'{task_dir}/{tid}/status', 'r') as f:
+                for line in f:
+                    if line.startswith(('voluntary_ctxt_switches', 'nonvoluntary_ctxt_switches')):
+                        switches += int(line.split()[1])
+        except OSError:
+            # 執行緒在讀取期間結束
+            continue
+
+    # utime 與 stime 是第 14、15 欄（切掉 pid 與 comm 後為第 12、13 欄）
+    ticks = os.sysconf('SC_CLK_TCK')
+    return {
+        'switches': switches,
+        'cpu_seconds': (int(fields[11]) + int(fields[12])) / ticks,
+        'threads': len(tids),
+    }
+
+
+class WakeupMeter:
+    """兩次取樣之間的每秒喚醒次數與 CPU 使用率"""
+
+    def __init__(self, status_file: Optional[str] = None):
+        """
+        Args:
+            status_file: 最新統計輸出檔案（建議位於 /dev/shm）
+        """
+        self.status_file = status_file
+        self._last = read_process_counters()
+        self._last_time = time.monotonic()
+
+    def sample(self) -> Optional[Dict[str, Any]]:
+        """
+        取樣並計算自上次取樣以來的統計
+
+        Returns:
+            Dict: {'wakeups_per_s', 'cpu_percent', 'threads', 'seconds'}，不支援 /proc 時返回 None
+        """
+        counters = read_process_counters()
+        now = time.monotonic()
+        last, elapsed = self._last, now - self._last_time
+        self._last, self._last_time = counters, now
+        if counters is None or last is None or elapsed <= 0:
+            return None
+
+        stats = {
+            'wakeups_per_s': round((counters['switches'] - last['switches']) / elapsed, 2),
+            'cpu_percent': round((counters['cpu_seconds'] - last['cpu_seconds']) / elapsed * 100, 2),
+            'threads': counters['threads'],
+            'seconds': round(elapsed, 1),
+        }
+        return stats
+
+    def write_status(self, stats: Dict[str, Any]):
+        """寫出統計（由呼叫端決定只記錄閒置期間的取樣）"""
+        if not self.status_file:
+            return
+        try:
+            with open(self.status_file, 'w', encoding='utf-8') as f:
+                json.dump(dict(stats, time=time.time()), f)
+        except OSError as e:
+            logger.debug(f"寫出閒置統計失敗: {e}")
@@ -298,6 +298,9 @@ setup_permissions() {
     # 音頻和視頻權限
     sudo usermod -a -G audio,video $USER
     
+    # 持久快取目錄（音頻持久層、瀏覽器設定檔、本機資源包、地圖圖磚）
+    sudo install -d -o $USER -g $USER /var/cache/wakeupmap
+    
     log_info "權限設定完成"
 }
 
@@ -324,6 +327,7 @@ ExecStart=$(pwd)/venv/bin/python main_web_dsi.py
 Restart=always
 RestartSec=5
 KillMode=process
+CacheDirectory=wakeupmap
 
 [Install]
 WantedBy=graphical-session.target
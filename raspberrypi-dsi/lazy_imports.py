@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 延遲載入與載入時間分析
+大型選用套件（openai、pygame、selenium 等）延後到第一次使用時才載入，或在背景執行緒預先載入；
+ImportProfiler 記錄開機期間每個模組的載入耗時
+"""
+
+import sys
+import time
+import logging
+import builtins
+import importlib
+import importlib.util
+import threading
+from typing import Optional, Iterable, Dict, List, Any
+
+logger = logging.getLogger(__name__)
+
+
+def module_available(name: str) -> bool:
+    """檢查套件是否已安裝（只尋找，不執行套件程式碼）"""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """
+    第一次存取屬性（或呼叫）時才載入的模組
+
+    attribute 指定時代表模組內的物件（相當於 from module import attribute），
+    呼叫時轉給實際物件，例如 WebDriverWait(driver, 30)
+    """
+
+    def __init__(self, name: str, attribute: Optional[str] = None):
+        self._lazy_name = name
+        self._lazy_attribute = attribute
+        self._lazy_target = None
+
+    def _load(self):
+        target = self._lazy_target
+        if target is None:
+            # 模組載入本身由 import 系統加鎖，多個執行緒同時觸發時只會載入一次
+            target = importlib.import_module(self._lazy_name)
+            if self._lazy_attribute:
+                target = getattr(target, self._lazy_attribute)
+            self._lazy_target = target
+        return target
+
+    def __getattr__(self, name: str):
+        if name.startswith('_lazy_'):
+            raise AttributeError(name)
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        name = f"{self._lazy_name}.{self._lazy_attribute}" if self._lazy_attribute else self._lazy_name
+        state = 'loaded' if self._lazy_target is not None else 'not loaded'
+        return f"<LazyModule {name} ({state})>"
+
+
+def lazy_module(name: str, attribute: Optional[str] = None) -> LazyModule:
+    """建立延遲載入的模組（或模組內物件）"""
+    return LazyModule(name, attribute)
+
+
+def preload(names: Iterable[str]) -> threading.Thread:
+    """
+    在背景執行緒依序載入模組（之後第一次使用時不必等待）
+
+    Args:
+        names: 模組名稱
+
+    Returns:
+        threading.Thread: 預先載入的執行緒
+    """
+    names = list(names)
+
+    def run():
+        for name in names:
+            if name in sys.modules:
+                continue
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+                logger.debug(f"背景載入 {name} ({time.perf_counter() - start:.2f}s)")
+            except Exception as e:
+                logger.debug(f"背景載入 {name} 失敗: {e}")
+
+    thread = threading.Thread(target=run, name='Preload', daemon=True)
+    thread.start()
+    return thread
+
+
+class ImportProfiler:
+    """
+    記錄每個模組第一次載入的耗時（含子模組）與自身耗時（扣除巢狀載入）
+
+    各執行緒各自計算巢狀關係，分階段平行啟動時也能正確歸屬；
+    import 陳述式與 importlib.import_module（LazyModule、preload 使用）都會記錄
+    """
+
+    def __init__(self):
+        self.records: Dict[str, Dict[str, float]] = {}
+        self._local = threading.local()
+        self._original_import = None
+        self._original_import_module = None
+
+    def install(self) -> 'ImportProfiler':
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            self._original_import_module = importlib.import_module
+            builtins.__import__ = self._import
+            importlib.import_module = self._import_module
+        return self
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            importlib.import_module = self._original_import_module
+            self._original_import = None
+            self._original_import_module = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import or builtins.__import__
+        # 相對載入與已載入的模組直接略過（相對載入的耗時計入上層模組）
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        return self._timed(name, original, name, globals, locals, fromlist, level)
+
+    def _import_module(self, name, package=None):
+        original = self._original_import_module or importlib.import_module
+        if name.startswith('.') or name in sys.modules:
+            return original(name, package)
+        return self._timed(name, original, name, package)
+
+    def _timed(self, name, load, *args):
+        """執行載入並記錄耗時（自身耗時扣除同一執行緒中的巢狀載入）"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return load(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            record = self.records.setdefault(name, {'total': 0.0, 'self': 0.0, 'top_level': False})
+            record['total'] += elapsed
+            record['self'] += elapsed - nested
+            record['top_level'] = record['top_level'] or not stack
+
+    def report(self, top: int = 12) -> List[Dict[str, Any]]:
+        """依耗時（含巢狀載入）排序的模組載入紀錄"""
+        rows = [
+            {'module': name, 'total': record['total'], 'self': record['self']}
+            for name, record in self.records.items()
+        ]
+        rows.sort(key=lambda row: row['total'], reverse=True)
+        return rows[:top]
+
+    def log_report(self, top: int = 12):
+        total = sum(record['total'] for record in self.records.values() if record['top_level'])
+        logger.info(f"📦 模組載入共 {total:.2f}s（{len(self.records)} 個模組），耗時最多:")
+        for row in self.report(top):
+            logger.info(f"   {row['module']:<40} {row['total']:6.3f}s (自身 {row['self']:.3f}s)")
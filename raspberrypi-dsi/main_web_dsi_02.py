@@ -11,13 +11,20 @@ import signal
 import logging
 import threading
 import time
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Union
 from pathlib import Path
 
+# 記錄開機期間各模組的載入耗時（啟動完成後輸出報告）
+from lazy_imports import ImportProfiler
+import_profiler = ImportProfiler().install()
+
 # 導入自定義模組
 from config import (
     LOGGING_CONFIG, DEBUG_MODE, AUTOSTART_CONFIG, BUTTON_CONFIG,
-    SCREENSAVER_CONFIG, ERROR_MESSAGES, USER_CONFIG
+    SCREENSAVER_CONFIG, ERROR_MESSAGES, USER_CONFIG, EVENT_BUS_CONFIG, ASSET_SERVER_CONFIG,
+    TILE_CACHE_CONFIG, MEMORY_GOVERNOR_CONFIG, WAKE_CYCLE_CONFIG, TASK_POOL_CONFIG,
+    IDLE_METRICS_CONFIG
 )
 # 🔧 已停用本地儲存，統一使用前端Firebase直寫
 # from local_storage import LocalStorage  
@@ -25,8 +32,15 @@ from config import (
 
 # 確保模組可以被導入
 try:
-    from web_controller_dsi import WebControllerDSI
-    from audio_manager import get_audio_manager, cleanup_audio_manager
+    from web_controller_dsi import WebControllerDSI, WAIT_TIMEOUT
+    from audio_manager import get_audio_manager, cleanup_audio_manager, SegmentedAudio
+    from event_bus import EventBus
+    from asset_server import AssetServer
+    from tile_cache import TileCache
+    from memory_governor import MemoryGovernor
+    from staged_startup import StartupGraph
+    from task_pool import TaskPool
+    from idle_metrics import WakeupMeter
 except ImportError as e:
     print(f"模組導入失敗: {e}")
     print("請確保所有必要的檔案都在正確的位置")
@@ -95,6 +109,15 @@ class WakeUpMapWebAppV2:
         self.web_controller = None
         self.button_handler = None
         
+        # 網頁事件匯流排
+        self.event_bus = None
+        
+        # 本機網頁資源伺服器
+        self.asset_server = None
+        
+        # 瀏覽器記憶體管理
+        self.memory_governor = None
+        
         # 音訊管理
         self.audio_manager = None
         
@@ -104,9 +127,11 @@ class WakeUpMapWebAppV2:
         # Firebase 同步管理
         self.firebase_sync = None
         
-        # 螢幕保護程式
+        # 螢幕保護程式（計時由工作池的延遲工作負責）
         self.screensaver_active = False
-        self.screensaver_timer = None
+        
+        # 背景工作池：甦醒流程各階段可取消，同時執行的數量有上限
+        self.tasks = TaskPool(**TASK_POOL_CONFIG)
         
         # 運行狀態
         self.running = False
@@ -116,6 +141,9 @@ class WakeUpMapWebAppV2:
         self.last_button_action_time = 0
         self.is_processing_button = False
         
+        # 啟動階段（開機期間的按鈕操作等待網頁就緒）
+        self.startup = None
+        
         # 初始化
         self._initialize()
     
@@ -136,19 +164,29 @@ class WakeUpMapWebAppV2:
             # 🔧 前端日誌監控標誌
             self.frontend_log_monitoring_started = False
             
-            # 初始化音訊管理器
-            self.logger.info("初始化音訊管理器...")
-            try:
-                self.audio_manager = get_audio_manager()
-            except Exception as e:
-                self.logger.warning(f"音訊管理器初始化失敗：{e}")
-                self.audio_manager = None
-            
-            # 初始化按鈕處理器
-            self._initialize_button_handler()
+            # 啟動階段以相依關係執行：Chrome 啟動、音訊/TTS 偵測、GPIO 設定等互不相依的階段同時進行
+            # 按鈕處理器最先就緒，開機期間按下的按鈕會等網頁就緒後執行
+            startup = StartupGraph()
+            startup.add('button', self._initialize_button_handler, required=False)
+            startup.add('audio', self._initialize_audio, required=False)
+            # 事件匯流排（網頁就緒後由網頁控制器連線）
+            startup.add('event_bus', self._initialize_event_bus, required=False)
+            # 從本機資源包提供網頁
+            startup.add('asset_server', self._initialize_asset_server, required=False)
+            startup.add('browser', self.web_controller.start_browser)
+            startup.add('web', self._initialize_web, after=['browser', 'event_bus', 'asset_server'])
+            # 監控瀏覽器記憶體，閒置時回收
+            startup.add('memory_governor', self._initialize_memory_governor, after=['web'], required=False)
+            # 閒置時預先生成下一分鐘可能的故事與語音（網頁載入後再開始，不搶頻寬）
+            startup.add('pregeneration', self._start_pregeneration, after=['audio', 'web'], required=False)
+            # 閒置時記錄每秒喚醒次數，確認背景等待沒有輪詢
+            startup.add('idle_metrics', self._start_idle_metrics, after=['web'], required=False)
+            self.startup = startup
+            startup.run()
             
-            # 初始化網頁
-            self._initialize_web()
+            # 大型套件已延後或在背景載入，輸出開機期間的模組載入耗時
+            import_profiler.uninstall()
+            import_profiler.log_report()
             
             self.logger.info("應用程式 v2.0 初始化完成")
             
@@ -161,13 +199,7 @@ class WakeUpMapWebAppV2:
         try:
             self.logger.info("正在初始化重構版網頁...")
             
-            # 啟動瀏覽器並自動設定
-            self.web_controller.start_browser()
-            
-            # 等待頁面載入完成
-            time.sleep(3)
-            
-            # 自動填入使用者名稱並載入資料
+            # 自動填入使用者名稱並載入資料（等待網頁就緒訊號）
             self.web_controller.load_website()
             
             self.logger.info("重構版網頁初始化完成，系統就緒")
@@ -176,6 +208,38 @@ class WakeUpMapWebAppV2:
             self.logger.error(f"重構版網頁初始化失敗：{e}")
             raise
     
+    def _initialize_audio(self):
+        """初始化音訊管理器（pygame、TTS 偵測，與瀏覽器啟動同時進行）"""
+        self.logger.info("初始化音訊管理器...")
+        try:
+            self.audio_manager = get_audio_manager()
+        except Exception as e:
+            self.logger.warning(f"音訊管理器初始化失敗：{e}")
+            self.audio_manager = None
+    
+    def _start_pregeneration(self):
+        if self.audio_manager:
+            self.audio_manager.start_pregeneration()
+    
+    def _wait_for_startup(self) -> bool:
+        """
+        開機期間的按鈕操作：立即接受，等到網頁與音訊就緒後再執行
+        
+        Returns:
+            bool: 是否已就緒
+        """
+        if self.startup is None or (self.startup.is_done('web') and self.startup.is_done('audio')):
+            return True
+        
+        self.logger.info("⏳ 按鈕已接受，等待開機完成...")
+        deadline = time.time() + BUTTON_CONFIG.get('startup_wait', 90)
+        ready = (self.startup.wait('web', deadline - time.time())
+                 and self.startup.wait('audio', max(0, deadline - time.time())))
+        if not ready or not self.startup.succeeded('web'):
+            self.logger.error("開機未完成，無法處理按鈕操作")
+            return False
+        return True
+    
     def _setup_screensaver(self):
         """設定螢幕保護程式"""
         if SCREENSAVER_CONFIG['enabled']:
@@ -183,15 +247,9 @@ class WakeUpMapWebAppV2:
     
     def _reset_screensaver_timer(self):
         """重設螢幕保護計時器"""
-        if self.screensaver_timer:
-            self.screensaver_timer.cancel()
-        
         if SCREENSAVER_CONFIG['enabled']:
-            self.screensaver_timer = threading.Timer(
-                SCREENSAVER_CONFIG['timeout'],
-                self._activate_screensaver
-            )
-            self.screensaver_timer.start()
+            self.tasks.submit('screensaver', lambda token: self._activate_screensaver(),
+                              delay=SCREENSAVER_CONFIG['timeout'], replace=True, timer=True)
     
     def _activate_screensaver(self):
         """啟動螢幕保護程式"""
@@ -222,12 +280,26 @@ class WakeUpMapWebAppV2:
         self.last_button_action_time = current_time
         
         try:
+            if not self._wait_for_startup():
+                return
+            
+            # 取消上一次甦醒尚未完成的工作（準備中的音頻、等待中或播放中的語音）
+            self.tasks.cancel(group='wake', reason='新的甦醒')
+            
             self.logger.info("🚀 處理短按事件：觸發重構版甦醒流程")
             
+            # 暫停預先生成，讓出網路與 CPU 給本次甦醒
+            if self.audio_manager:
+                self.audio_manager.notify_activity()
+            
             # 處理螢幕保護器
             self._deactivate_screensaver()
             self._reset_screensaver_timer()
             
+            # 裝置端先決定城市：故事與語音準備和網頁定位動畫同時進行
+            if self._start_with_device_city():
+                return
+            
             # 使用重構版的甦醒流程
             result = self.web_controller.trigger_refactored_wakeup()
             
@@ -247,11 +319,11 @@ class WakeUpMapWebAppV2:
             self.logger.error(f"短按事件處理失敗：{e}")
         finally:
             # 延遲重置處理狀態，避免太快重複觸發
-            def reset_processing_state():
-                time.sleep(1)
+            def reset_processing_state(token):
                 self.is_processing_button = False
             
-            threading.Thread(target=reset_processing_state, daemon=True).start()
+            # 計時回調不佔用工作執行緒：甦醒工作佔滿工作執行緒時，冷卻仍會準時結束
+            self.tasks.submit('button-cooldown', reset_processing_state, delay=1, timer=True)
 
     def _increment_local_day_counter(self) -> int:
         """🔧 已停用本地Day計數，由前端Firebase決定"""
@@ -285,47 +357,23 @@ class WakeUpMapWebAppV2:
             self.logger.warning("音頻管理器未初始化，跳過音頻播放")
             return
         
-        def optimized_loading_and_play():
+        def optimized_loading_and_play(token):
             try:
                 # 🎵 使用重構版的優化流程
                 self.logger.info("🎵 重構版流程：跳過冗餘等待，快速處理")
                 
-                # 減少等待時間（重構版前端處理更快）
-                import time
-                time.sleep(1)  # 從原來的2秒減少到1秒
+                # 等待網頁顯示城市資料（trigger_refactored_wakeup 通常已等到，這裡立即返回）
+                self.web_controller.wait_for_signal('city', 10, cancel=token)
+                if token.cancelled:
+                    return
                 
                 # 從網頁提取城市資料
                 city_data = self._extract_city_data_from_web_optimized()
                 
                 if city_data:
                     self.logger.info(f"📍 從重構版網頁提取到城市資料: {city_data}")
-                    
-                    # 💾 保存甦醒記錄到本地並同步到 Firebase
-                    self._save_basic_record(city_data)
-                    
-                    # 🎧 在背景準備完整音頻（優化版）
-                    country_code = city_data.get('countryCode') or city_data.get('country_code', 'US')
-                    city_name = city_data.get('city', '')
-                    country_name = city_data.get('country', '')
-                    
-                    # 如果沒有國家代碼，嘗試根據國家名稱推測
-                    if not country_code and country_name:
-                        country_code = self._guess_country_code(country_name)
-                    
-                    self.logger.info(f"🎧 重構版：準備完整音頻 - 城市: {city_name}, 國家: {country_name} ({country_code})")
-                    
-                    # 🚀 準備完整音頻但不立即播放（優化版）
-                    audio_file = self._prepare_complete_audio_optimized(country_code, city_name, country_name, city_data)
-                    
-                    if audio_file:
-                        # ✨ 音頻準備完成，同步顯示畫面和播放聲音
-                        self.logger.info("✨ 重構版音頻準備完成，啟動同步播放...")
-                        self._synchronized_reveal_and_play(audio_file)
-                    else:
-                        # 音頻準備失敗，顯示畫面並播放備用音效
-                        self.logger.warning("⚠️ 重構版音頻準備失敗，顯示畫面")
-                        self.audio_manager.play_notification_sound('error')
-                        
+                    self._prepare_greeting_and_reveal(token, city_data)
+                
                 else:
                     self.logger.warning("⚠️ 無法從重構版網頁提取城市資料")
                     self.audio_manager.play_notification_sound('error')
@@ -334,8 +382,97 @@ class WakeUpMapWebAppV2:
                 self.logger.error(f"重構版處理失敗: {e}")
                 self.audio_manager.play_notification_sound('error')
         
-        # 在背景執行緒中執行
-        threading.Thread(target=optimized_loading_and_play, daemon=True).start()
+        # 在工作池中執行（新的甦醒或重置網頁時取消）
+        self.tasks.submit('extract-city', optimized_loading_and_play, group='wake')
+    
+    def _start_with_device_city(self) -> bool:
+        """
+        由裝置決定本次甦醒的城市：立即開始準備故事與語音，同時把城市送往網頁播放定位動畫
+        
+        Returns:
+            bool: 是否已開始（False 時改由網頁尋找城市）
+        """
+        if not WAKE_CYCLE_CONFIG.get('device_city', False) or not self.audio_manager:
+            return False
+        
+        city = self.audio_manager.resolve_city(datetime.now(), WAKE_CYCLE_CONFIG.get('find_city_timeout', 2))
+        if not city:
+            self.logger.warning("裝置端尋找城市失敗，改由網頁尋找")
+            return False
+        
+        if not self.web_controller.start_with_city(city).get('success'):
+            return False
+        
+        city_data = self._city_data_from_api(city)
+        self.logger.info(f"📍 裝置端選定城市: {city_data}")
+        self.tasks.submit('prepare-greeting', self._prepare_greeting_and_reveal, city_data, group='wake')
+        return True
+    
+    def _city_data_from_api(self, city: dict) -> dict:
+        """將城市 API 資料轉為與網頁提取相同的格式"""
+        timezone = city.get('timezone')
+        if isinstance(timezone, dict):
+            timezone = timezone.get('timeZoneId')
+        city_data = {
+            'city': (city.get('name') or city.get('city') or '').strip(),
+            'country': (city.get('country') or '').strip(),
+            'countryCode': city.get('country_iso_code', ''),
+            'latitude': city.get('latitude'),
+            'longitude': city.get('longitude'),
+            'timezone': timezone or 'UTC'
+        }
+        if not city_data['countryCode'] and city_data['country']:
+            city_data['countryCode'] = self._guess_country_code(city_data['country'])
+        return city_data
+    
+    def _prepare_greeting_and_reveal(self, token, city_data: dict):
+        """
+        準備完整音頻，網頁顯示城市後同步播放（網頁提取與裝置端選定城市共用）
+        
+        Args:
+            token: 取消權杖（新的甦醒或重置網頁時取消，不再播放）
+            city_data: 城市資料
+        """
+        try:
+            # 💾 保存甦醒記錄到本地並同步到 Firebase
+            self._save_basic_record(city_data)
+            
+            # 🎧 在背景準備完整音頻（優化版）
+            country_code = city_data.get('countryCode') or city_data.get('country_code', 'US')
+            city_name = city_data.get('city', '')
+            country_name = city_data.get('country', '')
+            
+            # 如果沒有國家代碼，嘗試根據國家名稱推測
+            if not country_code and country_name:
+                country_code = self._guess_country_code(country_name)
+            
+            self.logger.info(f"🎧 重構版：準備完整音頻 - 城市: {city_name}, 國家: {country_name} ({country_code})")
+            
+            # 🚀 準備完整音頻但不立即播放（優化版）
+            audio_file = self._prepare_complete_audio_optimized(country_code, city_name, country_name, city_data, token)
+            
+            if audio_file:
+                # 裝置端選定城市時音頻可能比定位動畫先完成，等網頁顯示城市後再播放
+                page_signal = self.web_controller.wait_for_signal(
+                    ['city', 'error'], WAKE_CYCLE_CONFIG.get('reveal_timeout', 30), cancel=token)
+                if token.cancelled:
+                    self.logger.info("⏹️ 甦醒流程已被取代，不播放音頻")
+                    return
+                if page_signal is None or page_signal['name'] == 'error':
+                    reason = page_signal['value'] if page_signal else '逾時'
+                    self.logger.warning(f"⚠️ 網頁未顯示城市（{reason}），仍播放音頻")
+                
+                # ✨ 音頻準備完成，同步顯示畫面和播放聲音
+                self.logger.info("✨ 重構版音頻準備完成，啟動同步播放...")
+                self._synchronized_reveal_and_play(audio_file)
+            elif not token.cancelled:
+                # 音頻準備失敗，顯示畫面並播放備用音效
+                self.logger.warning("⚠️ 重構版音頻準備失敗，顯示畫面")
+                self.audio_manager.play_notification_sound('error')
+        
+        except Exception as e:
+            self.logger.error(f"準備問候語失敗: {e}")
+            self.audio_manager.play_notification_sound('error')
     
     def _extract_city_data_from_web_optimized(self):
         """從重構版網頁提取城市資料（優化版）"""
@@ -383,8 +520,14 @@ class WakeUpMapWebAppV2:
             self.logger.error(f"從重構版網頁提取城市資料失敗: {e}")
             return None
     
-    def _prepare_complete_audio_optimized(self, country_code: str, city_name: str, country_name: str, city_data: dict = None) -> Optional[Path]:
-        """準備完整音頻但不播放，並將內容傳給重構版網頁（優化版）"""
+    def _prepare_complete_audio_optimized(self, country_code: str, city_name: str, country_name: str, city_data: dict = None,
+                                          token=None) -> Optional[Union[Path, SegmentedAudio]]:
+        """
+        準備完整音頻但不播放，並將內容傳給重構版網頁（優化版）
+        
+        Returns:
+            Union[Path, SegmentedAudio]: 音頻文件路徑或分段音頻（串流或分段合成時），失敗或被取消時返回 None
+        """
         try:
             import time
             from pathlib import Path
@@ -397,21 +540,22 @@ class WakeUpMapWebAppV2:
                 country_code=country_code,
                 city_name=city_name,
                 country_name=country_name,
-                city_data=city_data  # 🔧 傳遞完整城市數據，包含坐標信息
+                city_data=city_data,  # 🔧 傳遞完整城市數據，包含坐標信息
+                on_story_text=self._push_story_text,  # 串流模式：故事生成期間即推送到打字機
+                cancel_token=token  # 甦醒流程被取代時停止呼叫 API 與合成語音
             )
             
+            if token is not None and token.cancelled:
+                self.logger.info("⏹️ 甦醒流程已被取代，不傳送故事")
+                return None
+            
             end_time = time.time()
             duration = end_time - start_time
             
-            # 🔧 重構版：減少Firebase同步等待時間
+            # 🔧 重構版：Firebase上傳完成後才觸發前端事件
             if story_content:
-                self.logger.info("📖 重構版：發現故事內容，檢查Firebase上傳狀態...")
-                
-                # 🕐 減少等待時間（重構版前端處理更快）
-                import time
-                time.sleep(1)  # 從原來的2秒減少到1秒
-                
-                self.logger.info("🔥 重構版Firebase同步等待完成，現在傳送故事給前端顯示")
+                # audio_manager 的上傳請求在返回前已完成寫入，前端查詢即可取得
+                self.logger.info("🔥 重構版：故事已上傳到Firebase，現在傳送故事給前端顯示")
                 self._send_story_to_web_optimized(story_content)
                 
                 if audio_file and audio_file.exists():
@@ -429,11 +573,137 @@ class WakeUpMapWebAppV2:
             self.logger.error(f"重構版準備完整音頻時發生錯誤: {e}")
             return None
 
+    def _initialize_asset_server(self):
+        """啟動本機資源伺服器，網頁改從本機版本化資源包載入（失敗時維持線上網址）"""
+        if not ASSET_SERVER_CONFIG.get('enabled', False):
+            return
+        
+        tile_cache = None
+        if TILE_CACHE_CONFIG.get('enabled', False):
+            try:
+                tile_cache = TileCache(
+                    TILE_CACHE_CONFIG['cache_dir'],
+                    TILE_CACHE_CONFIG['upstream'],
+                    max_mb=TILE_CACHE_CONFIG.get('max_mb', 200),
+                    subdomains=TILE_CACHE_CONFIG.get('subdomains', 'abc'),
+                    user_agent=TILE_CACHE_CONFIG.get('user_agent', 'WakeUpMap-Pi/1.0'),
+                    world_zoom=TILE_CACHE_CONFIG.get('world_zoom', 2),
+                    prefetch_zooms=TILE_CACHE_CONFIG.get('prefetch_zooms'),
+                    prefetch_radius=TILE_CACHE_CONFIG.get('prefetch_radius', 2)
+                )
+            except OSError as e:
+                self.logger.warning(f"圖磚快取無法建立，地圖改從線上載入：{e}")
+        
+        server = AssetServer(
+            ASSET_SERVER_CONFIG['files'],
+            ASSET_SERVER_CONFIG['bundle_dir'],
+            ASSET_SERVER_CONFIG['origin'],
+            source_dir=str(Path(__file__).resolve().parent.parent),
+            host=ASSET_SERVER_CONFIG.get('host', '127.0.0.1'),
+            port=ASSET_SERVER_CONFIG.get('port', 8766),
+            update_interval=ASSET_SERVER_CONFIG.get('update_interval', 6 * 3600),
+            tile_cache=tile_cache
+        )
+        if server.start():
+            self.asset_server = server
+            if tile_cache:
+                tile_cache.start()
+            self.web_controller.website_url = server.page_url('pi-modular.html')
+        else:
+            self.logger.warning("本機資源伺服器未啟動，改從線上載入網頁")
+
+    def _initialize_memory_governor(self):
+        """啟動瀏覽器記憶體管理（僅在沒有按鈕流程進行時回收或軟重啟）"""
+        if not MEMORY_GOVERNOR_CONFIG.get('enabled', False):
+            return
+        
+        governor = MemoryGovernor(self.web_controller, MEMORY_GOVERNOR_CONFIG, self._is_idle_for_maintenance)
+        if governor.start():
+            self.memory_governor = governor
+
+    def _start_idle_metrics(self):
+        """定期取樣本程式的喚醒次數與 CPU 使用率，整段取樣期間都閒置時才記錄"""
+        if not IDLE_METRICS_CONFIG.get('enabled', False):
+            return
+        
+        meter = WakeupMeter(IDLE_METRICS_CONFIG.get('status_file'))
+        interval = IDLE_METRICS_CONFIG.get('interval', 300)
+        
+        def sample_idle(token):
+            stats = meter.sample()
+            idle = not self.is_processing_button and time.time() - self.last_button_action_time > interval
+            if stats and idle:
+                meter.write_status(stats)
+                self.logger.info(f"💤 閒置喚醒: {stats['wakeups_per_s']} 次/秒, CPU {stats['cpu_percent']}%, "
+                                 f"{stats['threads']} 個執行緒")
+            if not token.cancelled:
+                self.tasks.submit('idle-metrics', sample_idle, delay=interval, timer=True)
+        
+        self.tasks.submit('idle-metrics', sample_idle, delay=interval, timer=True)
+
+    def _is_idle_for_maintenance(self) -> bool:
+        """沒有進行中的按鈕流程，且距離上次按鈕操作已超過閒置時間"""
+        idle_delay = MEMORY_GOVERNOR_CONFIG.get('idle_delay', 180)
+        return not self.is_processing_button and time.time() - self.last_button_action_time > idle_delay
+
+    def _initialize_event_bus(self):
+        """啟動網頁事件匯流排：網頁日誌與狀態轉換即時送回，故事事件依序送到網頁"""
+        if not EVENT_BUS_CONFIG.get('enabled', False):
+            return
+        
+        bus = EventBus(EVENT_BUS_CONFIG.get('host', '127.0.0.1'), EVENT_BUS_CONFIG.get('port', 8765))
+        bus.on('log', self._on_page_log)
+        bus.on('state', self._on_page_state)
+        if bus.start():
+            self.event_bus = bus
+            self.web_controller.event_bus_url = bus.url
+        else:
+            self.logger.warning("事件匯流排未啟動，改用日誌橋接輪詢與 execute_script")
+
+    def _on_page_log(self, message: dict):
+        """網頁日誌（取代 #frontend-log-bridge 輪詢）"""
+        text = f"[重構版前端] {message.get('message', '')} {message.get('data') or ''}"
+        level = message.get('level', 'INFO')
+        if level == 'ERROR':
+            self.logger.error(text)
+        elif level == 'WARN':
+            self.logger.warning(text)
+        else:
+            self.logger.info(text)
+
+    def _on_page_state(self, message: dict):
+        """網頁狀態轉換"""
+        detail = f" ({message['message']})" if message.get('message') else ''
+        self.logger.info(f"🔄 [重構版前端] 狀態: {message.get('state')}{detail}")
+
+    def _dispatch_page_event(self, name: str, detail, assign: str = None):
+        """
+        送出網頁事件：事件匯流排已連線時依序批次送出，否則以 execute_script 分派
+        
+        Args:
+            name: CustomEvent 名稱
+            detail: 事件內容
+            assign: 同時設定的 window 全域變數名稱（可選）
+        """
+        if self.event_bus and self.event_bus.send(name, detail, assign):
+            return
+        
+        self.web_controller.driver.execute_script(
+            "if (arguments[2]) { window[arguments[2]] = arguments[1]; }"
+            "window.dispatchEvent(new CustomEvent(arguments[0], { detail: arguments[1] }));",
+            name, detail, assign
+        )
+
+    def _push_story_text(self, text: str, first: bool):
+        """將串流中的故事文字推送到網頁打字機（故事完成前即開始顯示）"""
+        if not self.web_controller or not self.web_controller.driver:
+            return
+        
+        self._dispatch_page_event('piStoryChunk', {'text': text, 'reset': first})
+
     def _send_story_to_web_optimized(self, story_content: dict):
         """將故事內容傳給重構版網頁端用於打字機效果（優化版）"""
         try:
-            import json
-            
             if not self.web_controller or not self.web_controller.driver:
                 self.logger.warning("網頁控制器未初始化，無法傳送故事內容")
                 return
@@ -441,32 +711,21 @@ class WakeUpMapWebAppV2:
             # 獲取當前 Day 編號
             current_day = self._get_current_day_number()
             
-            # 將故事內容注入到重構版網頁中
-            story_js = f"""
-            // 重構版：設定樹莓派生成的故事內容
-            window.piGeneratedStory = {{
-                greeting: {json.dumps(story_content.get('greeting', ''), ensure_ascii=False)},
-                language: {json.dumps(story_content.get('language', ''), ensure_ascii=False)},
-                languageCode: {json.dumps(story_content.get('languageCode', ''), ensure_ascii=False)},
-                story: {json.dumps(story_content.get('story', ''), ensure_ascii=False)},
-                fullContent: {json.dumps(story_content.get('fullContent', ''), ensure_ascii=False)},
-                city: {json.dumps(story_content.get('city', ''), ensure_ascii=False)},
-                country: {json.dumps(story_content.get('country', ''), ensure_ascii=False)},
-                countryCode: {json.dumps(story_content.get('countryCode', ''), ensure_ascii=False)},
-                day: {current_day},
-                isRefactored: true  // 標記為重構版
-            }};
-            
-            // 重構版：觸發 piStoryReady 事件（使用重構版的事件處理器）
-            window.dispatchEvent(new CustomEvent('piStoryReady', {{ 
-                detail: window.piGeneratedStory 
-            }}));
-            
-            console.log('🎵 重構版：樹莓派故事內容已準備完成:', window.piGeneratedStory);
-            console.log('🎵 重構版：即將觸發 piStoryReady 事件，Day: {current_day}');
-            """
-            
-            self.web_controller.driver.execute_script(story_js)
+            # 設定 window.piGeneratedStory 並觸發 piStoryReady（與串流文字走同一條依序通道）
+            story_detail = {
+                'greeting': story_content.get('greeting', ''),
+                'language': story_content.get('language', ''),
+                'languageCode': story_content.get('languageCode', ''),
+                'story': story_content.get('story', ''),
+                'fullContent': story_content.get('fullContent', ''),
+                'city': story_content.get('city', ''),
+                'country': story_content.get('country', ''),
+                'countryCode': story_content.get('countryCode', ''),
+                'audioDuration': story_content.get('audioDuration'),
+                'day': current_day,
+                'isRefactored': True  # 標記為重構版
+            }
+            self._dispatch_page_event('piStoryReady', story_detail, assign='piGeneratedStory')
             self.logger.info("✅ 重構版：故事內容已傳送給網頁端")
             
             # 🔧 啟動前端日誌監控
@@ -479,89 +738,82 @@ class WakeUpMapWebAppV2:
         """啟動前端日誌監控，定期讀取前端日誌並輸出到後端日誌"""
         if self.frontend_log_monitoring_started:
             return  # 避免重複啟動
+        if self.event_bus and self.event_bus.connected:
+            return  # 日誌已由事件匯流排送回
             
-        import threading
-        import time
-        
-        def monitor_frontend_logs():
+        def monitor_frontend_logs(token):
             try:
                 last_timestamp = None
                 element_found = False
                 
-                # 給前端足夠時間初始化
-                time.sleep(2)
-                
-                while True:
+                while not token.cancelled:
+                    if not self.web_controller or not self.web_controller.driver:
+                        break
+                    
+                    # 網頁端等待日誌橋接元素更新（不輪詢），新的日誌出現時才返回
                     try:
-                        if not self.web_controller or not self.web_controller.driver:
-                            break
-                            
-                        # 讀取前端日誌橋接元素
-                        log_element = self.web_controller.driver.find_element("id", "frontend-log-bridge")
-                        
-                        if not element_found:
-                            self.logger.info("🔧 [重構版日誌橋接] 找到前端日誌橋接元素")
-                            element_found = True
-                        
-                        current_timestamp = log_element.get_attribute("data-timestamp")
-                        
-                        # 如果有新的日誌條目
-                        if current_timestamp and current_timestamp != last_timestamp:
-                            log_content = log_element.text
-                            if log_content:
-                                try:
-                                    import json
-                                    log_entry = json.loads(log_content)
-                                    level = log_entry.get('level', 'INFO')
-                                    message = log_entry.get('message', '')
-                                    data = log_entry.get('data', '')
-                                    
-                                    # 根據日誌級別輸出到對應的後端日誌
-                                    if level == 'ERROR':
-                                        self.logger.error(f"[重構版前端] {message} {data}")
-                                    elif level == 'WARN':
-                                        self.logger.warning(f"[重構版前端] {message} {data}")
-                                    else:
-                                        self.logger.info(f"[重構版前端] {message} {data}")
-                                    
-                                    last_timestamp = current_timestamp
-                                    
-                                except json.JSONDecodeError as e:
-                                    self.logger.warning(f"🔧 [重構版日誌橋接] JSON解析失敗: {e}, 內容: {log_content[:100]}")
-                                    
+                        entry = self.web_controller.wait_for_frontend_log(last_timestamp)
                     except Exception as e:
-                        if not element_found:
-                            # 只在第一次找不到元素時報告
-                            self.logger.warning(f"🔧 [重構版日誌橋接] 尚未找到前端日誌元素: {e}")
-                            element_found = None  # 標記為已報告
+                        self.logger.debug(f"🔧 [重構版日誌橋接] 等待前端日誌失敗: {e}")
+                        # 頁面重新載入或切換中，稍後重試
+                        if token.wait(5):
+                            break
+                        continue
+                    
+                    if not entry:
+                        continue
+                    if not element_found:
+                        self.logger.info("🔧 [重構版日誌橋接] 找到前端日誌橋接元素")
+                        element_found = True
                     
-                    time.sleep(1)  # 每秒檢查一次
+                    last_timestamp = entry['timestamp']
+                    log_content = entry['content']
+                    if log_content:
+                        try:
+                            import json
+                            log_entry = json.loads(log_content)
+                            level = log_entry.get('level', 'INFO')
+                            message = log_entry.get('message', '')
+                            data = log_entry.get('data', '')
+                            
+                            # 根據日誌級別輸出到對應的後端日誌
+                            if level == 'ERROR':
+                                self.logger.error(f"[重構版前端] {message} {data}")
+                            elif level == 'WARN':
+                                self.logger.warning(f"[重構版前端] {message} {data}")
+                            else:
+                                self.logger.info(f"[重構版前端] {message} {data}")
+                            
+                        except json.JSONDecodeError as e:
+                            self.logger.warning(f"🔧 [重構版日誌橋接] JSON解析失敗: {e}, 內容: {log_content[:100]}")
                     
             except Exception as e:
                 self.logger.error(f"重構版前端日誌監控失敗: {e}")
         
-        # 在後台執行緒中啟動監控
-        monitor_thread = threading.Thread(target=monitor_frontend_logs, daemon=True)
-        monitor_thread.start()
+        # 在工作池中啟動監控（關閉時取消；長時間執行，使用自己的執行緒）
+        self.tasks.submit('frontend-log-monitor', monitor_frontend_logs, dedicated=True)
         self.frontend_log_monitoring_started = True
         self.logger.info("🔧 [重構版日誌橋接] 前端日誌監控已啟動")
     
-    def _synchronized_reveal_and_play(self, audio_file: Path):
+    def _synchronized_reveal_and_play(self, audio_file: Union[Path, SegmentedAudio]):
         """同步顯示畫面和播放音頻"""
         try:
             self.logger.info("🎬 重構版：啟動同步視聽體驗...")
             
             # 2. 立即播放音頻
-            import threading
-            def play_audio():
+            def play_audio(token):
+                if token.cancelled:
+                    return
+                # 新的甦醒或重置網頁時停止播放
+                token.on_cancel(self.audio_manager.stop_playback)
                 success = self.audio_manager.play_audio_file_direct(audio_file)
                 if success:
                     self.logger.info("🎵 重構版同步音頻播放成功")
                 else:
                     self.logger.warning("⚠️ 重構版同步音頻播放失敗")
             
-            # 在獨立執行緒中播放音頻，避免阻塞
-            threading.Thread(target=play_audio, daemon=True).start()
+            # 在工作池中播放音頻，避免阻塞
+            self.tasks.submit('play-greeting', play_audio, group='wake')
             
             self.logger.info("✨ 重構版同步視聽體驗啟動完成")
             
@@ -631,21 +883,27 @@ class WakeUpMapWebAppV2:
         return 'US'
     
     def _handle_long_press(self):
-        """處理長按事件 - 重新載入網頁"""
-        self.logger.info("處理長按事件：重新載入重構版網頁")
+        """處理長按事件 - 重置網頁（軟重置，必要時切換預熱備用頁或重新載入）"""
+        self.logger.info("處理長按事件：重置重構版網頁")
         
         # 處理螢幕保護器
         self._deactivate_screensaver()
         self._reset_screensaver_timer()
         
         try:
-            result = self.web_controller.reload_website()
+            if not self._wait_for_startup():
+                return
+            
+            # 重置網頁時停止進行中的甦醒流程
+            self.tasks.cancel(group='wake', reason='重置網頁')
+            
+            result = self.web_controller.soft_reset()
             
             if result and result.get('success'):
-                self.logger.info("重構版網頁重新載入成功")
+                self.logger.info(f"重構版網頁重置成功：{result.get('message')}")
                 
             else:
-                self.logger.error("重構版網頁重新載入失敗")
+                self.logger.error("重構版網頁重置失敗")
                 
         except Exception as e:
             self.logger.error(f"長按事件處理失敗：{e}")
@@ -687,9 +945,8 @@ class WakeUpMapWebAppV2:
             if self.button_handler:
                 self.logger.info("按鈕處理器已就緒")
             
-            # 等待停止信號
-            while self.running and not self._stop_event.is_set():
-                time.sleep(0.1)
+            # 阻塞等待停止信號（信號處理器或 shutdown 設定事件），閒置時主執行緒不喚醒
+            self._stop_event.wait()
                 
         except KeyboardInterrupt:
             self.logger.info("收到中斷信號")
@@ -707,9 +964,8 @@ class WakeUpMapWebAppV2:
         self.running = False
         self._stop_event.set()
         
-        # 取消螢幕保護計時器
-        if self.screensaver_timer:
-            self.screensaver_timer.cancel()
+        # 取消所有背景工作（螢幕保護計時、甦醒流程、前端日誌監控）
+        self.tasks.shutdown()
         
         # 關閉按鈕處理器
         if self.button_handler and hasattr(self.button_handler, 'cleanup'):
@@ -718,6 +974,10 @@ class WakeUpMapWebAppV2:
             except Exception as e:
                 self.logger.error(f"關閉按鈕處理器失敗：{e}")
         
+        # 停止記憶體管理（避免在關閉瀏覽器時切換頁面）
+        if self.memory_governor:
+            self.memory_governor.stop()
+        
         # 關閉網頁控制器
         if self.web_controller:
             try:
@@ -725,6 +985,16 @@ class WakeUpMapWebAppV2:
             except Exception as e:
                 self.logger.error(f"關閉網頁控制器失敗：{e}")
         
+        # 關閉事件匯流排
+        if self.event_bus:
+            self.event_bus.stop()
+        
+        # 關閉本機資源伺服器
+        if self.asset_server:
+            self.asset_server.stop()
+            if self.asset_server.tile_cache:
+                self.asset_server.tile_cache.stop()
+        
         # 清理音訊管理器
         cleanup_audio_manager()
         
@@ -738,18 +1008,19 @@ class WebControllerDSIRefactored(WebControllerDSI):
         super().__init__()
         self.logger = logging.getLogger(self.__class__.__name__)
         self.is_refactored = True
+        # 使用重構版的HTML文件（預熱備用頁也載入同一個網址）
+        self.website_url = "file:///home/future/pi/subjective-clock/pi-modular.html"
     
     def load_website(self):
         """載入重構版網站"""
         try:
-            # 使用重構版的HTML文件
-            refactored_url = "file:///home/future/pi/subjective-clock/pi-modular.html"
+            # 重新連上的瀏覽器仍顯示就緒的頁面時直接沿用
+            if getattr(self.driver, 'reattached', False) and self._resume_page():
+                return {'success': True, 'message': '沿用執行中的重構版網站'}
             
-            self.logger.info(f"載入重構版網站: {refactored_url}")
-            self.driver.get(refactored_url)
-            
-            # 等待重構版頁面載入
-            time.sleep(3)
+            self.logger.info(f"載入重構版網站: {self.website_url}")
+            # driver.get 會等到文件載入完成；Firebase 就緒在 _click_load_data_button 中等待
+            self.driver.get(self.website_url)
             
             # 自動填入使用者名稱
             success = self._fill_username()
@@ -772,6 +1043,10 @@ class WebControllerDSIRefactored(WebControllerDSI):
             result = self.driver.execute_script("""
                 try {
                     console.log('🚀 重構版：Python觸發甦醒流程');
+                    if (window.piSignals) {
+                        window.piSignals.clear('city');
+                        window.piSignals.clear('error');
+                    }
                     
                     // 檢查重構版管理器是否存在
                     if (typeof WakeUpManager !== 'undefined' && WakeUpManager.startTheDay) {
@@ -794,8 +1069,11 @@ class WebControllerDSIRefactored(WebControllerDSI):
             
             self.logger.info(f"重構版甦醒流程結果：{result}")
             
-            # 等待處理完成（重構版處理更快）
-            time.sleep(5)  # 從原來的8秒減少到5秒
+            # 等待城市資料出現（或流程失敗）
+            if result and result.get('success'):
+                page_signal = self.wait_for_signal(['city', 'error'], WAIT_TIMEOUT)
+                if page_signal and page_signal['name'] == 'error':
+                    return {'success': False, 'message': page_signal['value']}
             
             return result if result else {'success': False, 'message': '未知錯誤'}
             
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 記憶體管理
+定期取樣 Chrome 與本程式的 USS、swap 換入速率與記憶體壓力 (PSI)，並記錄歷史
+記憶體吃緊時趁閒置先讓瀏覽器回收記憶體，必要時切換到新頁面（受控的軟重啟），避免長時間運行後使用 SD 卡 swap
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Optional, Callable, Dict, Any, List
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+def read_memory_pressure() -> Optional[Dict[str, float]]:
+    """
+    讀取 /proc/pressure/memory（Linux PSI）
+
+    Returns:
+        Dict: {'some_avg10', 'full_avg10'}，核心不支援時返回 None
+    """
+    try:
+        with open('/proc/pressure/memory', 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+
+    pressure = {}
+    for line in lines:
+        kind, *fields = line.split()
+        for field in fields:
+            key, _, value = field.partition('=')
+            if key == 'avg10':
+                pressure[f'{kind}_avg10'] = float(value)
+    return pressure
+
+
+class MemoryGovernor:
+    """瀏覽器記憶體管理器"""
+
+    def __init__(self, web_controller, config: Dict[str, Any], is_idle: Callable[[], bool]):
+        """
+        Args:
+            web_controller: WebControllerDSI（取得 Chrome 行程與執行回收/切換頁面）
+            config: MEMORY_GOVERNOR_CONFIG
+            is_idle: 是否可進行維護（沒有進行中的甦醒流程或播放）
+        """
+        self.web_controller = web_controller
+        self.config = config
+        self.is_idle = is_idle
+
+        self.history: "deque[Dict[str, Any]]" = deque(maxlen=config.get('history_size', 240))
+        self.stats = {'gc': 0, 'standby_dropped': 0, 'restarts': 0}
+        self._last_gc = 0.0
+        self._last_restart = time.time()
+        self._last_log = 0.0
+        # 上次取樣時的累計 swap-in 位元組與時間（計算換入速率）
+        self._last_swap_in: Optional[tuple] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        if not PSUTIL_AVAILABLE:
+            logger.info("未安裝 psutil，不啟動記憶體管理")
+            return False
+        self._thread = threading.Thread(target=self._run, name='MemoryGovernor', daemon=True)
+        self._thread.start()
+        logger.info("🧠 記憶體管理已啟動")
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+
+    # ------------------------------------------------------------------
+    # 取樣
+    # ------------------------------------------------------------------
+
+    def _chrome_processes(self) -> List['psutil.Process']:
+        """Chrome 主行程與所有子行程（renderer、GPU 等）"""
+        driver = self.web_controller.driver
+        # DevTools 協定後端直接持有 Chrome；chromedriver 後端的 Chrome 是 chromedriver 的子行程
+        root = getattr(driver, 'process', None) or getattr(getattr(driver, 'service', None), 'process', None)
+        if root is None:
+            return []
+        try:
+            parent = psutil.Process(root.pid)
+            return [parent] + parent.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    @staticmethod
+    def _uss(processes: List['psutil.Process']) -> int:
+        """各行程獨占的記憶體總和（USS；RSS 加總會重複計算共用頁面）"""
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_full_info().uss
+            except psutil.AccessDenied:
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+            except psutil.Error:
+                pass
+        return total
+
+    def _swap_in_rate(self, swap, now: float) -> float:
+        """每秒換入的 KB（swap 使用量在壓力解除後仍會保持，換入速率才反映目前的壓力）"""
+        previous, self._last_swap_in = self._last_swap_in, (swap.sin, now)
+        if previous is None or now <= previous[1]:
+            return 0.0
+        return max(0, swap.sin - previous[0]) / 1024 / (now - previous[1])
+
+    def sample(self) -> Dict[str, Any]:
+        """取樣目前的記憶體狀態"""
+        me = psutil.Process()
+        try:
+            app_processes = [me] + me.children(recursive=True)
+        except psutil.Error:
+            app_processes = [me]
+        chrome_processes = self._chrome_processes()
+        chrome_pids = {process.pid for process in chrome_processes}
+
+        virtual = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        now = time.time()
+        sample = {
+            'time': now,
+            'chrome_uss_mb': round(self._uss(chrome_processes) / _MB, 1),
+            'app_uss_mb': round(self._uss([p for p in app_processes if p.pid not in chrome_pids]) / _MB, 1),
+            'available_mb': round(virtual.available / _MB, 1),
+            'swap_used_mb': round(swap.used / _MB, 1),
+            'swap_in_kbps': round(self._swap_in_rate(swap, now), 1),
+        }
+        pressure = read_memory_pressure()
+        if pressure:
+            sample.update(pressure)
+        return sample
+
+    # ------------------------------------------------------------------
+    # 管理
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while not self._stop_event.wait(self.config.get('interval', 30)):
+            try:
+                sample = self.sample()
+                self.history.append(sample)
+                self._write_history()
+                self._log(sample)
+                self._govern(sample)
+            except Exception as e:
+                logger.warning(f"記憶體管理失敗: {e}")
+
+    def _under_pressure(self, sample: Dict[str, Any]) -> bool:
+        return (sample['swap_in_kbps'] > self.config.get('swap_in_limit_kbps', 256)
+                or sample.get('some_avg10', 0) > self.config.get('psi_some_avg10', 10.0)
+                or sample['available_mb'] < self.config.get('min_available_mb', 150))
+
+    def _govern(self, sample: Dict[str, Any]):
+        now = time.time()
+        pressure = self._under_pressure(sample)
+
+        # 記憶體吃緊時先放棄預熱備用頁（整個 renderer 的記憶體），不需等待閒置
+        if pressure and self.web_controller.standby_driver:
+            logger.info("🧠 記憶體吃緊，釋放預熱備用頁")
+            self.web_controller.drop_standby()
+            self.stats['standby_dropped'] += 1
+
+        if not self.is_idle():
+            return
+
+        chrome_mb = sample['chrome_uss_mb']
+        if (chrome_mb > self.config.get('chrome_restart_mb', 600)
+                and now - self._last_restart > self.config.get('restart_cooldown', 1800)):
+            logger.info(f"🧠 Chrome 使用 {chrome_mb:.0f}MB，閒置中進行軟重啟")
+            self._last_restart = now
+            self.stats['restarts'] += 1
+            if not self.web_controller.swap_to_standby():
+                self.web_controller.reload_website()
+            return
+
+        if ((pressure or chrome_mb > self.config.get('chrome_gc_mb', 350))
+                and now - self._last_gc > self.config.get('gc_cooldown', 300)):
+            self._last_gc = now
+            self.stats['gc'] += 1
+            self._collect_garbage(chrome_mb)
+
+    def _collect_garbage(self, chrome_mb: float):
+        """讓頁面執行 JS 垃圾回收，並通知 Chrome 釋放快取記憶體"""
+        driver = self.web_controller.driver
+        try:
+            driver.execute_cdp_cmd('HeapProfiler.collectGarbage', {})
+            driver.execute_cdp_cmd('Memory.simulatePressureNotification', {'level': 'moderate'})
+            logger.info(f"🧠 已要求瀏覽器回收記憶體 (Chrome {chrome_mb:.0f}MB)")
+        except Exception as e:
+            logger.debug(f"瀏覽器記憶體回收失敗: {e}")
+
+    # ------------------------------------------------------------------
+    # 記錄
+    # ------------------------------------------------------------------
+
+    def _log(self, sample: Dict[str, Any]):
+        if sample['time'] - self._last_log < self.config.get('log_interval', 600):
+            return
+        self._last_log = sample['time']
+        logger.info(
+            f"🧠 記憶體: Chrome {sample['chrome_uss_mb']:.0f}MB, 程式 {sample['app_uss_mb']:.0f}MB, "
+            f"可用 {sample['available_mb']:.0f}MB, swap {sample['swap_used_mb']:.0f}MB "
+            f"(換入 {sample['swap_in_kbps']:.0f}KB/s), "
+            f"PSI {sample.get('some_avg10', 0):.1f}"
+        )
+
+    def _write_history(self):
+        """寫出記憶體歷史供現場檢查（位於 RAM，不寫入 SD 卡）"""
+        history_file = self.config.get('history_file')
+        if not history_file:
+            return
+        try:
+            with open(history_file, 'w', encoding='utf-8') as f:
+                json.dump({'stats': self.stats, 'samples': list(self.history)}, f)
+        except OSError as e:
+            logger.debug(f"寫出記憶體歷史失敗: {e}")
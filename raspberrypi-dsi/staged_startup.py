@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 分階段平行啟動
+啟動流程以相依關係圖描述：沒有相依的階段同時執行（例如 Chrome 啟動與音訊/TTS 偵測、GPIO 設定），
+每個階段完成時立即放行依賴它的階段，並記錄各階段耗時
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+class StageFailed(RuntimeError):
+    """必要的啟動階段失敗"""
+
+
+class _Stage:
+    def __init__(self, name: str, func: Callable[[], Any], after: Iterable[str], required: bool):
+        self.name = name
+        self.func = func
+        self.after = list(after)
+        self.required = required
+        self.done = threading.Event()
+        self.ok = False
+        self.skipped = False
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.start_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+
+
+class StartupGraph:
+    """啟動階段相依關係圖"""
+
+    def __init__(self):
+        self._stages: Dict[str, _Stage] = {}
+        self._lock = threading.Lock()
+        self._boot_time: Optional[float] = None
+
+    def add(self, name: str, func: Callable[[], Any], after: Iterable[str] = (), required: bool = True):
+        """
+        新增啟動階段
+
+        Args:
+            name: 階段名稱
+            func: 階段內容（在獨立執行緒執行）
+            after: 必須先完成的階段
+            required: 失敗時是否中止啟動（非必要階段失敗只記錄警告，依賴它的階段照常執行）
+        """
+        self._stages[name] = _Stage(name, func, after, required)
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        等待指定階段結束（未加入的階段視為已結束）
+
+        Returns:
+            bool: 是否在時限內結束（成功與否由 succeeded 查詢）
+        """
+        stage = self._stages.get(name)
+        return stage is None or stage.done.wait(timeout)
+
+    def succeeded(self, name: str) -> bool:
+        stage = self._stages.get(name)
+        return stage is None or stage.ok
+
+    def is_done(self, name: str) -> bool:
+        stage = self._stages.get(name)
+        return stage is None or stage.done.is_set()
+
+    def run(self) -> Dict[str, Any]:
+        """
+        執行所有階段並等待完成
+
+        Returns:
+            Dict: 各階段的返回值
+
+        Raises:
+            StageFailed: 必要階段失敗（其餘已啟動的階段仍會執行完畢）
+        """
+        for stage in self._stages.values():
+            unknown = [dep for dep in stage.after if dep not in self._stages]
+            if unknown:
+                raise ValueError(f"啟動階段 {stage.name} 依賴未知的階段: {unknown}")
+
+        self._boot_time = time.time()
+        for stage in self._stages.values():
+            self._start_if_ready(stage)
+        for stage in self._stages.values():
+            stage.done.wait()
+
+        self._log_timings()
+        failed = [stage for stage in self._stages.values() if stage.required and not stage.ok]
+        if failed:
+            first = failed[0]
+            raise StageFailed(f"啟動階段 {first.name} 失敗: {first.error or '相依階段失敗'}")
+        return {name: stage.result for name, stage in self._stages.items()}
+
+    def _start_if_ready(self, stage: _Stage):
+        with self._lock:
+            if stage.start_time is not None:
+                return
+            if not all(self._stages[dep].done.is_set() for dep in stage.after):
+                return
+            stage.start_time = time.time()
+        threading.Thread(target=self._run_stage, args=(stage,), name=f"Startup-{stage.name}", daemon=True).start()
+
+    def _run_stage(self, stage: _Stage):
+        blocked = [dep for dep in stage.after if self._stages[dep].required and not self._stages[dep].ok]
+        try:
+            if blocked:
+                stage.skipped = True
+                logger.warning(f"⏭️ 略過啟動階段 {stage.name}（{', '.join(blocked)} 失敗）")
+            else:
+                stage.result = stage.func()
+                stage.ok = True
+        except Exception as e:
+            stage.error = e
+            log = logger.error if stage.required else logger.warning
+            log(f"啟動階段 {stage.name} 失敗: {e}")
+        finally:
+            stage.end_time = time.time()
+            stage.done.set()
+
+        for dependent in self._stages.values():
+            if stage.name in dependent.after:
+                self._start_if_ready(dependent)
+
+    def timings(self) -> List[Dict[str, Any]]:
+        """各階段的開始時間（相對啟動）與耗時"""
+        rows = []
+        for stage in sorted(self._stages.values(), key=lambda s: s.start_time or 0):
+            if stage.start_time is None:
+                continue
+            rows.append({
+                'stage': stage.name,
+                'start': stage.start_time - self._boot_time,
+                'duration': (stage.end_time or time.time()) - stage.start_time,
+                'status': 'skipped' if stage.skipped else ('ok' if stage.ok else 'failed'),
+            })
+        return rows
+
+    def _log_timings(self):
+        rows = self.timings()
+        total = max((row['start'] + row['duration'] for row in rows), default=0.0)
+        logger.info(f"⏱️ 啟動完成，總耗時 {total:.2f}s")
+        for row in rows:
+            logger.info(f"   {row['stage']:<18} +{row['start']:6.2f}s  {row['duration']:6.2f}s  {row['status']}")
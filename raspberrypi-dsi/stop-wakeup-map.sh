@@ -19,7 +19,7 @@ echo -e "${YELLOW}🔍 檢查正在運行的甦醒地圖進程...${NC}"
 
 MAIN_CONTROLLER_PID=$(pgrep -f "main_controller.py")
 MAIN_WEB_DSI_PID=$(pgrep -f "main_web_dsi.py")
-CHROMIUM_PID=$(pgrep -f "chromium.*localhost")
+CHROMIUM_PID=$(pgrep -f "(chromium.*localhost|remote-debugging-port=9222)")
 
 if [ -z "$MAIN_CONTROLLER_PID" ] && [ -z "$MAIN_WEB_DSI_PID" ] && [ -z "$CHROMIUM_PID" ]; then
     echo -e "${GREEN}✅ 沒有發現正在運行的甦醒地圖進程${NC}"
@@ -49,24 +49,24 @@ echo -e "${YELLOW}🛑 正在關閉甦醒地圖程式...${NC}"
 echo -e "   ⏳ 嘗試溫和關閉..."
 pkill -TERM -f "main_controller.py" 2>/dev/null
 pkill -TERM -f "main_web_dsi.py" 2>/dev/null
-pkill -TERM -f "chromium.*localhost" 2>/dev/null
+pkill -TERM -f "(chromium.*localhost|remote-debugging-port=9222)" 2>/dev/null
 
 # 等待進程結束
 sleep 3
 
 # 檢查是否還有進程存在
-REMAINING_PROCESSES=$(pgrep -f "(main_controller|main_web_dsi|chromium.*localhost)" | wc -l)
+REMAINING_PROCESSES=$(pgrep -f "(main_controller|main_web_dsi|chromium.*localhost|remote-debugging-port=9222)" | wc -l)
 
 if [ "$REMAINING_PROCESSES" -gt 0 ]; then
     echo -e "   💪 強制關閉剩餘進程..."
     pkill -KILL -f "main_controller.py" 2>/dev/null
     pkill -KILL -f "main_web_dsi.py" 2>/dev/null
-    pkill -KILL -f "chromium.*localhost" 2>/dev/null
+    pkill -KILL -f "(chromium.*localhost|remote-debugging-port=9222)" 2>/dev/null
     sleep 1
 fi
 
 # 最終檢查
-FINAL_CHECK=$(pgrep -f "(main_controller|main_web_dsi|chromium.*localhost)" | wc -l)
+FINAL_CHECK=$(pgrep -f "(main_controller|main_web_dsi|chromium.*localhost|remote-debugging-port=9222)" | wc -l)
 
 if [ "$FINAL_CHECK" -eq 0 ]; then
     echo -e "${GREEN}✅ 甦醒地圖程式已成功關閉${NC}"
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 故事與語音預先生成
+目標緯度由時間決定，可預先推算下一分鐘的候選城市，在閒置時先取得故事並合成語音
+按下按鈕時若城市命中，直接使用已準備好的內容；未使用的結果逾時後丟棄
+"""
+
+import json
+import time
+import random
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta, date
+from typing import Optional, Dict, Any, Tuple
+
+from config import TTS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 目標當地時間（與 pi-script.js 一致：找出正在早上 8 點的城市）
+TARGET_LOCAL_HOUR = 8
+
+
+def target_latitude_for(moment: datetime) -> float:
+    """依分鐘計算目標緯度（對應 pi-script.js 的 calculateTargetLatitudeFromTime）"""
+    hours, minutes = moment.hour, moment.minute
+    # 特例時間段 (7:50-8:10)：使用赤道附近
+    if (hours == 7 and minutes >= 50) or (hours == 8 and minutes <= 10):
+        return 0.0
+    # 線性映射：0分=北緯70度，30分≈赤道0度，59分=南緯70度
+    return 70 - (minutes * 140 / 59)
+
+
+def target_utc_offset_for(moment: datetime) -> float:
+    """計算目標城市需要的 UTC 偏移量（範圍 -12 ~ 14）"""
+    utc = moment.astimezone().utctimetuple()
+    offset = TARGET_LOCAL_HOUR - (utc.tm_hour + utc.tm_min / 60)
+    while offset > 14:
+        offset -= 24
+    while offset < -12:
+        offset += 24
+    return offset
+
+
+def find_city(find_city_url: str, moment: datetime, timeout: float = 10) -> Optional[Dict[str, Any]]:
+    """
+    以與網頁相同的參數詢問城市 API（API 會從候選中隨機選擇）
+
+    Args:
+        find_city_url: 城市 API 網址
+        moment: 甦醒時間（決定目標緯度與 UTC 偏移量）
+        timeout: 請求逾時秒數
+
+    Returns:
+        Dict: API 回傳的城市資料，失敗時返回 None
+    """
+    import requests
+    try:
+        response = requests.post(
+            find_city_url,
+            json={'targetUTCOffset': target_utc_offset_for(moment), 'targetLatitude': target_latitude_for(moment),
+                  'useLocalPosition': False},
+            headers={'Content-Type': 'application/json'},
+            timeout=timeout
+        )
+        data = response.json()
+        if response.status_code == 200 and data.get('success') and data.get('city'):
+            return data['city']
+    except Exception as e:
+        logger.debug(f"尋找城市失敗: {e}")
+    return None
+
+
+def city_key(city: str, country: str) -> Tuple[str, str]:
+    """城市比對用的鍵值（與網頁提取後的清理方式一致）"""
+    city = city.strip().rstrip(':').strip() if city else ''
+    return city.lower(), (country or '').strip().lower()
+
+
+class DailyBudget:
+    """每日 API 花費預算（估算值，持久化以跨重啟累計）"""
+
+    def __init__(self, state_file: Path, daily_limit: float):
+        self.state_file = Path(state_file)
+        self.daily_limit = daily_limit
+        self.day = date.today().isoformat()
+        self.spent = 0.0
+        self._load()
+
+    def _rollover(self):
+        today = date.today().isoformat()
+        if today != self.day:
+            self.day = today
+            self.spent = 0.0
+
+    def remaining(self) -> float:
+        self._rollover()
+        return max(0.0, self.daily_limit - self.spent)
+
+    def can_spend(self, amount: float) -> bool:
+        return self.remaining() >= amount
+
+    def charge(self, amount: float):
+        self._rollover()
+        self.spent += amount
+        self._save()
+
+    def _load(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('day') == self.day:
+                self.spent = float(state.get('spent', 0.0))
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def _save(self):
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.state_file.with_suffix('.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'day': self.day, 'spent': round(self.spent, 6)}, f)
+            temp_file.replace(self.state_file)
+        except OSError as e:
+            logger.debug(f"保存預先生成預算狀態失敗: {e}")
+
+
+class StoryPregenerator:
+    """閒置時預先生成下一分鐘候選城市的故事與語音"""
+
+    def __init__(self, audio_manager, config: Dict[str, Any], find_city_url: str):
+        self.audio_manager = audio_manager
+        self.config = config
+        self.find_city_url = find_city_url
+        self.budget = DailyBudget(config['state_file'], config['daily_budget_usd'])
+
+        # (城市, 國家) -> {'city', 'minute', 'greeting_data', 'audio_file'（故事片段）, 'created'}
+        self._prepared: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._last_activity = time.time()
+        self._prepared_minute: Optional[datetime] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """啟動背景預先生成執行緒"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='StoryPregenerator', daemon=True)
+        self._thread.start()
+        logger.info(f"🔮 故事預先生成已啟動 (每日預算 ${self.config['daily_budget_usd']:.2f})")
+
+    def stop(self):
+        """停止背景執行緒並丟棄所有未使用的結果"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        with self._lock:
+            entries = list(self._prepared.values())
+            self._prepared.clear()
+        for entry in entries:
+            self._discard(entry)
+
+    def notify_activity(self):
+        """使用者互動或前景工作時呼叫，預先生成會讓出網路與 CPU"""
+        self._last_activity = time.time()
+
+    # ------------------------------------------------------------------
+    # 取用
+    # ------------------------------------------------------------------
+
+    def prepared_city(self, moment: datetime) -> Optional[Dict[str, Any]]:
+        """
+        取得為指定分鐘預先生成的候選城市（不取出，故事資料之後仍由 take 取用）
+
+        Args:
+            moment: 甦醒時間
+
+        Returns:
+            Dict: API 格式的城市資料，該分鐘沒有候選城市時返回 None
+        """
+        minute = moment.replace(second=0, microsecond=0)
+        with self._lock:
+            candidates = [entry['city'] for entry in self._prepared.values() if entry['minute'] == minute]
+        return random.choice(candidates) if candidates else None
+
+    def take(self, city: str, country: str) -> Optional[Dict[str, Any]]:
+        """
+        取出已預先生成的故事資料（取出後不再由預先生成器管理）
+
+        Args:
+            city: 城市名稱
+            country: 國家名稱
+
+        Returns:
+            Dict: 與 _fetch_greeting_and_story_from_api 相同格式的資料，未命中時返回 None
+        """
+        with self._lock:
+            entry = self._prepared.pop(city_key(city, country), None)
+        if entry is None:
+            return None
+        logger.info(f"🎯 命中預先生成內容: {city} ({time.time() - entry['created']:.0f} 秒前準備)")
+        self.audio_manager._store_generated(entry['audio_file'])
+        return entry['greeting_data']
+
+    # ------------------------------------------------------------------
+    # 背景工作
+    # ------------------------------------------------------------------
+
+    def _is_idle(self) -> bool:
+        if time.time() - self._last_activity < self.config['idle_delay']:
+            return False
+        engine = self.audio_manager.output_engine
+        return not (engine and engine.is_busy())
+
+    def _next_check_delay(self) -> float:
+        """
+        距離下一次需要檢查的秒數：閒置期滿、下一分鐘的候選城市可以準備、或已準備的結果逾時
+        （取代固定間隔輪詢，閒置時約每分鐘喚醒一次）
+
+        Returns:
+            float: 等待秒數
+        """
+        now = time.time()
+        delays = []
+
+        idle_at = self._last_activity + self.config['idle_delay']
+        if idle_at > now:
+            delays.append(idle_at - now)
+        else:
+            engine = self.audio_manager.output_engine
+            if engine and engine.is_busy():
+                # 播放結束沒有通知，播放期間以較長的間隔重新檢查
+                delays.append(self.config['check_interval'])
+            # lead_seconds 後所在的分鐘改變時，就有新的分鐘可以準備
+            upcoming = now + self.config['lead_seconds']
+            delays.append(60 - upcoming % 60)
+
+        with self._lock:
+            created = [entry['created'] for entry in self._prepared.values()]
+        if created:
+            delays.append(min(created) + self.config['max_age'] - now)
+
+        return max(0.5, min(delays))
+
+    def _run(self):
+        while not self._stop_event.wait(self._next_check_delay()):
+            try:
+                self._expire()
+                if not self._is_idle():
+                    continue
+
+                # 按下後網頁尋找城市時所在的分鐘
+                upcoming = (datetime.now() + timedelta(seconds=self.config['lead_seconds'])).replace(
+                    second=0, microsecond=0)
+                if upcoming == self._prepared_minute:
+                    continue
+                self._prepare_minute(upcoming)
+                self._prepared_minute = upcoming
+
+            except Exception as e:
+                logger.warning(f"預先生成失敗: {e}")
+
+    def _prepare_minute(self, moment: datetime):
+        """為指定分鐘準備數個候選城市"""
+        latitude = target_latitude_for(moment)
+        utc_offset = target_utc_offset_for(moment)
+        logger.info(f"🔮 預先生成 {moment:%H:%M} 的候選城市 (緯度 {latitude:.2f}, UTC{utc_offset:+.2f})")
+
+        attempts = self.config['candidates'] * 2
+        prepared = 0
+        for _ in range(attempts):
+            if prepared >= self.config['candidates'] or self._stop_event.is_set() or not self._is_idle():
+                break
+            city = find_city(self.find_city_url, moment)
+            if not city:
+                continue
+            key = city_key(city.get('name') or city.get('city', ''), city.get('country', ''))
+            with self._lock:
+                if key in self._prepared:
+                    continue
+            if self._prepare_city(city, moment):
+                prepared += 1
+
+    def _prepare_city(self, city: Dict[str, Any], minute: datetime) -> bool:
+        """取得故事並合成語音（受每日預算限制）"""
+        city_name = city.get('name') or city.get('city', '')
+        country_name = city.get('country', '')
+        country_code = city.get('country_iso_code', '')
+
+        if not self.budget.can_spend(self.config['story_cost_usd']):
+            logger.info("💰 今日預先生成預算已用完")
+            return False
+
+        greeting_data = self.audio_manager._fetch_greeting_and_story_from_api(city_name, country_name, country_code)
+        self.budget.charge(self.config['story_cost_usd'])
+        if not greeting_data:
+            return False
+
+        # 與 prepare_greeting_audio_with_content 相同的分段，合成結果會成為快取命中
+        greeting_text = greeting_data['greeting']
+        language_code = greeting_data['languageCode']
+        story_text = greeting_data.get('chineseStory', '')
+
+        greeting_cached = self.audio_manager._find_cached_direct_audio(
+            self.audio_manager._direct_audio_path(greeting_text, language_code, 'nova'))
+        chars = len(story_text) + (0 if greeting_cached else len(greeting_text))
+        tts_cost = chars * self.config['tts_cost_per_char_usd']
+        if not self.budget.can_spend(tts_cost):
+            logger.info("💰 今日預先生成預算不足以合成語音")
+            return False
+
+        if not greeting_cached:
+            # 問候語片段由同語言的城市共用，不列入丟棄
+            self.audio_manager._generate_audio_openai_direct(greeting_text, language_code, voice='nova')
+        # 故事音頻多半不會使用，先只留在 RAM 層，命中時才寫入持久層
+        audio_file = self.audio_manager._generate_audio_openai_direct(
+            story_text, TTS_CONFIG['story_language'], voice='nova', persist=False)
+        self.budget.charge(tts_cost)
+        if not audio_file:
+            return False
+
+        with self._lock:
+            self._prepared[city_key(city_name, country_name)] = {
+                'city': city,
+                'minute': minute,
+                'greeting_data': greeting_data,
+                'audio_file': audio_file,
+                'created': time.time(),
+            }
+        logger.info(f"🔮 已預先生成: {city_name}, {country_name} "
+                    f"(今日剩餘預算 ${self.budget.remaining():.3f})")
+        return True
+
+    def _expire(self):
+        """丟棄逾時未使用的結果"""
+        deadline = time.time() - self.config['max_age']
+        with self._lock:
+            expired = [key for key, entry in self._prepared.items() if entry['created'] < deadline]
+            entries = [self._prepared.pop(key) for key in expired]
+        for entry in entries:
+            self._discard(entry)
+
+    def _discard(self, entry: Dict[str, Any]):
+        audio_file = entry['audio_file']
+        try:
+            self.audio_manager.audio_index.invalidate(audio_file)
+            self.audio_manager.audio_store.discard(audio_file)
+            logger.debug(f"丟棄未使用的預先生成音頻: {audio_file.name}")
+        except OSError as e:
+            logger.debug(f"刪除預先生成音頻失敗: {e}")
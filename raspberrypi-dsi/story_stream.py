@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 串流故事接收
+讀取 generatePiStoryStream 的 Server-Sent Events：問候語先到、故事逐段到達
+呼叫端可在故事仍在生成時推送文字到網頁並開始合成問候語與第一句
+"""
+
+import json
+import logging
+from typing import Optional, Callable, Dict, Any, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 句子結尾（中文與西文標點）
+SENTENCE_ENDINGS = '。！？!?；;'
+
+
+def iter_events(lines: Iterator[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    解析 Server-Sent Events
+
+    Args:
+        lines: 逐行文字（不含換行）
+
+    Yields:
+        Tuple[str, Dict]: (事件名稱, JSON 資料)
+    """
+    event, data = 'message', []
+    for line in lines:
+        if line == '':
+            if data:
+                try:
+                    yield event, json.loads('\n'.join(data))
+                except ValueError:
+                    logger.debug(f"無法解析串流事件資料: {data}")
+            event, data = 'message', []
+        elif line.startswith(':'):
+            continue
+        elif line.startswith('event:'):
+            event = line[6:].strip()
+        elif line.startswith('data:'):
+            data.append(line[5:].lstrip())
+
+
+def split_first_sentence(text: str, min_chars: int = 8) -> Optional[Tuple[str, str]]:
+    """
+    取出已完整的第一句（太短的句子與下一句合併，避免合成過碎）
+
+    Returns:
+        Tuple[str, str]: (第一句, 其餘文字)，尚未出現完整句子時返回 None
+    """
+    for index, char in enumerate(text):
+        if char in SENTENCE_ENDINGS and index + 1 >= min_chars:
+            return text[:index + 1], text[index + 1:].lstrip()
+    return None
+
+
+class StoryStreamConsumer:
+    """接收串流故事並在各階段呼叫回調"""
+
+    def __init__(self, url: str, connect_timeout: float = 5, read_timeout: float = 15):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    def consume(self, payload: Dict[str, Any],
+                on_greeting: Optional[Callable[[Dict[str, Any]], None]] = None,
+                on_text: Optional[Callable[[str, str], None]] = None, cancel=None) -> Optional[Dict[str, Any]]:
+        """
+        發送請求並讀取串流直到完成
+
+        Args:
+            payload: 請求資料（city, country, countryCode）
+            on_greeting: 收到問候語時呼叫，參數為 {greeting, language, languageCode}
+            on_text: 收到故事文字時呼叫，參數為 (新增文字, 目前完整文字)
+            cancel: 取消權杖（具 cancelled 屬性），取消時中止讀取並關閉連線
+
+        Returns:
+            Dict: 與 generatePiStory 相同格式的完整結果，失敗時返回 None
+        """
+        import requests
+
+        story = ''
+        try:
+            with requests.post(
+                self.url,
+                json=payload,
+                headers={'Content-Type': 'application/json', 'Accept': 'text/event-stream'},
+                stream=True,
+                timeout=(self.connect_timeout, self.read_timeout)
+            ) as response:
+                if response.status_code != 200:
+                    logger.error(f"串流故事 API 請求失敗: {response.status_code}")
+                    return None
+
+                # chunk_size=None：有資料到達就交出（伺服器每個事件都會送出），不會等區塊填滿
+                lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+                for event, data in iter_events(line if isinstance(line, str) else line.decode('utf-8')
+                                               for line in lines):
+                    if cancel is not None and cancel.cancelled:
+                        logger.info("串流故事已取消")
+                        return None
+                    if event == 'greeting':
+                        if on_greeting:
+                            on_greeting(data)
+                    elif event == 'chunk':
+                        text = data.get('text', '')
+                        story += text
+                        if text and on_text:
+                            on_text(text, story)
+                    elif event == 'done':
+                        return data
+                    elif event == 'error':
+                        logger.error(f"串流故事 API 錯誤: {data.get('error')}")
+                        return None
+
+        except Exception as e:
+            logger.error(f"讀取串流故事時發生錯誤: {e}")
+            return None
+
+        logger.warning("串流故事在完成前中斷")
+        return None
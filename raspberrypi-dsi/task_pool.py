@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 背景工作池
+甦醒流程的各階段（準備音頻、播放、計時器等）以具名工作在有限數量的執行緒中執行：
+- 每個工作收到一個取消權杖，新的甦醒或重置網頁時取消過期的工作，不會在新的流程上播放舊的音頻
+- 延遲工作取代 threading.Timer，不必每次計時都建立新的執行緒；計時回調由專用的計時執行緒執行，
+  工作執行緒全被佔用時仍會準時執行
+- 工作表記錄每個工作的狀態與耗時，並寫出到 RAM 供現場檢查
+"""
+
+import json
+import time
+import heapq
+import logging
+import itertools
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCancelled(Exception):
+    """工作已被取消（由 CancelToken.check 拋出）"""
+
+
+class CancelToken:
+    """取消權杖：工作在各階段之間檢查，被取消時盡快結束"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self.reason = ''
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = ''):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"取消回調失敗: {e}")
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """註冊取消時呼叫的函數（例如停止播放），已取消時立即呼叫"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self):
+        """已取消時拋出 TaskCancelled"""
+        if self._event.is_set():
+            raise TaskCancelled(self.reason)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待指定秒數（取代 time.sleep），期間被取消時立即返回
+
+        Returns:
+            bool: 是否已取消
+        """
+        return self._event.wait(timeout)
+
+
+class Task:
+    """工作池中的一個工作"""
+
+    def __init__(self, task_id: int, name: str, group: Optional[str], func: Callable[..., Any],
+                 args: tuple, kwargs: dict, due: float):
+        self.id = task_id
+        self.name = name
+        self.group = group
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.token = CancelToken()
+        self.state = 'pending'
+        self.submitted = time.time()
+        self.due = due
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.state in ('pending', 'running')
+
+    def cancel(self, reason: str = ''):
+        self.token.cancel(reason)
+
+    def as_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        row = {
+            'id': self.id,
+            'name': self.name,
+            'group': self.group,
+            'state': self.state,
+            'age': round(now - self.submitted, 2),
+        }
+        if self.state == 'pending' and self.due > now:
+            row['starts_in'] = round(self.due - now, 2)
+        if self.started is not None:
+            row['duration'] = round((self.finished or now) - self.started, 2)
+        if self.token.cancelled:
+            row['cancel_reason'] = self.token.reason
+        if self.error:
+            row['error'] = self.error
+        return row
+
+
+class TaskPool:
+    """具名、可取消、並行數有上限的背景工作池"""
+
+    def __init__(self, max_workers: int = 4, history_size: int = 50, status_file: Optional[str] = None):
+        """
+        Args:
+            max_workers: 同時執行的工作數上限
+            history_size: 工作表保留的已結束工作數量
+            status_file: 工作表輸出檔案（建議位於 /dev/shm）
+        """
+        self.max_workers = max_workers
+        self.status_file = status_file
+
+        self._heap: List[tuple] = []
+        # 計時回調（冷卻、螢幕保護等短小工作）另外排程，不佔用工作執行緒
+        self._timers: List[tuple] = []
+        self._timer_thread: Optional[threading.Thread] = None
+        self._active: Dict[int, Task] = {}
+        self._history: "deque[Task]" = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._idle = 0
+        self._shutdown = False
+
+    # ------------------------------------------------------------------
+    # 提交與取消
+    # ------------------------------------------------------------------
+
+    def submit(self, name: str, func: Callable[..., Any], *args, group: Optional[str] = None,
+               delay: float = 0.0, replace: bool = False, timer: bool = False, dedicated: bool = False,
+               **kwargs) -> Task:
+        """
+        提交工作，執行時呼叫 func(token, *args, **kwargs)
+
+        Args:
+            name: 工作名稱（顯示於工作表）
+            func: 工作內容，第一個參數為 CancelToken
+            group: 工作群組（可一次取消整個群組，例如同一次甦醒的所有階段）
+            delay: 延遲執行的秒數
+            replace: 先取消同名且尚未結束的工作（例如重設計時器）
+            timer: 短小的計時回調，由計時執行緒執行（不受工作執行緒數量限制，不可長時間阻塞）
+            dedicated: 長時間執行的服務（例如前端日誌監控），使用自己的執行緒，不佔用工作執行緒
+
+        Returns:
+            Task: 提交的工作
+        """
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("工作池已關閉")
+            if replace:
+                self._cancel_locked(lambda task: task.name == name, '已被新的同名工作取代')
+            task = Task(next(self._ids), name, group, func, args, kwargs, time.time() + delay)
+            self._active[task.id] = task
+            if dedicated:
+                task.state = 'running'
+                task.started = time.time()
+                threading.Thread(target=self._run_task, args=(task,), name=f'TaskPool-{name}',
+                                 daemon=True).start()
+            elif timer:
+                heapq.heappush(self._timers, (task.due, task.id, task))
+                if self._timer_thread is None:
+                    self._timer_thread = threading.Thread(target=self._worker_loop, args=(self._timers,),
+                                                          name='TaskPool-timer', daemon=True)
+                    self._timer_thread.start()
+            else:
+                heapq.heappush(self._heap, (task.due, task.id, task))
+                if self._idle == 0 and len(self._workers) < self.max_workers:
+                    worker = threading.Thread(target=self._worker_loop, args=(self._heap,),
+                                              name=f'TaskPool-{len(self._workers) + 1}', daemon=True)
+                    self._workers.append(worker)
+                    worker.start()
+            # 工作執行緒與計時執行緒共用同一個 Condition，全部喚醒由各自檢查自己的佇列
+            self._condition.notify_all()
+        self._write_status()
+        return task
+
+    def cancel(self, name: Optional[str] = None, group: Optional[str] = None, reason: str = '') -> int:
+        """
+        取消尚未結束的工作（執行中的工作在下次檢查權杖時結束）
+
+        Args:
+            name: 工作名稱
+            group: 工作群組
+
+        Returns:
+            int: 取消的工作數量
+        """
+        with self._condition:
+            count = self._cancel_locked(
+                lambda task: (name is None or task.name == name) and (group is None or task.group == group), reason)
+            self._condition.notify_all()
+        if count:
+            logger.info(f"⏹️ 已取消 {count} 個工作 ({name or group}){'：' + reason if reason else ''}")
+            self._write_status()
+        return count
+
+    def _cancel_locked(self, match: Callable[[Task], bool], reason: str) -> int:
+        tasks = [task for task in self._active.values() if match(task) and not task.token.cancelled]
+        for task in tasks:
+            task.cancel(reason)
+            if task.state == 'pending':
+                self._finish_locked(task, 'cancelled')
+        return len(tasks)
+
+    def _finish_locked(self, task: Task, state: str):
+        task.state = state
+        task.finished = time.time()
+        self._active.pop(task.id, None)
+        self._history.append(task)
+        task.done.set()
+
+    # ------------------------------------------------------------------
+    # 執行
+    # ------------------------------------------------------------------
+
+    def _next_task(self, heap: List[tuple]) -> Optional[Task]:
+        """取出下一個到期的工作（沒有工作時等待通知，不輪詢）"""
+        workers = heap is self._heap
+        with self._condition:
+            if workers:
+                self._idle += 1
+            try:
+                while not self._shutdown:
+                    while heap and heap[0][2].state != 'pending':
+                        heapq.heappop(heap)
+                    if not heap:
+                        self._condition.wait()
+                        continue
+                    due, _, task = heap[0]
+                    remaining = due - time.time()
+                    if remaining > 0:
+                        self._condition.wait(remaining)
+                        continue
+                    heapq.heappop(heap)
+                    task.state = 'running'
+                    task.started = time.time()
+                    return task
+                return None
+            finally:
+                if workers:
+                    self._idle -= 1
+
+    def _worker_loop(self, heap: List[tuple]):
+        while True:
+            task = self._next_task(heap)
+            if task is None:
+                return
+            self._run_task(task)
+
+    def _run_task(self, task: Task):
+        self._write_status()
+        state = 'done'
+        try:
+            task.func(task.token, *task.args, **task.kwargs)
+            if task.token.cancelled:
+                state = 'cancelled'
+        except TaskCancelled:
+            state = 'cancelled'
+        except Exception as e:
+            state = 'failed'
+            task.error = str(e)
+            logger.error(f"工作 {task.name} 失敗: {e}")
+        with self._condition:
+            self._finish_locked(task, state)
+        self._write_status()
+
+    # ------------------------------------------------------------------
+    # 工作表
+    # ------------------------------------------------------------------
+
+    def table(self) -> List[Dict[str, Any]]:
+        """目前與最近結束的工作"""
+        with self._condition:
+            tasks = list(self._active.values()) + list(self._history)
+        return [task.as_dict() for task in sorted(tasks, key=lambda task: task.id)]
+
+    def log_table(self):
+        rows = self.table()
+        logger.info(f"🧵 工作表（{len(rows)} 個工作，上限 {self.max_workers} 個同時執行）")
+        for row in rows:
+            logger.info(f"   #{row['id']:<4} {row['name']:<24} {row['state']:<10} {row.get('duration', 0):6.2f}s")
+
+    def _write_status(self):
+        if not self.status_file:
+            return
+        try:
+            with open(self.status_file, 'w', encoding='utf-8') as f:
+                json.dump({'max_workers': self.max_workers, 'tasks': self.table()}, f)
+        except OSError as e:
+            logger.debug(f"寫出工作表失敗: {e}")
+
+    def shutdown(self, reason: str = '關閉'):
+        """取消所有工作並停止工作執行緒"""
+        with self._condition:
+            self._cancel_locked(lambda task: True, reason)
+            self._shutdown = True
+            self._condition.notify_all()
+        self._write_status()
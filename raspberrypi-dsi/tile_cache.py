@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 地圖圖磚快取
+網頁的世界地圖圖磚改由本機資源伺服器 /tiles/ 提供：磁碟 LRU（容量上限），離線時從快取提供
+背景預先下載低縮放層級的完整世界，以及下一分鐘預測城市周圍的圖磚
+"""
+
+import os
+import math
+import random
+import logging
+import threading
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, List, Tuple
+
+from story_pregenerator import target_latitude_for, target_utc_offset_for
+
+logger = logging.getLogger(__name__)
+
+
+def tile_for(latitude: float, longitude: float, zoom: int) -> Tuple[int, int]:
+    """經緯度轉換為 Web Mercator 圖磚座標"""
+    n = 2 ** zoom
+    latitude = max(min(latitude, 85.0511), -85.0511)
+    x = int((longitude + 180.0) / 360.0 * n) % n
+    lat_rad = math.radians(latitude)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return x, min(max(y, 0), n - 1)
+
+
+class TileCache:
+    """磁碟 LRU 圖磚快取（執行期間在記憶體中記錄使用順序，關閉時寫回檔案修改時間供下次啟動排序）"""
+
+    def __init__(self, cache_dir: str, upstream: str, max_mb: int = 200, subdomains: str = 'abc',
+                 user_agent: str = 'WakeUpMap-Pi/1.0', world_zoom: int = 2,
+                 prefetch_zooms: Optional[List[int]] = None, prefetch_radius: int = 2):
+        """
+        Args:
+            cache_dir: 快取目錄
+            upstream: 圖磚來源網址範本（{s} {z} {x} {y}）
+            max_mb: 快取容量上限
+            subdomains: {s} 可用的子網域
+            user_agent: 請求圖磚時的 User-Agent（OSM 使用政策要求）
+            world_zoom: 預先下載完整世界的最大縮放層級
+            prefetch_zooms: 預測城市周圍預先下載的縮放層級
+            prefetch_radius: 預測城市周圍預先下載的圖磚半徑
+        """
+        self.cache_dir = Path(cache_dir)
+        self.upstream = upstream
+        self.max_bytes = max_mb * 1024 * 1024
+        self.subdomains = subdomains
+        self.user_agent = user_agent
+        self.world_zoom = world_zoom
+        self.prefetch_zooms = prefetch_zooms or []
+        self.prefetch_radius = prefetch_radius
+
+        # 相對路徑 -> 檔案大小，依最近使用排序（最舊在前）
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        # 啟動後命中過的圖磚（關閉時才更新修改時間，避免每次命中都寫入 SD 卡的 metadata）
+        self._touched = set()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stop_event = threading.Event()
+        self._predicted_minute: Optional[datetime] = None
+        self.stats = {'hits': 0, 'misses': 0, 'offline': 0}
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for path in self.cache_dir.rglob('*.png'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, str(path.relative_to(self.cache_dir)), stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        logger.info(f"🗺️ 圖磚快取: {len(self._index)} 張 ({self._total_bytes / 1024 / 1024:.1f}MB)")
+
+    # ------------------------------------------------------------------
+    # 取用
+    # ------------------------------------------------------------------
+
+    def get(self, z: int, x: int, y: int) -> Optional[bytes]:
+        """
+        取得圖磚：快取命中時直接返回，否則從來源下載並存入快取
+
+        Returns:
+            bytes: PNG 內容，離線且未快取時返回 None
+        """
+        key = f"{z}/{x}/{y}.png"
+        path = self.cache_dir / key
+        with self._lock:
+            cached = key in self._index
+            if cached:
+                self._index.move_to_end(key)
+                self._touched.add(key)
+        if cached:
+            try:
+                data = path.read_bytes()
+                self.stats['hits'] += 1
+                return data
+            except OSError:
+                self._forget(key)
+
+        self.stats['misses'] += 1
+        return self._fetch(z, x, y)
+
+    def _fetch(self, z: int, x: int, y: int) -> Optional[bytes]:
+        key = f"{z}/{x}/{y}.png"
+        # 同一張圖磚同時被請求時只下載一次
+        with self._lock:
+            waiter = self._inflight.get(key)
+            owner = waiter is None
+            if owner:
+                waiter = self._inflight[key] = {'event': threading.Event(), 'data': None}
+        if not owner:
+            waiter['event'].wait(15)
+            return waiter['data']
+
+        try:
+            url = self.upstream.format(s=random.choice(self.subdomains), z=z, x=x, y=y)
+            request = urllib.request.Request(url, headers={'User-Agent': self.user_agent})
+            with urllib.request.urlopen(request, timeout=10) as response:
+                data = response.read()
+            self._store(key, data)
+            waiter['data'] = data
+            return data
+        except (urllib.error.URLError, OSError) as e:
+            self.stats['offline'] += 1
+            logger.debug(f"下載圖磚 {key} 失敗: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            waiter['event'].set()
+
+    def _store(self, key: str, data: bytes):
+        path = self.cache_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix('.tmp')
+        temp.write_bytes(data)
+        temp.replace(path)
+
+        evicted = []
+        with self._lock:
+            self._total_bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                old_key, size = self._index.popitem(last=False)
+                self._total_bytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                (self.cache_dir / old_key).unlink()
+            except OSError:
+                pass
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._total_bytes -= self._index.pop(key, 0)
+
+    def has(self, z: int, x: int, y: int) -> bool:
+        with self._lock:
+            return f"{z}/{x}/{y}.png" in self._index
+
+    # ------------------------------------------------------------------
+    # 預先下載
+    # ------------------------------------------------------------------
+
+    def prefetch_around(self, latitude: float, longitude: float,
+                        zooms: Optional[List[int]] = None, radius: Optional[int] = None) -> int:
+        """
+        預先下載指定位置周圍的圖磚（已快取的略過）
+
+        Returns:
+            int: 新下載的圖磚數量
+        """
+        radius = self.prefetch_radius if radius is None else radius
+        fetched = 0
+        for zoom in zooms or self.prefetch_zooms:
+            n = 2 ** zoom
+            center_x, center_y = tile_for(latitude, longitude, zoom)
+            for dy in range(-radius, radius + 1):
+                y = center_y + dy
+                if not 0 <= y < n:
+                    continue
+                for dx in range(-radius, radius + 1):
+                    if self._stop_event.is_set():
+                        return fetched
+                    fetched += self._prefetch_one(zoom, (center_x + dx) % n, y)
+        return fetched
+
+    def _prefetch_one(self, z: int, x: int, y: int) -> int:
+        if self.has(z, x, y):
+            return 0
+        if self._fetch(z, x, y) is None:
+            return 0
+        # 背景下載放慢速度，遵守圖磚伺服器的使用政策
+        self._stop_event.wait(0.2)
+        return 1
+
+    def start(self, check_interval: float = 30):
+        """啟動背景預先下載：先補齊低縮放層級的完整世界，之後每分鐘預測下一個城市的位置"""
+        threading.Thread(target=self._prefetch_loop, args=(check_interval,),
+                         name='TilePrefetch', daemon=True).start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._save_recency()
+
+    def _save_recency(self):
+        """將命中過的圖磚依使用順序寫回修改時間（下次啟動時依修改時間重建 LRU 順序）"""
+        with self._lock:
+            touched = [key for key in self._index if key in self._touched]
+            self._touched.clear()
+        now = datetime.now().timestamp()
+        for offset, key in enumerate(touched, start=1):
+            # 最近使用的圖磚修改時間最新（都晚於未命中過的圖磚）
+            stamp = now + offset * 0.001
+            try:
+                os.utime(self.cache_dir / key, (stamp, stamp))
+            except OSError:
+                pass
+
+    def _prefetch_loop(self, check_interval: float):
+        fetched = 0
+        for zoom in range(self.world_zoom + 1):
+            for x in range(2 ** zoom):
+                for y in range(2 ** zoom):
+                    if self._stop_event.is_set():
+                        return
+                    fetched += self._prefetch_one(zoom, x, y)
+        if fetched:
+            logger.info(f"🗺️ 已預先下載世界地圖圖磚 {fetched} 張")
+
+        while not self._stop_event.wait(check_interval):
+            upcoming = (datetime.now() + timedelta(minutes=1)).replace(second=0, microsecond=0)
+            if upcoming == self._predicted_minute:
+                continue
+            self._predicted_minute = upcoming
+            # 目標城市位於目標緯度、且 UTC 偏移對應的經度附近
+            latitude = target_latitude_for(upcoming)
+            longitude = target_utc_offset_for(upcoming) * 15
+            count = self.prefetch_around(latitude, longitude)
+            if count:
+                logger.debug(f"🗺️ 預先下載 {upcoming:%H:%M} 預測位置周圍圖磚 {count} 張")
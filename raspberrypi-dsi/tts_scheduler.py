@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 具期限意識的 TTS 排程器
+記錄各引擎與模型相對於文字長度的延遲，依期限選擇模型，並在遠端引擎可能逾時時平行啟動本地引擎作為保險
+"""
+
+import json
+import time
+import queue
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Callable
+
+logger = logging.getLogger(__name__)
+
+# 每個引擎/模型保留的最近樣本數
+MAX_SAMPLES = 20
+
+
+class LatencyModel:
+    """延遲模型：以最近樣本擬合「固定開銷 + 每字元時間」"""
+
+    def __init__(self, stats_file: Path, schedule_save: Optional[Callable[[Callable[[], None]], None]] = None):
+        """
+        Args:
+            stats_file: 延遲記錄檔案
+            schedule_save: 排程背景寫入的函數（例如音頻儲存的背景寫入執行緒）；
+                           記錄只更新記憶體，檔案由背景或 flush() 寫出，合成路徑上不寫入 SD 卡
+        """
+        self.stats_file = Path(stats_file)
+        self.schedule_save = schedule_save
+        self._samples: Dict[str, List[Tuple[int, float]]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def _key(engine: str, model: Optional[str]) -> str:
+        return f"{engine}:{model}" if model else engine
+
+    def record(self, engine: str, model: Optional[str], chars: int, seconds: float):
+        """記錄一次成功合成的耗時"""
+        key = self._key(engine, model)
+        with self._lock:
+            samples = self._samples.setdefault(key, [])
+            samples.append((chars, round(seconds, 3)))
+            del samples[:-MAX_SAMPLES]
+            schedule = not self._dirty
+            self._dirty = True
+        if schedule and self.schedule_save:
+            self.schedule_save(self.flush)
+        logger.debug(f"TTS 延遲記錄 {key}: {chars} 字元 {seconds:.2f} 秒")
+
+    def predict(self, engine: str, model: Optional[str], chars: int) -> Optional[float]:
+        """
+        預測合成耗時（擬合值加上殘差標準差，偏保守）
+
+        Returns:
+            float: 預測秒數，沒有樣本時返回 None
+        """
+        with self._lock:
+            samples = list(self._samples.get(self._key(engine, model), []))
+        if not samples:
+            return None
+
+        n = len(samples)
+        mean_x = sum(x for x, _ in samples) / n
+        mean_y = sum(y for _, y in samples) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in samples)
+
+        if var_x < 1e-6:
+            # 長度都相同時只能以平均每字元時間估算
+            slope = mean_y / mean_x if mean_x else 0.0
+            intercept = 0.0
+        else:
+            slope = max(0.0, sum((x - mean_x) * (y - mean_y) for x, y in samples) / var_x)
+            intercept = max(0.0, mean_y - slope * mean_x)
+
+        residuals = [y - (intercept + slope * x) for x, y in samples]
+        spread = (sum(r * r for r in residuals) / n) ** 0.5
+        return intercept + slope * chars + spread
+
+    def _load(self):
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._samples = {key: [tuple(s) for s in value] for key, value in data.items()}
+        except (OSError, ValueError, TypeError):
+            self._samples = {}
+
+    def flush(self):
+        """有新記錄時寫出檔案（在背景執行緒或關閉時呼叫）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            samples = {key: list(value) for key, value in self._samples.items()}
+            self._dirty = False
+        try:
+            temp_file = self.stats_file.with_suffix('.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(samples, f)
+            temp_file.replace(self.stats_file)
+        except OSError as e:
+            logger.debug(f"保存 TTS 延遲記錄失敗: {e}")
+
+
+class TTSScheduler:
+    """依期限選擇模型並與本地引擎競速"""
+
+    def __init__(self, latency: LatencyModel, deadline: float, hard_timeout: float):
+        self.latency = latency
+        self.deadline = deadline
+        self.hard_timeout = hard_timeout
+
+    def choose_model(self, engine: str, models: List[str], chars: int,
+                     deadline: Optional[float] = None) -> str:
+        """
+        選擇能在期限內完成的最高品質模型
+
+        Args:
+            engine: 引擎名稱
+            models: 依品質排序的模型（高 → 低）
+            chars: 文字長度
+            deadline: 期限秒數（預設使用排程器設定）
+
+        Returns:
+            str: 選用的模型
+        """
+        deadline = deadline or self.deadline
+        predictions = {m: self.latency.predict(engine, m, chars) for m in models}
+        for model in models:
+            predicted = predictions[model]
+            # 尚無資料的模型視為可以準時，之後由實測修正
+            if predicted is None or predicted <= deadline:
+                return model
+        # 都無法準時時選預測最快的
+        return min(models, key=lambda m: predictions[m])
+
+    def race(self, primary: Callable[[], Optional[Path]], insurance: Optional[Callable[[], Optional[Path]]],
+             validate: Callable[[Path], bool], predicted: Optional[float] = None,
+             deadline: Optional[float] = None) -> Tuple[Optional[str], Optional[Path]]:
+        """
+        執行主要引擎；預測逾時時立即、否則在期限到達或主要引擎失敗時啟動保險引擎
+
+        Args:
+            primary: 主要（遠端）合成函數
+            insurance: 保險（本地）合成函數，可為 None
+            validate: 結果驗證函數
+            predicted: 主要引擎的預測耗時
+            deadline: 期限秒數（預設使用排程器設定）
+
+        Returns:
+            Tuple[str, Path]: ('primary' 或 'insurance', 音頻文件)，都失敗時返回 (None, None)
+        """
+        deadline = deadline or self.deadline
+        results: "queue.Queue[Tuple[str, Optional[Path]]]" = queue.Queue()
+        start = time.time()
+
+        def contender(name: str, func: Callable[[], Optional[Path]]):
+            try:
+                result = func()
+            except Exception as e:
+                logger.warning(f"TTS 競速 {name} 失敗: {e}")
+                result = None
+            results.put((name, result))
+
+        def launch(name: str, func: Callable[[], Optional[Path]]):
+            threading.Thread(target=contender, args=(name, func), name=f'TTS-{name}', daemon=True).start()
+
+        launch('primary', primary)
+        pending = 1
+        insurance_started = False
+
+        if insurance and predicted is not None and predicted > deadline:
+            logger.info(f"⏱️ 預測遠端合成 {predicted:.1f} 秒超過期限 {deadline:.1f} 秒，同時啟動本地引擎")
+            launch('insurance', insurance)
+            pending += 1
+            insurance_started = True
+
+        while pending:
+            elapsed = time.time() - start
+            if insurance and not insurance_started:
+                wait = max(0.0, deadline - elapsed)
+            else:
+                wait = max(0.0, self.hard_timeout - elapsed)
+
+            try:
+                name, result = results.get(timeout=wait)
+            except queue.Empty:
+                if insurance and not insurance_started:
+                    logger.info(f"⏱️ 遠端合成已超過期限 {deadline:.1f} 秒，啟動本地引擎")
+                    launch('insurance', insurance)
+                    pending += 1
+                    insurance_started = True
+                    continue
+                logger.error("TTS 競速逾時")
+                break
+
+            pending -= 1
+            if result and validate(result):
+                logger.info(f"🏁 TTS 競速由 {name} 勝出 ({time.time() - start:.1f} 秒)")
+                return name, result
+
+            if name == 'primary' and insurance and not insurance_started:
+                launch('insurance', insurance)
+                pending += 1
+                insurance_started = True
+
+        return None, None
@@ -1,24 +1,35 @@
 #!/usr/bin/env python3
 """
 甦醒地圖 - 網頁控制器
-透過 Selenium 控制瀏覽器開啟甦醒地圖網站
+透過 DevTools 協定（預設）或 Selenium 控制瀏覽器開啟甦醒地圖網站
 """
 
 import os
 import time
+import shutil
 import logging
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (
     WebDriverException, TimeoutException, 
     NoSuchElementException, ElementNotInteractableException
 )
+import posixpath
 import subprocess
 import platform
+import threading
+from urllib.parse import urlparse
+
+from config import BROWSER_CONFIG
+from cdp_driver import CDPDriver
+from lazy_imports import lazy_module, preload
+
+# selenium.webdriver 會載入所有瀏覽器的驅動程式，延後到第一次使用時才載入
+# （DevTools 協定後端只需要 WebDriverWait 與 expected_conditions，在 Chrome 啟動期間背景載入）
+webdriver = lazy_module('selenium.webdriver')
+Service = lazy_module('selenium.webdriver.chrome.service', 'Service')
+Options = lazy_module('selenium.webdriver.chrome.options', 'Options')
+By = lazy_module('selenium.webdriver.common.by', 'By')
+WebDriverWait = lazy_module('selenium.webdriver.support.ui', 'WebDriverWait')
+EC = lazy_module('selenium.webdriver.support.expected_conditions')
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +37,8 @@ logger = logging.getLogger(__name__)
 WEBSITE_URL = "https://subjective-clock.vercel.app/pi.html"
 USER_NAME = "future"
 WAIT_TIMEOUT = 30
-LOAD_DELAY = 2
+# 等待前端日誌的單次最長時間（秒）
+FRONTEND_LOG_WAIT = 300
 
 def get_chromedriver_path():
     """自動偵測 ChromeDriver 路徑"""
@@ -56,65 +68,127 @@ class WebControllerDSI:
         self.user_name = USER_NAME
         self.website_url = WEBSITE_URL
         self.wait = None
+        # 事件匯流排位址（由主程式設定；網頁就緒後連線）
+        self.event_bus_url = None
+        # 預熱備用頁（DevTools 協定後端）：需要真正重新載入時直接切換
+        self.standby_driver = None
+        self._standby_lock = threading.Lock()
+        self._standby_preparing = False
         self.logger = logging.getLogger(self.__class__.__name__)
         
         self.logger.info("甦醒地圖網頁控制器初始化")
 
-    def _setup_chrome_options(self):
-        """設定 Chrome 瀏覽器選項"""
-        options = Options()
+    def _chrome_arguments(self):
+        """Chrome 啟動參數"""
+        arguments = []
         
         # 效能優化選項
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--disable-extensions')
-        options.add_argument('--disable-logging')
-        options.add_argument('--disable-background-timer-throttling')
-        options.add_argument('--disable-backgrounding-occluded-windows')
-        options.add_argument('--disable-renderer-backgrounding')
-        options.add_argument('--disable-features=TranslateUI')
-        options.add_argument('--disable-ipc-flooding-protection')
+        arguments.append('--no-sandbox')
+        arguments.append('--disable-dev-shm-usage')
+        arguments.append('--disable-gpu')
+        arguments.append('--disable-extensions')
+        arguments.append('--disable-logging')
+        arguments.append('--disable-background-timer-throttling')
+        arguments.append('--disable-backgrounding-occluded-windows')
+        arguments.append('--disable-renderer-backgrounding')
+        arguments.append('--disable-features=TranslateUI')
+        arguments.append('--disable-ipc-flooding-protection')
         
-        # 記憶體優化
-        options.add_argument('--memory-pressure-off')
-        options.add_argument('--max_old_space_size=4096')
+        # 記憶體優化：限制 V8 堆積大小，並保留 Chrome 的記憶體壓力處理（由 MemoryGovernor 在閒置時觸發回收）
+        arguments.append(f"--js-flags=--max-old-space-size={BROWSER_CONFIG.get('js_heap_mb', 256)}")
         
         # 網頁顯示設定 (適合 800x480 螢幕)
-        options.add_argument('--window-size=800,480')
-        options.add_argument('--window-position=0,0')
+        arguments.append('--window-size=800,480')
+        arguments.append('--window-position=0,0')
         
         # 全螢幕 kiosk 模式，隱藏瀏覽器分頁和工具列
-        options.add_argument('--kiosk')
-        options.add_argument('--disable-infobars')
-        options.add_argument('--hide-scrollbars')
+        arguments.append('--kiosk')
+        arguments.append('--disable-infobars')
+        arguments.append('--hide-scrollbars')
         
-        # 用戶資料目錄
-        options.add_argument('--user-data-dir=/tmp/chrome-data')
+        # 用戶資料目錄（持久保存，重開機後仍可使用 HTTP 快取）與快取上限
+        arguments.append(f"--user-data-dir={BROWSER_CONFIG.get('profile_dir', '/tmp/chrome-data')}")
+        arguments.append(f"--disk-cache-size={BROWSER_CONFIG.get('disk_cache_mb', 150) * 1024 * 1024}")
         
         # 自動播放政策
-        options.add_argument('--autoplay-policy=no-user-gesture-required')
+        arguments.append('--autoplay-policy=no-user-gesture-required')
         
+        return arguments
+
+    def _setup_chrome_options(self):
+        """設定 Chrome 瀏覽器選項（chromedriver 後端）"""
+        options = Options()
+        for argument in self._chrome_arguments():
+            options.add_argument(argument)
         return options
 
+    def _limit_profile_size(self):
+        """設定檔超過大小上限時清除快取目錄（書籤、登入狀態等其他資料保留）"""
+        profile_dir = BROWSER_CONFIG.get('profile_dir')
+        if not profile_dir or not os.path.isdir(profile_dir):
+            return
+        
+        total = 0
+        for root, _, files in os.walk(profile_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        
+        limit = BROWSER_CONFIG.get('profile_max_mb', 400) * 1024 * 1024
+        if total <= limit:
+            return
+        
+        self.logger.info(f"瀏覽器設定檔 {total / 1024 / 1024:.0f}MB 超過上限，清除快取")
+        for root, dirs, _ in os.walk(profile_dir):
+            for name in list(dirs):
+                if name in ('Cache', 'Code Cache', 'GPUCache', 'Service Worker'):
+                    shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                    dirs.remove(name)
+
     def start_browser(self):
         """啟動瀏覽器"""
         try:
             self.logger.info("正在啟動瀏覽器...")
             
-            # 設定 Chrome 選項
-            options = self._setup_chrome_options()
-            
-            # 嘗試找到 ChromeDriver
-            chromedriver_path = get_chromedriver_path()
-            
-            if chromedriver_path:
-                service = Service(chromedriver_path)
-                service.log_path = "/tmp/chromedriver.log"
-                self.driver = webdriver.Chrome(service=service, options=options)
-            else:
-                # 讓 Selenium 自動管理 ChromeDriver
-                self.driver = webdriver.Chrome(options=options)
+            self._limit_profile_size()
+            
+            self.driver = None
+            if BROWSER_CONFIG.get('backend') == 'cdp':
+                # Chrome 啟動期間在背景載入等待元素所需的 selenium 模組
+                preload(['selenium.webdriver.support.ui', 'selenium.webdriver.support.expected_conditions'])
+                # Python 端重啟時，先嘗試連上前一次執行留下的 Chrome
+                if BROWSER_CONFIG.get('reattach', False):
+                    self.driver = CDPDriver.reattach(
+                        port=BROWSER_CONFIG.get('debugging_port', 9222),
+                        pid_file=BROWSER_CONFIG.get('pid_file')
+                    )
+                # 直接以 DevTools 協定連線，不需要 chromedriver 行程
+                try:
+                    if self.driver is None:
+                        self.driver = CDPDriver(
+                            self._chrome_arguments(),
+                            binary=BROWSER_CONFIG.get('chrome_binary'),
+                            port=BROWSER_CONFIG.get('debugging_port', 9222),
+                            pid_file=BROWSER_CONFIG.get('pid_file')
+                        )
+                    self.logger.info("使用 DevTools 協定後端")
+                except Exception as e:
+                    self.logger.warning(f"DevTools 協定後端啟動失敗，改用 chromedriver：{e}")
+            
+            if self.driver is None:
+                # 嘗試找到 ChromeDriver
+                chromedriver_path = get_chromedriver_path()
+                options = self._setup_chrome_options()
+                
+                if chromedriver_path:
+                    service = Service(chromedriver_path)
+                    service.log_path = "/tmp/chromedriver.log"
+                    self.driver = webdriver.Chrome(service=service, options=options)
+                else:
+                    # 讓 Selenium 自動管理 ChromeDriver
+                    self.driver = webdriver.Chrome(options=options)
             
             # 設定等待物件
             self.wait = WebDriverWait(self.driver, WAIT_TIMEOUT)
@@ -129,11 +203,14 @@ class WebControllerDSI:
     def load_website(self):
         """載入網站並自動設定"""
         try:
+            # 重新連上的瀏覽器仍顯示就緒的頁面時直接沿用
+            if getattr(self.driver, 'reattached', False) and self._resume_page():
+                return True
+            
             self.logger.info("正在載入甦醒地圖...")
             
-            # 開啟網站
+            # 開啟網站（driver.get 會等到文件載入完成）
             self.driver.get(self.website_url)
-            time.sleep(LOAD_DELAY)
             
             # 自動填入使用者名稱
             self._fill_username()
@@ -148,13 +225,45 @@ class WebControllerDSI:
             self.logger.error(f"網站載入失敗：{e}")
             return False
 
-    def _fill_username(self):
+    def _resume_page(self):
+        """
+        沿用重新連上的瀏覽器中已載入的頁面（網址相同且已就緒），並軟重置回等待狀態
+        
+        Returns:
+            bool: 是否沿用成功（失敗時應重新載入頁面）
+        """
+        try:
+            current = urlparse(self.driver.current_url)
+            expected = urlparse(self.website_url)
+            # 本機資源伺服器會把 /pi.html 導向 /v/<版本>/pi.html，只比對主機與檔名
+            if (current.netloc != expected.netloc
+                    or posixpath.basename(current.path) != posixpath.basename(expected.path)):
+                self.logger.info(f"執行中的瀏覽器顯示其他頁面 ({self.driver.current_url})，重新載入")
+                return False
+            
+            if not self.wait_for_signal('ready', 3):
+                self.logger.info("執行中的頁面未就緒，重新載入")
+                return False
+            
+            # 前一次執行可能停在甦醒流程中途
+            self.driver.execute_script("return window.piSoftReset ? window.piSoftReset() : null;")
+            self.connect_event_bus()
+        except Exception as e:
+            self.logger.warning(f"沿用執行中的頁面失敗：{e}")
+            return False
+        
+        self.logger.info("♻️ 沿用執行中的頁面，略過重新載入")
+        self._prepare_standby_async()
+        return True
+
+    def _fill_username(self, driver=None):
         """填入使用者名稱（pi.html 版本：使用 JavaScript 設定隱藏輸入框）"""
+        driver = driver or self.driver
         try:
             self.logger.info(f"正在設定使用者：{self.user_name}")
             
             # 對於 pi.html，使用者名稱是隱藏輸入框，我們直接用 JavaScript 設定
-            self.driver.execute_script(f"document.getElementById('userName').value = '{self.user_name}';")
+            driver.execute_script(f"document.getElementById('userName').value = '{self.user_name}';")
             
             self.logger.info("使用者名稱設定成功")
             return True
@@ -163,13 +272,19 @@ class WebControllerDSI:
             self.logger.error(f"使用者名稱設定失敗：{e}")
             return False
 
-    def _click_load_data_button(self):
-        """點擊載入資料按鈕"""
+    def _click_load_data_button(self, driver=None):
+        """
+        點擊載入資料按鈕
+        
+        Args:
+            driver: 要設定的頁面（預設為目前顯示的頁面；預熱備用頁時傳入備用頁）
+        """
+        driver = driver or self.driver
         try:
             self.logger.info("正在載入用戶資料...")
             
             # 確保用戶名稱已設定
-            self.driver.execute_script("""
+            driver.execute_script("""
                 if (typeof rawUserDisplayName === 'undefined' || !rawUserDisplayName) {
                     window.rawUserDisplayName = 'future';
                 }
@@ -177,7 +292,7 @@ class WebControllerDSI:
             
             # 等待載入資料按鈕出現並可點擊
             try:
-                load_button = self.wait.until(
+                load_button = WebDriverWait(driver, WAIT_TIMEOUT).until(
                     EC.element_to_be_clickable((By.ID, "setUserNameButton"))
                 )
                 load_button.click()
@@ -185,8 +300,11 @@ class WebControllerDSI:
             except Exception as e:
                 self.logger.warning(f"無法點擊載入按鈕：{e}")
             
-            # 等待 Firebase 初始化完成
-            time.sleep(3)
+            # 等待 Firebase 登入完成、甦醒流程可呼叫
+            if self.wait_for_signal('ready', WAIT_TIMEOUT, driver):
+                self.logger.info("✅ 網頁已就緒")
+            else:
+                self.logger.warning(f"網頁在 {WAIT_TIMEOUT} 秒內未回報就緒，繼續強制設置")
             
             # 強制設置用戶資料和啟用按鈕
             force_setup_js = """
@@ -215,12 +333,9 @@ class WebControllerDSI:
             console.log('🔧 用戶資料強制設置完成');
             """
             
-            self.driver.execute_script(force_setup_js)
+            driver.execute_script(force_setup_js)
             self.logger.info("✅ 用戶資料強制設置完成")
             
-            # 等待 Firebase 初始化完成
-            time.sleep(2)
-            
             # 觸發強制故事顯示
             story_trigger_js = """
             if (window.forceDisplayStoryFromFirebase) {
@@ -231,9 +346,12 @@ class WebControllerDSI:
             }
             """
             
-            self.driver.execute_script(story_trigger_js)
+            driver.execute_script(story_trigger_js)
             self.logger.info("✅ 已觸發強制故事顯示")
             
+            if driver is self.driver:
+                self.connect_event_bus()
+                self._prepare_standby_async()
             return True
             
         except Exception as e:
@@ -252,6 +370,10 @@ class WebControllerDSI:
                 result = self.driver.execute_script("""
                     try {
                         window.debugStartTheDay = 'NOT_STARTED';
+                        if (window.piSignals) {
+                            window.piSignals.clear('city');
+                            window.piSignals.clear('error');
+                        }
                         if (typeof startTheDay === 'function') {
                             startTheDay();
                             return 'JavaScript 函數已執行';
@@ -269,8 +391,13 @@ class WebControllerDSI:
                 debug_status = self.driver.execute_script("return window.debugStartTheDay || 'UNKNOWN';")
                 self.logger.info(f"調試狀態：{debug_status}")
                 
-                # 等待處理完成
-                time.sleep(8)
+                # 等待城市資料出現（或流程失敗）
+                page_signal = self.wait_for_signal(['city', 'error'], WAIT_TIMEOUT)
+                if page_signal is None:
+                    self.logger.warning(f"{WAIT_TIMEOUT} 秒內未收到城市資料")
+                elif page_signal['name'] == 'error':
+                    self.logger.warning(f"甦醒流程失敗：{page_signal['value']}")
+                    return {'success': False, 'error': page_signal['value']}
                 
                 # 再次檢查調試狀態
                 final_debug_status = self.driver.execute_script("return window.debugStartTheDay || 'UNKNOWN';")
@@ -317,11 +444,12 @@ class WebControllerDSI:
                 )
                 
                 # 點擊開始按鈕
+                self.driver.execute_script("if (window.piSignals) { window.piSignals.clear('city'); window.piSignals.clear('error'); }")
                 start_button.click()
                 self.logger.info("開始按鈕已點擊")
                 
                 # 等待結果處理
-                time.sleep(5)
+                self.wait_for_signal(['city', 'error'], WAIT_TIMEOUT)
                 
                 # 檢查是否有結果顯示
                 try:
@@ -339,14 +467,243 @@ class WebControllerDSI:
             self.logger.error(f"點擊開始按鈕失敗：{e}")
             return {'success': False, 'error': str(e)}
 
+    def start_with_city(self, city: dict):
+        """
+        以裝置端選定的城市開始這一天（不等待定位動畫，完成時網頁會送出 city 訊號）
+
+        Args:
+            city: API 格式的城市資料
+
+        Returns:
+            dict: {'success': bool}，網頁不支援時返回失敗，呼叫端改用 click_start_button
+        """
+        try:
+            started = self.driver.execute_script("""
+                if (typeof window.piStartWithCity !== 'function') {
+                    return false;
+                }
+                window.piSignals.clear('city');
+                window.piSignals.clear('error');
+                window.piStartWithCity(arguments[0]);
+                return true;
+            """, city)
+            if not started:
+                self.logger.warning("網頁不支援 piStartWithCity")
+                return {'success': False, 'error': 'piStartWithCity 函數未找到'}
+            self.logger.info(f"已將城市送往網頁：{city.get('name') or city.get('city', '')}")
+            return {'success': True}
+        except Exception as e:
+            self.logger.error(f"以指定城市開始失敗：{e}")
+            return {'success': False, 'error': str(e)}
+
+    def wait_for_signal(self, names, timeout: float = WAIT_TIMEOUT, driver=None, cancel=None):
+        """
+        等待網頁的就緒訊號（window.piSignals），訊號一出現立即返回
+        
+        Args:
+            names: 訊號名稱或名稱列表（任一出現即返回）
+            timeout: 最長等待秒數
+            driver: 要等待的頁面（預設為目前顯示的頁面）
+            cancel: 取消權杖（具 cancelled 屬性）；指定時分段等待，取消後在 1 秒內返回
+        
+        Returns:
+            dict: {'name': 訊號名稱, 'value': 訊號值}，逾時、取消或失敗時返回 None
+        """
+        if cancel is not None:
+            deadline = time.time() + timeout
+            while not cancel.cancelled:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                signal = self.wait_for_signal(names, min(1.0, remaining), driver)
+                if signal is not None:
+                    return signal
+            return None
+        
+        driver = driver or self.driver
+        try:
+            driver.set_script_timeout(timeout + 5)
+            return driver.execute_async_script("""
+                const names = arguments[0];
+                const deadline = Date.now() + arguments[1];
+                const done = arguments[arguments.length - 1];
+                (function attach() {
+                    if (window.piSignals) {
+                        window.piSignals.wait(names, Math.max(0, deadline - Date.now())).then(done);
+                    } else if (Date.now() < deadline) {
+                        // 頁面腳本尚未載入
+                        setTimeout(attach, 50);
+                    } else {
+                        done(null);
+                    }
+                })();
+            """, names, int(timeout * 1000))
+        except Exception as e:
+            self.logger.warning(f"等待網頁訊號 {names} 失敗：{e}")
+            return None
+
+    def wait_for_frontend_log(self, last_timestamp: str = None, timeout: float = FRONTEND_LOG_WAIT):
+        """
+        等待前端日誌橋接元素（#frontend-log-bridge）出現新的日誌
+
+        網頁端以 MutationObserver 等待元素建立或更新，期間雙方都不輪詢。
+        chromedriver 後端會依序執行指令，長時間等待會擋住其他操作，因此每次最多等待 1 秒
+
+        Args:
+            last_timestamp: 上一筆已讀取日誌的時間戳記
+            timeout: 最長等待秒數
+
+        Returns:
+            dict: {'timestamp', 'content'}，逾時返回 None
+
+        Raises:
+            WebDriverException: 頁面重新載入或連線中斷
+        """
+        if not isinstance(self.driver, CDPDriver):
+            timeout = min(timeout, 1)
+        self.driver.set_script_timeout(timeout + 5)
+        return self.driver.execute_async_script("""
+            const last = arguments[0];
+            const done = arguments[arguments.length - 1];
+            let observer = null;
+            const finish = (entry) => {
+                if (observer) observer.disconnect();
+                clearTimeout(timer);
+                done(entry);
+            };
+            const check = () => {
+                const element = document.getElementById('frontend-log-bridge');
+                if (!element) return false;
+                const timestamp = element.getAttribute('data-timestamp');
+                if (timestamp && timestamp !== last) {
+                    finish({timestamp: timestamp, content: element.textContent});
+                    return true;
+                }
+                if (observer && observer.target !== element) {
+                    // 元素已建立：改為只觀察元素本身
+                    observer.disconnect();
+                    observer.observe(element, {attributes: true, attributeFilter: ['data-timestamp']});
+                    observer.target = element;
+                }
+                return false;
+            };
+            const timer = setTimeout(() => finish(null), arguments[1]);
+            if (check()) return;
+            observer = new MutationObserver(check);
+            const element = document.getElementById('frontend-log-bridge');
+            if (element) {
+                observer.observe(element, {attributes: true, attributeFilter: ['data-timestamp']});
+                observer.target = element;
+            } else {
+                // 元素在第一次記錄日誌時才加入 body
+                observer.observe(document.body, {childList: true});
+                observer.target = document.body;
+            }
+        """, last_timestamp, int(timeout * 1000))
+
+    def connect_event_bus(self):
+        """讓網頁連上事件匯流排（頁面載入或重新整理後都需要重新連線）"""
+        if not self.event_bus_url:
+            return
+        try:
+            self.driver.execute_script(
+                "window.piBus && window.piBus.connect(arguments[0]);", self.event_bus_url
+            )
+        except Exception as e:
+            self.logger.warning(f"網頁連接事件匯流排失敗：{e}")
+
+    def soft_reset(self):
+        """
+        軟重置：讓網頁狀態機回到等待狀態，保留已載入的腳本、Firebase SDK 與地圖
+        網頁無回應時改用預熱備用頁，沒有備用頁才整頁重新載入
+        
+        Returns:
+            dict: {'success': bool, 'message'/'error': str}
+        """
+        try:
+            if self.driver.execute_script("return window.piSoftReset ? window.piSoftReset() : null;"):
+                self.logger.info("✅ 網頁已軟重置")
+                return {'success': True, 'message': '網頁已軟重置'}
+            self.logger.warning("網頁無法軟重置（頁面尚未就緒），改為切換頁面")
+        except Exception as e:
+            self.logger.warning(f"網頁軟重置失敗，改為切換頁面：{e}")
+        
+        if self.swap_to_standby():
+            return {'success': True, 'message': '已切換到預熱備用頁'}
+        return self.reload_website()
+
+    def _prepare_standby_async(self):
+        """在背景預熱備用頁（只有 DevTools 協定後端支援背景分頁）"""
+        if not BROWSER_CONFIG.get('warm_standby', False) or not isinstance(self.driver, CDPDriver):
+            return
+        with self._standby_lock:
+            if self.standby_driver or self._standby_preparing:
+                return
+            self._standby_preparing = True
+        
+        threading.Thread(target=self._prepare_standby, name='StandbyPage', daemon=True).start()
+
+    def _prepare_standby(self):
+        standby = None
+        try:
+            standby = self.driver.open_page(self.website_url)
+            if not (self._fill_username(standby) and self._click_load_data_button(standby)):
+                raise RuntimeError("備用頁設定失敗")
+            with self._standby_lock:
+                self.standby_driver, standby = standby, None
+            self.logger.info("🔥 預熱備用頁已就緒")
+        except Exception as e:
+            self.logger.warning(f"預熱備用頁失敗：{e}")
+        finally:
+            with self._standby_lock:
+                self._standby_preparing = False
+            if standby:
+                standby.close_page()
+
+    def drop_standby(self):
+        """關閉預熱備用頁以釋放記憶體（下次成功載入資料後會重新準備）"""
+        with self._standby_lock:
+            standby, self.standby_driver = self.standby_driver, None
+        if standby:
+            standby.close_page()
+            self.logger.info("已關閉預熱備用頁")
+
+    def swap_to_standby(self) -> bool:
+        """
+        切換到預熱備用頁並關閉目前頁面
+        
+        Returns:
+            bool: 是否成功切換（沒有備用頁時返回 False）
+        """
+        with self._standby_lock:
+            standby, self.standby_driver = self.standby_driver, None
+        if standby is None:
+            return False
+        
+        try:
+            standby.activate()
+        except Exception as e:
+            self.logger.warning(f"切換備用頁失敗：{e}")
+            standby.close_page()
+            return False
+        
+        previous, self.driver = self.driver, standby
+        standby.process, previous.process = previous.process, None
+        self.wait = WebDriverWait(self.driver, WAIT_TIMEOUT)
+        previous.close_page()
+        self.logger.info("✅ 已切換到預熱備用頁")
+        
+        self.connect_event_bus()
+        self._prepare_standby_async()
+        return True
+
     def reload_website(self):
         """重新載入網站"""
         try:
             self.logger.info("正在重新載入網站...")
             
-            # 重新載入頁面
+            # 重新載入頁面（就緒訊號在 _click_load_data_button 中等待）
             self.driver.refresh()
-            time.sleep(LOAD_DELAY)
             
             # 重新設定使用者資料
             if self._fill_username() and self._click_load_data_button():
@@ -362,9 +719,18 @@ class WebControllerDSI:
     def stop(self):
         """停止並清理瀏覽器"""
         try:
+            if self.standby_driver:
+                self.standby_driver.close_page()
+                self.standby_driver = None
+            
             if self.driver:
-                self.logger.info("正在關閉瀏覽器...")
-                self.driver.quit()
+                if BROWSER_CONFIG.get('keep_alive_on_exit', False) and isinstance(self.driver, CDPDriver):
+                    # 保留 Chrome 與頁面，Python 端重啟後以 reattach 重新連上
+                    self.logger.info("中斷瀏覽器連線（Chrome 繼續運行）")
+                    self.driver.detach()
+                else:
+                    self.logger.info("正在關閉瀏覽器...")
+                    self.driver.quit()
                 self.driver = None
                 
         except Exception as e:
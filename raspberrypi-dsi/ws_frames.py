@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WakeUpMap - 最小 WebSocket (RFC 6455) 框架工具
+事件匯流排（伺服器端）與 DevTools 連線（用戶端）共用，只用標準函式庫
+"""
+
+import os
+import base64
+import socket
+import struct
+import hashlib
+from typing import Optional, Tuple, Dict
+
+# RFC 6455 握手用的固定 GUID
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+def accept_key(key: str) -> str:
+    """計算 Sec-WebSocket-Accept"""
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def read_http_head(sock: socket.socket, limit: int = 16384) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    讀取 HTTP 起始行與標頭
+
+    Returns:
+        Tuple[str, Dict]: (起始行, 小寫標頭字典)，連線關閉或過長時返回 None
+    """
+    data = b''
+    while b'\r\n\r\n' not in data:
+        chunk = sock.recv(4096)
+        if not chunk or len(data) > limit:
+            return None
+        data += chunk
+
+    lines = data.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+def client_handshake(sock: socket.socket, host: str, path: str) -> bool:
+    """以用戶端身分完成 WebSocket 握手"""
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall((
+        f'GET {path} HTTP/1.1\r\n'
+        f'Host: {host}\r\n'
+        'Upgrade: websocket\r\n'
+        'Connection: Upgrade\r\n'
+        f'Sec-WebSocket-Key: {key}\r\n'
+        'Sec-WebSocket-Version: 13\r\n\r\n'
+    ).encode())
+    head = read_http_head(sock)
+    if head is None:
+        return False
+    status, headers = head
+    return ' 101 ' in status and headers.get('sec-websocket-accept') == accept_key(key)
+
+
+def recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """讀取剛好 size 位元組，連線關閉時返回 None"""
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def read_frame(sock: socket.socket) -> Optional[Tuple[bool, int, bytes]]:
+    """
+    讀取一個框架（自動解除遮罩）
+
+    Returns:
+        Tuple[bool, int, bytes]: (fin, opcode, payload)，連線關閉時返回 None
+    """
+    header = recv_exact(sock, 2)
+    if header is None:
+        return None
+    fin = bool(header[0] & 0x80)
+    opcode = header[0] & 0x0F
+    masked = bool(header[1] & 0x80)
+    length = header[1] & 0x7F
+    if length == 126:
+        extended = recv_exact(sock, 2)
+        if extended is None:
+            return None
+        length = struct.unpack('!H', extended)[0]
+    elif length == 127:
+        extended = recv_exact(sock, 8)
+        if extended is None:
+            return None
+        length = struct.unpack('!Q', extended)[0]
+
+    mask = recv_exact(sock, 4) if masked else None
+    payload = recv_exact(sock, length) if length else b''
+    if payload is None or (masked and mask is None):
+        return None
+    if mask:
+        payload = _apply_mask(payload, mask)
+    return fin, opcode, payload
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool = False) -> bytes:
+    """
+    編碼單一框架（用戶端送出的框架必須遮罩）
+    """
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+    if not mask:
+        return header + payload
+    key = os.urandom(4)
+    return header + key + _apply_mask(payload, key)
+
+
+def _apply_mask(payload: bytes, key: bytes) -> bytes:
+    # 以整數 XOR 處理整段資料，比逐位元組迴圈快得多（DevTools 回應可能很大）
+    repeated = (key * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(len(payload), 'big')
+
+
+class FrameReader:
+    """組合分段框架，回應 ping；read_message 返回完整的文字訊息"""
+
+    def __init__(self, sock: socket.socket, masked_replies: bool = False):
+        self.sock = sock
+        self.masked_replies = masked_replies
+
+    def read_message(self) -> Optional[bytes]:
+        """
+        讀取下一則完整訊息
+
+        Returns:
+            bytes: 訊息內容，連線關閉時返回 None
+        """
+        fragments = []
+        while True:
+            frame = read_frame(self.sock)
+            if frame is None:
+                return None
+            fin, opcode, payload = frame
+            if opcode == OP_CLOSE:
+                return None
+            if opcode == OP_PING:
+                self.sock.sendall(encode_frame(OP_PONG, payload, self.masked_replies))
+                continue
+            if opcode not in (OP_TEXT, OP_CONTINUATION):
+                continue
+            fragments.append(payload)
+            if fin:
+                return b''.join(fragments)